@@ -1,4 +1,107 @@
 #!/bin/bash
+{%- macro prnc_steps() -%}
+{% if cookiecutter.prnc_mode == "concurrent" %}
+  echo "Starting concurrent wind.nc and current.nc file creation at $(date)"
+  PRNC_PIDS=()
+  for FORCING in wind current
+  do
+    (
+      mkdir prnc_${FORCING} && \
+      cd prnc_${FORCING} && \
+      ln -s ../mod_def.ww3 mod_def.ww3 && \
+      ln -s ../${FORCING} ${FORCING} && \
+      ln -s ../ww3_prnc_${FORCING}.inp ww3_prnc.inp && \
+      {% if cookiecutter.forcing_cache_dir %}cached_prnc ${FORCING} {% endif %}timed prnc_${FORCING} ${WW3_EXE}/ww3_prnc && \
+      mv ${FORCING}.ww3 .. && \
+      cd .. && \
+      rm -rf prnc_${FORCING}
+    ) &
+    PRNC_PIDS+=($!)
+  done
+  PRNC_FAILED=0
+  for PID in ${PRNC_PIDS[@]}
+  do
+    wait ${PID} || PRNC_FAILED=1
+  done
+  if (( PRNC_FAILED ))
+  then
+    echo "ww3_prnc failed at $(date)" >&2
+    exit 1
+  fi
+  echo "Ending concurrent wind.nc and current.nc file creation at $(date)"
+{% else %}
+  echo "Starting wind.nc file creation at $(date)"
+  ln -s ww3_prnc_wind.inp ww3_prnc.inp && \
+  {% if cookiecutter.forcing_cache_dir %}cached_prnc wind {% endif %}timed prnc_wind ${WW3_EXE}/ww3_prnc && \
+  rm -f ww3_prnc.inp
+  echo "Ending wind.nc file creation at $(date)"
+
+  echo "Starting current.nc file creation at $(date)"
+  ln -s ww3_prnc_current.inp ww3_prnc.inp && \
+  {% if cookiecutter.forcing_cache_dir %}cached_prnc current {% endif %}timed prnc_current ${WW3_EXE}/ww3_prnc && \
+  rm -f ww3_prnc.inp
+  echo "Ending current.nc file creation at $(date)"
+{% endif %}
+{%- endmacro %}
+{%- macro ounf_steps() %}
+{%- if cookiecutter.output_points %}
+  # ww3_ounp reads out_pnt.ww3, and ww3_ounf reads out_grd.ww3, so they run at the same time
+  echo "Starting netCDF4 points output at $(date)"
+  timed ounp ${WW3_EXE}/ww3_ounp &
+  OUNP_PID=$!
+{%- endif %}
+  echo "Starting netCDF4 fields output at $(date)"
+  timed ounf ${WW3_EXE}/ww3_ounf && \
+  mv SoG_ww3_fields_${RUN_START_DATES[i]}.nc \
+    SoG_ww3_fields_${RUN_START_DATES[i]}_${RUN_START_DATES[i]}.nc && \
+{%- if cookiecutter.fields_nccopy_args %}
+  timed compress nccopy {{ cookiecutter.fields_nccopy_args }} \
+    SoG_ww3_fields_${RUN_START_DATES[i]}_${RUN_START_DATES[i]}.nc SoG_ww3_fields_compressed.nc && \
+  mv SoG_ww3_fields_compressed.nc \
+    SoG_ww3_fields_${RUN_START_DATES[i]}_${RUN_START_DATES[i]}.nc && \
+{%- endif %}
+{%- if cookiecutter.run_start_hour|int > 0 %}
+  # The first day started from a mid-day checkpoint, so its fields only cover
+  # the rest of the day
+  { (( i > 0 )) || mv SoG_ww3_fields_${RUN_START_DATES[i]}_${RUN_START_DATES[i]}.nc \
+    SoG_ww3_fields_${RUN_START_DATES[i]}_${RUN_START_DATES[i]}_{{ "%02d"|format(cookiecutter.run_start_hour|int) }}.nc; } && \
+{%- endif %}
+  rm out_grd.ww3
+  echo "Ending netCDF4 fields output at $(date)"
+{%- if cookiecutter.output_points %}
+  # wait in an && list wouldn't stop the script if ww3_ounp failed
+  wait ${OUNP_PID} || exit 1
+  rm out_pnt.ww3
+  echo "Ending netCDF4 points output at $(date)"
+{%- endif %}
+{%- endmacro %}
+{%- macro stage_in_steps() %}
+{%- if cookiecutter.node_local_scratch == "True" %}
+  stage_in
+  echo "node-local dir: $(pwd)"
+{%- endif %}
+{%- endmacro %}
+{%- macro gather_steps() %}
+{%- if cookiecutter.node_local_scratch == "True" %}
+  echo "Staging out results from node-local scratch at $(date)"
+  stage_out
+{%- endif %}
+{%- if cookiecutter.prefetch_restart == "True" %}
+  # The prefetched copy of the restart file that the run started from is not a result
+  [[ -L restart.ww3 ]] || rm -f restart.ww3
+{%- endif %}
+  echo "Results gathering started at $(date)"
+  timed gather ${GATHER} ${RESULTS_DIRS[i]} --debug
+  echo "Results gathering ended at $(date)"
+{%- if cookiecutter.checkpoint_interval_hours|int > 0 %}
+  # The day has finished, so a checkpoint saved for it by an earlier job is stale
+  rm -f ${RESULTS_DIRS[i]}/checkpoint_restart.ww3 ${RESULTS_DIRS[i]}/${CHECKPOINT_FILE}
+{%- endif %}
+
+  echo "Deleting run directory"
+  timed cleanup rmdir $(pwd)
+  echo "Finished at $(date)"
+{%- endmacro %}
 
 {{ cookiecutter.batch_directives }}
 
@@ -22,43 +125,279 @@ WORK_DIRS=(
   {{ cookiecutter.work_dirs }}
 )
 
-for (( i=0; i<${{ '{#' }}RESULTS_DIRS[@]}; ++i ))
+TIMINGS_FILE="wwatch3_timings.jsonl"
+if /usr/bin/time -f %M -o /dev/null true 2>/dev/null
+then
+  RSS_TIME="/usr/bin/time"
+else
+  RSS_TIME=""
+fi
+
+timed() {
+  # Run the command for stage $1 of day i, and append a timing record for it
+  # to the timings file in the day's results directory
+  local stage=$1
+  shift
+  local rss_file=$(mktemp)
+  local start=$(date +%s.%3N)
+  local status=0
+  if [[ -n ${RSS_TIME} ]]
+  then
+    ${RSS_TIME} -f %M -o ${rss_file} "$@" || status=$?
+  else
+    "$@" || status=$?
+  fi
+  local end=$(date +%s.%3N)
+  local peak_rss_kb=$(tail -n 1 ${rss_file})
+  rm -f ${rss_file}
+  [[ ${peak_rss_kb} =~ ^[0-9]+$ ]] || peak_rss_kb=null
+  echo "{\"run_id\": \"{{ cookiecutter.timings_run_id }}\", \"day\": \"${RUN_START_DATES[i]}\", \"stage\": \"${stage}\", \"start\": ${start}, \"end\": ${end}, \"exit_status\": ${status}, \"peak_rss_kb\": ${peak_rss_kb}, \"n_procs\": {{ cookiecutter.n_procs }}}" \
+    >> ${RESULTS_DIRS[i]}/${TIMINGS_FILE}
+  return ${status}
+}
+{% if cookiecutter.node_local_scratch == "True" %}
+if [[ -z ${SLURM_TMPDIR:-} ]]
+then
+  echo "SLURM_TMPDIR is not set, so there is no node-local scratch to run in" >&2
+  exit 1
+fi
+LOCAL_DIRS=()
+for WORK_DIR in ${WORK_DIRS[@]}
 do
+  LOCAL_DIRS+=(${SLURM_TMPDIR}/$(basename ${WORK_DIR}))
+done
+
+stage_in() {
+  # Copy the inputs for day i from its working directory on the shared file system
+  # to its directory in node-local scratch in one pass, and run the day there
+  local inputs=(
+    ww3_*.inp mod_def.ww3
+    wind/SoG_wind_${RUN_START_DATES[i]}.nc current/SoG_current_${RUN_START_DATES[i]}.nc
+  )
+  [[ ! -e restart.ww3 ]] || inputs+=(restart.ww3)
+  mkdir -p ${LOCAL_DIRS[i]}
+  timed stage_in cp -L --parents ${inputs[@]} ${LOCAL_DIRS[i]}/
+  cd ${LOCAL_DIRS[i]}
+}
+
+stage_out() {
+  # Gather the products of day i from node-local scratch straight into the day's
+  # results directory, and go back to the day's working directory to gather the
+  # rest of it. The staged copies of the inputs are deleted instead of gathered
+  rm -rf ww3_*.inp mod_def.ww3 restart.ww3 wind current
+  timed stage_out ${GATHER} ${RESULTS_DIRS[i]} --debug
+  cd ${WORK_DIRS[i]}
+  rm -rf ${LOCAL_DIRS[i]}
+}
+{% endif %}{% if cookiecutter.forcing_cache_dir %}
+FORCING_CACHE="{{ cookiecutter.forcing_cache_dir }}"
+
+cached_prnc() {
+  # Link the cached $1.ww3 file for day i if there is one; otherwise run the
+  # ww3_prnc command, and add the $1.ww3 file that it creates to the cache.
+  # Cache files are keyed by the hash of the day's $1 netCDF file,
+  # ww3_prnc.inp, and mod_def.ww3
+  local forcing=$1
+  shift
+  local key=$(
+    sha256sum ${forcing}/SoG_${forcing}_${RUN_START_DATES[i]}.nc ww3_prnc.inp mod_def.ww3 \
+      | cut -d " " -f 1 | sha256sum | cut -d " " -f 1
+  )
+  local cache_file=${FORCING_CACHE}/${forcing}_${key}.ww3
+  if [[ -f ${cache_file} ]]
+  then
+    echo "Using cached ${forcing}.ww3 from ${cache_file}"
+    ln -s ${cache_file} ${forcing}.ww3
+  else
+    "$@" || return $?
+    cp ${forcing}.ww3 ${cache_file}.$$ && mv ${cache_file}.$$ ${cache_file} \
+      || { rm -f ${cache_file}.$$; echo "Unable to add ${forcing}.ww3 to ${FORCING_CACHE}" >&2; }
+  fi
+}
+{% endif %}{% if cookiecutter.checkpoint_interval_hours|int > 0 %}
+CHECKPOINT_HOURS={{ cookiecutter.checkpoint_interval_hours }}
+FIRST_DAY_START_HOUR={{ cookiecutter.run_start_hour }}
+CHECKPOINT_FILE="wwatch3_checkpoint.json"
+SHEL_PID=""
+
+last_checkpoint() {
+  # Print the name of the last finished mid-day checkpoint restart file in the
+  # working directory. A checkpoint is finished when ww3_shel has started writing
+  # the next one, or when it is the same size as the restart file that the day
+  # started from
+  local checkpoints=($(ls restart[0-9][0-9][0-9].ww3 2>/dev/null))
+  local n=${{ '{#' }}checkpoints[@]}
+  if (( n > 0 )) && [[ -e restart.ww3 ]] \
+    && (( $(stat -L -c %s ${checkpoints[n-1]}) == $(stat -L -c %s restart.ww3) ))
+  then
+    echo ${checkpoints[n-1]}
+  elif (( n > 1 ))
+  then
+    echo ${checkpoints[n-2]}
+  fi
+}
+
+keep_end_of_day_restart() {
+  # Keep the end of day restart file, the last one that ww3_shel wrote,
+  # as restart001.ww3 for the next day to start from, and delete the mid-day
+  # checkpoint restart files
+  local restarts=($(ls restart[0-9][0-9][0-9].ww3))
+  mv ${restarts[${{ '{#' }}restarts[@]}-1]} end_of_day_restart.ww3 && \
+  rm -f restart[0-9][0-9][0-9].ww3 && \
+  mv end_of_day_restart.ww3 restart001.ww3
+}
+
+save_checkpoint() {
+  # Slurm sends SIGTERM before the job's time limit. If ww3_shel is running,
+  # save its last finished checkpoint restart file for day i in the day's results
+  # directory so that `wwatch3 run --resume` can restart the day from it
+  trap - TERM
+  echo "Received SIGTERM at $(date)"
+  if [[ -n ${SHEL_PID} ]] && kill -0 ${SHEL_PID} 2>/dev/null
+  then
+    local checkpoint=$(last_checkpoint)
+    local start_hour=0
+    (( i > 0 )) || start_hour=${FIRST_DAY_START_HOUR}
+    local hour=24
+    [[ -z ${checkpoint} ]] || hour=$(( start_hour + 10#${checkpoint:7:3} * CHECKPOINT_HOURS ))
+    if (( hour < 24 ))
+    then
+      cp ${checkpoint} ${RESULTS_DIRS[i]}/checkpoint_restart.ww3.$$ && \
+      mv ${RESULTS_DIRS[i]}/checkpoint_restart.ww3.$$ ${RESULTS_DIRS[i]}/checkpoint_restart.ww3 && \
+      echo "{\"day\": \"${RUN_START_DATES[i]}\", \"hour\": ${hour}, \"restart\": \"checkpoint_restart.ww3\"}" \
+        > ${RESULTS_DIRS[i]}/${CHECKPOINT_FILE} && \
+      echo "Saved ${checkpoint} as the ${hour}:00 checkpoint for ${RUN_START_DATES[i]} in ${RESULTS_DIRS[i]}"
+    else
+      echo "No finished mid-day checkpoint to save for ${RUN_START_DATES[i]}"
+    fi
+  fi
+  exit 143
+}
+trap save_checkpoint TERM
+{% endif %}{% if cookiecutter.async_post == "True" %}
+POST_PIDS=()
+
+post_day() {
+  # Post-process and gather the results of day $1, and delete its working directory
+  local i=$1
+{%- if cookiecutter.node_local_scratch == "True" %}
+  cd ${LOCAL_DIRS[i]}
+{%- else %}
+  cd ${WORK_DIRS[i]}
+{%- endif %}
+{{ ounf_steps() }}
+  # out_grd.ww3 is only deleted if ww3_ounf succeeded
+  test ! -e out_grd.ww3
+{%- if cookiecutter.output_points %}
+  test ! -e out_pnt.ww3
+{%- endif %}
+{{ gather_steps() }}
+}
+{% endif %}{% if cookiecutter.pipeline_depth|int > 0 %}
+N_DAYS=${{ '{#' }}RESULTS_DIRS[@]}
+PIPELINE_DEPTH={{ cookiecutter.pipeline_depth }}
+DAY_PRNC_PIDS=()
+NEXT_PRNC_DAY=0
+PRNC_SAVED_SECONDS=0
+
+prnc_day() {
+  # Create the wind.ww3 and current.ww3 files for day $1 in its working directory
+  local i=$1
+  cd ${WORK_DIRS[i]}
+  local prnc_start=$(date +%s)
+{{ prnc_steps() }}
+  test -f wind.ww3 -a -f current.ww3
+  echo $(( $(date +%s) - prnc_start )) > prnc_seconds
+}
+
+for (( i=0; i<N_DAYS; ++i ))
+do
+  # Keep forcing pre-processing running up to PIPELINE_DEPTH days ahead of ww3_shel
+  while (( NEXT_PRNC_DAY < N_DAYS && NEXT_PRNC_DAY <= i + PIPELINE_DEPTH ))
+  do
+    echo "Starting background forcing pre-processing for ${RUN_START_DATES[NEXT_PRNC_DAY]} at $(date)"
+    prnc_day ${NEXT_PRNC_DAY} &
+    DAY_PRNC_PIDS[NEXT_PRNC_DAY]=$!
+    NEXT_PRNC_DAY=$(( NEXT_PRNC_DAY + 1 ))
+  done
+
   echo "results dir: ${RESULTS_DIRS[i]}"
 
   cd ${WORK_DIRS[i]}
   echo "working dir: $(pwd)"
 
-  echo "Starting wind.nc file creation at $(date)"
-  ln -s ww3_prnc_wind.inp ww3_prnc.inp && \
-  ${WW3_EXE}/ww3_prnc && \
-  rm -f ww3_prnc.inp
-  echo "Ending wind.nc file creation at $(date)"
+  echo "Waiting for forcing pre-processing at $(date)"
+  WAIT_START=$(date +%s)
+  if ! wait ${DAY_PRNC_PIDS[i]}
+  then
+    echo "Forcing pre-processing failed at $(date)" >&2
+    exit 1
+  fi
+  WAIT_SECONDS=$(( $(date +%s) - WAIT_START ))
+  PRNC_SECONDS=$(< prnc_seconds)
+  rm prnc_seconds
+  PRNC_SAVED_SECONDS=$(( PRNC_SAVED_SECONDS + PRNC_SECONDS - WAIT_SECONDS ))
+  echo "Forcing pre-processing took ${PRNC_SECONDS}s; waited ${WAIT_SECONDS}s for it at $(date)"
+{% elif cookiecutter.job_array == "True" %}
+# Each array task runs the day given by its task index
+i=${SLURM_ARRAY_TASK_ID}
+exec >> ${RESULTS_DIRS[i]}/stdout 2>> ${RESULTS_DIRS[i]}/stderr
 
-  echo "Starting current.nc file creation at $(date)"
-  ln -s ww3_prnc_current.inp ww3_prnc.inp && \
-  ${WW3_EXE}/ww3_prnc && \
-  rm -f ww3_prnc.inp
-  echo "Ending current.nc file creation at $(date)"
+  echo "results dir: ${RESULTS_DIRS[i]}"
 
+  cd ${WORK_DIRS[i]}
+  echo "working dir: $(pwd)"
+{{- stage_in_steps() }}
+{{ prnc_steps() }}{% else %}
+for (( i=0; i<${{ '{#' }}RESULTS_DIRS[@]}; ++i ))
+do
+  echo "results dir: ${RESULTS_DIRS[i]}"
+
+  cd ${WORK_DIRS[i]}
+  echo "working dir: $(pwd)"
+{{- stage_in_steps() }}
+{{ prnc_steps() }}{% endif %}
   echo "Starting run at $(date)"
-  ${MPIRUN} -np {{ cookiecutter.n_procs }} ${WW3_EXE}/ww3_shel && \
+{%- if cookiecutter.checkpoint_interval_hours|int > 0 %}
+  # ww3_shel runs in the background so that the SIGTERM trap runs while waiting for it
+  timed shel ${MPIRUN} -np {{ cookiecutter.n_procs }} ${WW3_EXE}/ww3_shel &
+  SHEL_PID=$!
+  wait ${SHEL_PID} && \
+  keep_end_of_day_restart && \
+{%- else %}
+  timed shel ${MPIRUN} -np {{ cookiecutter.n_procs }} ${WW3_EXE}/ww3_shel && \
+{%- endif %}
   mv log.ww3 ww3_shel.log && \
   rm current.ww3 wind.ww3 && \
   echo "Ended run at $(date)"
+{% if cookiecutter.async_post == "True" %}
+  # Make the restart file available to the next day before its ww3_shel run
+  mv restart[0-9][0-9][0-9].ww3 ${RESULTS_DIRS[i]}/
 
-  echo "Starting netCDF4 fields output at $(date)"
-  ${WW3_EXE}/ww3_ounf && \
-  mv SoG_ww3_fields_${RUN_START_DATES[i]}.nc \
-    SoG_ww3_fields_${RUN_START_DATES[i]}_${RUN_START_DATES[i]}.nc && \
-  rm out_grd.ww3
-  echo "Ending netCDF4 fields output at $(date)"
-
-  echo "Results gathering started at $(date)"
-  ${GATHER} ${RESULTS_DIRS[i]} --debug
-  echo "Results gathering ended at $(date)"
-
-  echo "Deleting run directory"
-  rmdir $(pwd)
-  echo "Finished at $(date)"
+  echo "Starting background post-processing at $(date)"
+  post_day ${i} &
+  POST_PIDS+=($!)
+{% else %}
+{{- ounf_steps() }}
+{{ gather_steps() }}
+{% endif -%}
+{% if cookiecutter.job_array != "True" -%}
+done
+{% endif -%}
+{% if cookiecutter.async_post == "True" %}
+echo "Waiting for background post-processing at $(date)"
+POST_FAILED=0
+for PID in ${POST_PIDS[@]}
+do
+  wait ${PID} || POST_FAILED=1
 done
+if (( POST_FAILED ))
+then
+  echo "Background post-processing failed at $(date)" >&2
+  exit 1
+fi
+echo "Ended background post-processing at $(date)"
+{% endif -%}
+{% if cookiecutter.pipeline_depth|int > 0 %}
+echo "Pipelined forcing pre-processing saved ${PRNC_SAVED_SECONDS}s of wall time"
+{% endif -%}
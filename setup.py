@@ -22,6 +22,13 @@ setuptools.setup(
         # The wwatch3 command:
         "console_scripts": ["wwatch3 = wwatch3_cmd.main:main"],
         # Sub-command plug-ins:
-        "wwatch3.app": ["gather = nemo_cmd.gather:Gather", "run = wwatch3_cmd.run:Run"],
+        "wwatch3.app": [
+            "bench = wwatch3_cmd.bench:Bench",
+            "bench-report = wwatch3_cmd.bench:BenchReport",
+            "gather = wwatch3_cmd.gather:Gather",
+            "run = wwatch3_cmd.run:Run",
+            "run-batch = wwatch3_cmd.run_batch:RunBatch",
+            "timings = wwatch3_cmd.timings:Timings",
+        ],
     }
 )
@@ -0,0 +1,324 @@
+#  Copyright 2019-2021, the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""WWatch3-Cmd bench and bench-report sub-command plug-ins unit tests.
+"""
+import json
+import logging
+from pathlib import Path
+import textwrap
+from types import SimpleNamespace
+
+import arrow
+import pytest
+import yaml
+
+import wwatch3_cmd.bench
+import wwatch3_cmd.main
+import wwatch3_cmd.run
+
+
+@pytest.fixture
+def bench_cmd():
+    return wwatch3_cmd.bench.Bench(wwatch3_cmd.main.WWatch3App, [])
+
+
+@pytest.fixture
+def bench_report_cmd():
+    return wwatch3_cmd.bench.BenchReport(wwatch3_cmd.main.WWatch3App, [])
+
+
+@pytest.fixture
+def desc_file(tmp_path):
+    ww3_yaml = tmp_path / "wwatch3.yaml"
+    ww3_yaml.write_text(
+        textwrap.dedent(
+            """\
+            run_id: SoGwaves
+            account: def-allen
+            email: someone@eoas.ubc.ca
+
+            resources:
+              tasks per node: 40
+              constraint: skylake
+            """
+        )
+    )
+    return ww3_yaml
+
+
+class TestBenchParser:
+    """Unit tests for `wwatch3 bench` sub-command command-line parser.
+    """
+
+    def test_get_parser(self, bench_cmd):
+        parser = bench_cmd.get_parser("wwatch3 bench")
+        assert parser.prog == "wwatch3 bench"
+
+    def test_cmd_description(self, bench_cmd):
+        parser = bench_cmd.get_parser("wwatch3 bench")
+        assert parser.description.strip().startswith(
+            "Prepare and submit a WaveWatch III® run described in DESC_FILE"
+        )
+
+    def test_n_procs_option(self, bench_cmd):
+        parser = bench_cmd.get_parser("wwatch3 bench")
+        assert parser._actions[4].dest == "n_procs_list"
+        assert parser._actions[4].option_strings == ["--n-procs"]
+        assert parser._actions[4].type == wwatch3_cmd.run.Run._positive_int
+        assert parser._actions[4].nargs == "+"
+        assert parser._actions[4].required
+        assert parser._actions[4].help
+
+    def test_parsed_args_defaults(self, bench_cmd):
+        parser = bench_cmd.get_parser("wwatch3 bench")
+        parsed_args = parser.parse_args(
+            ["foo.yaml", "00:20:00", "results/foo/", "--n-procs", "20", "40"]
+        )
+        assert parsed_args.desc_file == Path("foo.yaml")
+        assert parsed_args.walltime == "00:20:00"
+        assert parsed_args.results_dir == Path("results/foo/")
+        assert parsed_args.n_procs_list == [20, 40]
+        assert not parsed_args.no_submit
+        assert not parsed_args.quiet
+        assert parsed_args.start_date == arrow.now().floor("day")
+        assert parsed_args.n_days == 1
+
+    def test_n_procs_required(self, bench_cmd):
+        parser = bench_cmd.get_parser("wwatch3 bench")
+        with pytest.raises(SystemExit):
+            parser.parse_args(["foo.yaml", "00:20:00", "results/foo/"])
+
+
+class TestBenchTakeAction:
+    """Unit tests for `wwatch3 bench` sub-command take_action() method.
+    """
+
+    def test_take_action(self, bench_cmd, caplog, monkeypatch):
+        def mock_bench(*args, **kwargs):
+            return {20: "Submitted batch job 1\n", 40: "Submitted batch job 2\n"}
+
+        monkeypatch.setattr(wwatch3_cmd.bench, "bench", mock_bench)
+        parsed_args = SimpleNamespace(
+            desc_file=Path("desc file"),
+            walltime="00:20:00",
+            results_dir=Path("results dir"),
+            n_procs_list=[20, 40],
+            n_days=1,
+            no_submit=False,
+            quiet=False,
+            start_date=arrow.get("2019-10-07"),
+        )
+        caplog.set_level(logging.INFO)
+        bench_cmd.take_action(parsed_args)
+        assert caplog.messages == [
+            "20 MPI processes: Submitted batch job 1",
+            "40 MPI processes: Submitted batch job 2",
+        ]
+
+
+class TestBench:
+    """Unit tests for bench() function.
+    """
+
+    def test_bench(self, desc_file, tmp_path, monkeypatch):
+        runs = []
+
+        def mock_run(desc_file, results_dir, start_date, walltime, **kwargs):
+            runs.append((desc_file, results_dir, kwargs["n_days"]))
+            return f"Submitted batch job {len(runs)}"
+
+        monkeypatch.setattr(wwatch3_cmd.bench.wwatch3_cmd.run, "run", mock_run)
+        results_dir = tmp_path / "bench"
+        submit_job_msgs = wwatch3_cmd.bench.bench(
+            desc_file,
+            results_dir,
+            arrow.get("2019-10-15"),
+            "00:20:00",
+            [80, 20, 40],
+            n_days=2,
+        )
+        assert submit_job_msgs == {
+            20: "Submitted batch job 1",
+            40: "Submitted batch job 2",
+            80: "Submitted batch job 3",
+        }
+        assert runs == [
+            (results_dir / "wwatch3_np20.yaml", results_dir / "np20", 2),
+            (results_dir / "wwatch3_np40.yaml", results_dir / "np40", 2),
+            (results_dir / "wwatch3_np80.yaml", results_dir / "np80", 2),
+        ]
+        with (results_dir / "wwatch3_np80.yaml").open("rt") as f:
+            np80_run_desc = yaml.safe_load(f)
+        assert np80_run_desc["run_id"] == "SoGwaves_np80"
+        assert np80_run_desc["resources"] == {
+            "nodes": 2,
+            "tasks per node": 40,
+            "constraint": "skylake",
+            "memory": 0,
+            "node-local scratch": False,
+        }
+
+
+class TestBenchResources:
+    """Unit tests for _bench_resources() function.
+    """
+
+    @pytest.mark.parametrize(
+        "n_procs, nodes, tasks_per_node",
+        ((10, 1, 10), (40, 1, 40), (60, 2, 30), (120, 3, 40)),
+    )
+    def test_layout(self, n_procs, nodes, tasks_per_node):
+        resources = {
+            "nodes": 1,
+            "tasks per node": 40,
+            "constraint": "skylake",
+            "memory": "0",
+            "node-local scratch": False,
+            "n_procs": 40,
+        }
+        layout = wwatch3_cmd.bench._bench_resources(resources, n_procs)
+        assert layout == {
+            "nodes": nodes,
+            "tasks per node": tasks_per_node,
+            "constraint": "skylake",
+            "memory": "0",
+            "node-local scratch": False,
+        }
+
+    def test_node_local_scratch_kept(self):
+        resources = {
+            "nodes": 1,
+            "tasks per node": 40,
+            "constraint": "skylake",
+            "memory": "187G",
+            "node-local scratch": True,
+            "n_procs": 40,
+        }
+        layout = wwatch3_cmd.bench._bench_resources(resources, 20)
+        assert layout == {
+            "nodes": 1,
+            "tasks per node": 20,
+            "constraint": "skylake",
+            "memory": "187G",
+            "node-local scratch": True,
+        }
+
+    def test_node_local_scratch_multi_node(self, caplog):
+        resources = {
+            "nodes": 1,
+            "tasks per node": 40,
+            "constraint": "skylake",
+            "memory": "0",
+            "node-local scratch": True,
+            "n_procs": 40,
+        }
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.bench._bench_resources(resources, 80)
+        assert caplog.records[0].levelname == "ERROR"
+
+    def test_uneven_layout(self, caplog):
+        resources = {
+            "nodes": 1,
+            "tasks per node": 40,
+            "constraint": "skylake",
+            "memory": "0",
+            "node-local scratch": False,
+            "n_procs": 40,
+        }
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.bench._bench_resources(resources, 41)
+        assert caplog.records[0].levelname == "ERROR"
+
+
+class TestBenchReport:
+    """Unit tests for bench_report() function.
+    """
+
+    @staticmethod
+    def _write_stdout(stdout, shel_minutes):
+        lines = []
+        for day, minutes in enumerate(shel_minutes, start=15):
+            lines.extend(
+                [
+                    f"Starting run at Tue Oct {day} 17:00:00 PDT 2019",
+                    f"Ended run at Tue Oct {day} 17:{minutes:02d}:00 PDT 2019",
+                ]
+            )
+        stdout.parent.mkdir(parents=True)
+        stdout.write_text("\n".join(lines))
+
+    def test_bench_report(self, tmp_path):
+        self._write_stdout(tmp_path / "np20" / "15oct19" / "stdout", (40, 40))
+        self._write_stdout(tmp_path / "np40" / "15oct19" / "stdout", (25, 25))
+        rows = wwatch3_cmd.bench.bench_report(tmp_path)
+        assert rows == [
+            (20, 2, 4800, 1.5, 1.0, 1.0),
+            (40, 2, 3000, 2.4, 1.6, 0.8),
+        ]
+        with (tmp_path / "bench_results.json").open("rt") as f:
+            assert json.load(f)[1] == {
+                "MPI processes": 40,
+                "simulated days": 2,
+                "ww3_shel wall seconds": 3000,
+                "simulated days per wall hour": 2.4,
+                "speedup": 1.6,
+                "parallel efficiency": 0.8,
+            }
+        assert (tmp_path / "bench_results.csv").read_text().splitlines()[1] == (
+            "20,2,4800,1.5,1.0,1.0"
+        )
+
+    def test_unfinished_run(self, tmp_path, caplog):
+        self._write_stdout(tmp_path / "np20" / "stdout", (40,))
+        (tmp_path / "np40").mkdir()
+        rows = wwatch3_cmd.bench.bench_report(tmp_path)
+        assert rows == [(20, 1, 2400, 1.5, 1.0, 1.0)]
+        assert caplog.records[0].levelname == "WARNING"
+
+    @pytest.mark.parametrize(
+        "date_output",
+        (
+            # French locale
+            "mar. 15 oct. 2019 17:06:43 PDT",
+            # Truncated by an interrupted job
+            "Tue Oct 15",
+        ),
+    )
+    def test_unparseable_date_skipped(self, date_output, tmp_path, caplog):
+        self._write_stdout(tmp_path / "np20" / "15oct19" / "stdout", (40,))
+        bad_stdout = tmp_path / "np20" / "16oct19" / "stdout"
+        bad_stdout.parent.mkdir()
+        bad_stdout.write_text(
+            f"Starting run at {date_output}\nEnded run at {date_output}\n"
+        )
+        rows = wwatch3_cmd.bench.bench_report(tmp_path)
+        assert rows == [(20, 1, 2400, 1.5, 1.0, 1.0)]
+        assert caplog.records[0].levelname == "WARNING"
+        assert caplog.messages[0].startswith(
+            f"unable to read ww3_shel run times from {bad_stdout}: "
+        )
+
+
+class TestShelRunSeconds:
+    """Unit tests for _shel_run_seconds() function.
+    """
+
+    def test_shel_run_seconds(self):
+        stdout_lines = [
+            "Starting run at Tue Oct  1 23:50:00 PDT 2019",
+            "Ended run at Wed Oct  2 00:10:30 PDT 2019",
+            "Starting run at Wed Oct  2 00:11:00 PDT 2019",
+        ]
+        assert wwatch3_cmd.bench._shel_run_seconds(stdout_lines) == [1230]
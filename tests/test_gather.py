@@ -0,0 +1,219 @@
+#  Copyright 2019-2021, the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""WWatch3-Cmd gather sub-command plug-in unit tests.
+"""
+import hashlib
+import os
+from pathlib import Path
+
+import pytest
+
+import wwatch3_cmd.gather
+import wwatch3_cmd.main
+
+
+@pytest.fixture
+def gather_cmd():
+    return wwatch3_cmd.gather.Gather(wwatch3_cmd.main.WWatch3App, [])
+
+
+@pytest.fixture
+def run_dir(tmp_path):
+    run_dir = tmp_path / "SoGwaves_2019-10-15T170643.123456-0700"
+    run_dir.mkdir()
+    (run_dir / "SoG_ww3_fields_20191015_20191015.nc").write_bytes(b"fields")
+    (run_dir / "restart001.ww3").write_bytes(b"restart")
+    (run_dir / "ww3_shel.log").write_text("log")
+    forcing_dir = tmp_path / "wind"
+    forcing_dir.mkdir()
+    (run_dir / "wind").symlink_to(forcing_dir)
+    return run_dir
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+class TestParser:
+    """Unit tests for `wwatch3 gather` sub-command command-line parser.
+    """
+
+    def test_get_parser(self, gather_cmd):
+        parser = gather_cmd.get_parser("wwatch3 gather")
+        assert parser.prog == "wwatch3 gather"
+
+    def test_parsed_args_defaults(self, gather_cmd):
+        parser = gather_cmd.get_parser("wwatch3 gather")
+        parsed_args = parser.parse_args(["results/"])
+        assert parsed_args.results_dir == Path("results/")
+        assert parsed_args.streams == 4
+
+    def test_parsed_args_streams(self, gather_cmd):
+        parser = gather_cmd.get_parser("wwatch3 gather")
+        parsed_args = parser.parse_args(["results/", "--streams", "8"])
+        assert parsed_args.streams == 8
+
+    def test_bad_streams(self, gather_cmd):
+        parser = gather_cmd.get_parser("wwatch3 gather")
+        with pytest.raises(SystemExit):
+            parser.parse_args(["results/", "--streams", "0"])
+
+
+@pytest.mark.parametrize("same_file_system", (True, False))
+class TestGather:
+    """Unit tests for gather() function.
+    """
+
+    def test_gather(self, same_file_system, run_dir, tmp_path, monkeypatch):
+        monkeypatch.setattr(
+            wwatch3_cmd.gather, "_same_file_system", lambda *args: same_file_system
+        )
+        results_dir = tmp_path / "results" / "15oct19"
+        checksums = wwatch3_cmd.gather.gather(results_dir, run_dir=run_dir)
+        assert not list(run_dir.iterdir())
+        assert (results_dir / "restart001.ww3").read_bytes() == b"restart"
+        assert (results_dir / "wind").is_symlink()
+        assert Path(os.readlink(results_dir / "wind")) == tmp_path / "wind"
+        if same_file_system:
+            # Renamed files aren't read to calculate their checksums
+            assert checksums == {}
+            assert not (results_dir / "wwatch3_gather.sha256").exists()
+            return
+        assert checksums == {
+            "SoG_ww3_fields_20191015_20191015.nc": sha256(b"fields"),
+            "restart001.ww3": sha256(b"restart"),
+            "ww3_shel.log": sha256(b"log"),
+        }
+        assert (results_dir / "wwatch3_gather.sha256").read_text() == (
+            f"{sha256(b'fields')}  SoG_ww3_fields_20191015_20191015.nc\n"
+            f"{sha256(b'restart')}  restart001.ww3\n"
+            f"{sha256(b'log')}  ww3_shel.log\n"
+        )
+
+    def test_manifest_updated(self, same_file_system, run_dir, tmp_path, monkeypatch):
+        monkeypatch.setattr(
+            wwatch3_cmd.gather, "_same_file_system", lambda *args: same_file_system
+        )
+        results_dir = tmp_path / "results"
+        results_dir.mkdir()
+        (results_dir / "wwatch3_gather.sha256").write_text(
+            f"{sha256(b'stdout')}  stdout\n{sha256(b'old log')}  ww3_shel.log\n"
+        )
+        wwatch3_cmd.gather.gather(results_dir, run_dir=run_dir)
+        manifest_lines = (results_dir / "wwatch3_gather.sha256").read_text()
+        if same_file_system:
+            # The renamed ww3_shel.log replaced the one that the old entry was for
+            assert manifest_lines.splitlines() == [f"{sha256(b'stdout')}  stdout"]
+            return
+        assert manifest_lines.splitlines() == [
+            f"{sha256(b'fields')}  SoG_ww3_fields_20191015_20191015.nc",
+            f"{sha256(b'restart')}  restart001.ww3",
+            f"{sha256(b'stdout')}  stdout",
+            f"{sha256(b'log')}  ww3_shel.log",
+        ]
+
+    def test_checkpoint_link_not_gathered(
+        self, same_file_system, run_dir, tmp_path, monkeypatch
+    ):
+        monkeypatch.setattr(
+            wwatch3_cmd.gather, "_same_file_system", lambda *args: same_file_system
+        )
+        results_dir = tmp_path / "results" / "15oct19"
+        results_dir.mkdir(parents=True)
+        (results_dir / "checkpoint_restart.ww3").write_bytes(b"checkpoint")
+        (run_dir / "restart.ww3").symlink_to(results_dir / "checkpoint_restart.ww3")
+        wwatch3_cmd.gather.gather(results_dir, run_dir=run_dir)
+        assert not list(run_dir.iterdir())
+        assert not (results_dir / "restart.ww3").is_symlink()
+        assert (results_dir / "wind").is_symlink()
+
+    def test_directory_merged(self, same_file_system, run_dir, tmp_path, monkeypatch):
+        monkeypatch.setattr(
+            wwatch3_cmd.gather, "_same_file_system", lambda *args: same_file_system
+        )
+        (run_dir / "prnc_current").mkdir()
+        (run_dir / "prnc_current" / "ww3_prnc.log").write_text("new log")
+        (run_dir / "prnc_current" / "current.ww3").write_text("current")
+        results_dir = tmp_path / "results"
+        (results_dir / "prnc_current").mkdir(parents=True)
+        (results_dir / "prnc_current" / "ww3_prnc.log").write_text("old log")
+        wwatch3_cmd.gather.gather(results_dir, run_dir=run_dir)
+        assert sorted(
+            path.name for path in (results_dir / "prnc_current").iterdir()
+        ) == [
+            "current.ww3",
+            "ww3_prnc.log",
+        ]
+        assert (results_dir / "prnc_current" / "ww3_prnc.log").read_text() == "new log"
+        assert not (run_dir / "prnc_current").exists()
+
+
+class TestGatherCopy:
+    """Unit tests for gather() function when results have to be copied.
+    """
+
+    @staticmethod
+    @pytest.fixture(autouse=True)
+    def mock_different_file_system(monkeypatch):
+        monkeypatch.setattr(
+            wwatch3_cmd.gather, "_same_file_system", lambda *args: False
+        )
+
+    def test_skip_files_already_gathered(self, run_dir, tmp_path, monkeypatch):
+        results_dir = tmp_path / "results"
+        results_dir.mkdir()
+        (results_dir / "restart001.ww3").write_bytes(b"restart")
+        copied = []
+        copy_file = wwatch3_cmd.gather._copy_file
+
+        def mock_copy_file(path, dest):
+            copied.append(path.name)
+            return copy_file(path, dest)
+
+        monkeypatch.setattr(wwatch3_cmd.gather, "_copy_file", mock_copy_file)
+        wwatch3_cmd.gather.gather(results_dir, run_dir=run_dir)
+        assert sorted(copied) == ["SoG_ww3_fields_20191015_20191015.nc", "ww3_shel.log"]
+        assert not (run_dir / "restart001.ww3").exists()
+
+    def test_replace_different_file(self, run_dir, tmp_path):
+        results_dir = tmp_path / "results"
+        results_dir.mkdir()
+        (results_dir / "restart001.ww3").write_bytes(b"RESTART")
+        wwatch3_cmd.gather.gather(results_dir, run_dir=run_dir)
+        assert (results_dir / "restart001.ww3").read_bytes() == b"restart"
+
+    def test_checksum_mismatch(self, run_dir, tmp_path, caplog, monkeypatch):
+        sha256_file = wwatch3_cmd.gather._sha256
+
+        def mock_sha256(path):
+            if path.name == ".restart001.ww3.gather":
+                return "bad checksum"
+            return sha256_file(path)
+
+        monkeypatch.setattr(wwatch3_cmd.gather, "_sha256", mock_sha256)
+        results_dir = tmp_path / "results"
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.gather.gather(results_dir, run_dir=run_dir)
+        assert caplog.records[0].levelname == "ERROR"
+        assert caplog.messages[0].startswith(
+            f"unable to gather {run_dir/'restart001.ww3'}: checksum of copy does not match"
+        )
+        assert (run_dir / "restart001.ww3").read_bytes() == b"restart"
+        assert not (results_dir / "restart001.ww3").exists()
+        assert not (results_dir / ".restart001.ww3.gather").exists()
+        assert (
+            "restart001.ww3" not in (results_dir / "wwatch3_gather.sha256").read_text()
+        )
+        assert not (run_dir / "ww3_shel.log").exists()
@@ -0,0 +1,51 @@
+#  Copyright 2019-2021, the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""WWatch3-Cmd application startup tests.
+"""
+import json
+import subprocess
+import sys
+
+PLUGIN_MODULES = (
+    "wwatch3_cmd.gather",
+    "wwatch3_cmd.run",
+    "wwatch3_cmd.bench",
+    "wwatch3_cmd.run_batch",
+    "wwatch3_cmd.timings",
+)
+DEFERRED_IMPORTS = ("arrow", "cookiecutter", "jinja2", "nemo_cmd", "yaml")
+
+
+def _python(code):
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        check=True,
+        universal_newlines=True,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+
+
+class TestStartup:
+    """Tests to guard against the `wwatch3` command's plug-ins slowing its startup
+    by importing heavy packages at module level.
+    """
+
+    def test_plugin_modules_defer_heavy_imports(self):
+        code = (
+            f"import json, sys, {', '.join(PLUGIN_MODULES)}; "
+            f"print(json.dumps([m for m in {DEFERRED_IMPORTS} if m in sys.modules]))"
+        )
+        assert json.loads(_python(code).stdout) == []
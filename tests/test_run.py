@@ -14,6 +14,8 @@
 #  limitations under the License.
 """WWatch3-Cmd run sub-command plug-in unit and integration tests.
 """
+from concurrent.futures import ThreadPoolExecutor
+import json
 import logging
 import os
 from pathlib import Path
@@ -22,6 +24,8 @@ from types import SimpleNamespace
 
 import arrow
 import attr
+import cookiecutter.main
+import nemo_cmd.prepare
 import pytest
 import yaml
 
@@ -40,14 +44,20 @@ def run_desc(tmp_path):
     scratch.mkdir()
     scratch_ww3_runs = scratch / "wwatch3_runs"
     scratch_ww3_runs.mkdir()
-    results_14oct19 = scratch_ww3_runs / "14oct19"
-    results_14oct19.mkdir()
-    restart001_ww3 = results_14oct19 / "restart001.ww3"
-    restart001_ww3.write_bytes(b"")
+    # Restart files from earlier runs for the days before the runs that the tests
+    # prepare, so that the restart file chains of multi-day runs are unbroken
+    for day in arrow.Arrow.range("day", arrow.get("2019-10-05"), limit=13):
+        day_results_dir = scratch_ww3_runs / day.format("DDMMMYY").lower()
+        day_results_dir.mkdir()
+        (day_results_dir / "restart001.ww3").write_bytes(b"")
+    restart001_ww3 = scratch_ww3_runs / "14oct19" / "restart001.ww3"
     current_dir = scratch / "current"
     current_dir.mkdir()
     wind_dir = scratch / "wind"
     wind_dir.mkdir()
+    for day in arrow.Arrow.range("day", arrow.get("2019-10-01"), limit=31):
+        (current_dir / f"SoG_current_{day.format('YYYYMMDD')}.nc").write_bytes(b"")
+        (wind_dir / f"SoG_wind_{day.format('YYYYMMDD')}.nc").write_bytes(b"")
     project = tmp_path / "project"
     project.mkdir()
     project_ww3_runs = project / "wwatch3_runs"
@@ -82,6 +92,13 @@ def run_desc(tmp_path):
     return run_desc
 
 
+@pytest.fixture(autouse=True)
+def forcing_index_cache_dir(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setenv("XDG_CACHE_HOME", os.fspath(cache_dir))
+    return cache_dir
+
+
 @pytest.fixture
 def mock_subprocess_stdout(monkeypatch):
     @attr.s
@@ -163,6 +180,22 @@ class TestParser:
         assert parser._actions[7].default == 1
         assert parser._actions[7].help
 
+    def test_pipeline_depth_option(self, run_cmd):
+        parser = run_cmd.get_parser("wwatch3 run")
+        assert parser._actions[8].dest == "pipeline_depth"
+        assert parser._actions[8].option_strings == ["--pipeline-depth"]
+        assert parser._actions[8].type == wwatch3_cmd.run.Run._non_negative_int
+        assert parser._actions[8].default == 0
+        assert parser._actions[8].help
+
+    def test_async_post_option(self, run_cmd):
+        parser = run_cmd.get_parser("wwatch3 run")
+        assert parser._actions[9].dest == "async_post"
+        assert parser._actions[9].option_strings == ["--async-post"]
+        assert parser._actions[9].const is True
+        assert parser._actions[9].default is False
+        assert parser._actions[9].help
+
     def test_parsed_args_defaults(self, run_cmd):
         parser = run_cmd.get_parser("wwatch3 run")
         parsed_args = parser.parse_args(["foo.yaml", "00:20:00", "results/foo/"])
@@ -173,6 +206,8 @@ class TestParser:
         assert not parsed_args.quiet
         assert parsed_args.start_date == arrow.now().floor("day")
         assert parsed_args.n_days == 1
+        assert parsed_args.pipeline_depth == 0
+        assert not parsed_args.async_post
 
     @pytest.mark.parametrize("flag", ["-q", "--quiet"])
     def test_parsed_args_quiet_options(self, flag, run_cmd):
@@ -209,6 +244,77 @@ class TestParser:
         )
         assert parsed_args.n_days == 10
 
+    def test_parsed_args_pipeline_depth_option(self, run_cmd):
+        parser = run_cmd.get_parser("wwatch3 run")
+        parsed_args = parser.parse_args(
+            ["foo.yaml", "00:20:00", "results/foo/", "--pipeline-depth", "2"]
+        )
+        assert parsed_args.pipeline_depth == 2
+
+    def test_parsed_args_async_post_option(self, run_cmd):
+        parser = run_cmd.get_parser("wwatch3 run")
+        parsed_args = parser.parse_args(
+            ["foo.yaml", "00:20:00", "results/foo/", "--async-post"]
+        )
+        assert parsed_args.async_post is True
+
+    def test_parsed_args_max_days_per_job_option(self, run_cmd):
+        parser = run_cmd.get_parser("wwatch3 run")
+        parsed_args = parser.parse_args(["foo.yaml", "00:20:00", "results/foo/"])
+        assert parsed_args.max_days_per_job is None
+        parsed_args = parser.parse_args(
+            ["foo.yaml", "00:20:00", "results/foo/", "--max-days-per-job", "7"]
+        )
+        assert parsed_args.max_days_per_job == 7
+
+    def test_parsed_args_job_array_option(self, run_cmd):
+        parser = run_cmd.get_parser("wwatch3 run")
+        parsed_args = parser.parse_args(
+            ["foo.yaml", "00:20:00", "results/foo/", "--job-array"]
+        )
+        assert parsed_args.job_array is True
+
+    def test_parsed_args_resume_option(self, run_cmd):
+        parser = run_cmd.get_parser("wwatch3 run")
+        parsed_args = parser.parse_args(["foo.yaml", "00:20:00", "results/foo/"])
+        assert parsed_args.resume is False
+        parsed_args = parser.parse_args(
+            ["foo.yaml", "00:20:00", "results/foo/", "--resume"]
+        )
+        assert parsed_args.resume is True
+
+    def test_parsed_args_plan_options(self, run_cmd):
+        parser = run_cmd.get_parser("wwatch3 run")
+        parsed_args = parser.parse_args(["foo.yaml", "00:20:00", "results/foo/"])
+        assert parsed_args.plan is False
+        assert parsed_args.timings_dir is None
+        parsed_args = parser.parse_args(
+            [
+                "foo.yaml",
+                "00:20:00",
+                "results/foo/",
+                "--plan",
+                "--timings-dir",
+                "results/",
+            ]
+        )
+        assert parsed_args.plan is True
+        assert parsed_args.timings_dir == Path("results/")
+
+    @pytest.mark.parametrize("pipeline_depth", ("-1", "foo"))
+    def test_parsed_args_bad_pipeline_depth_option(self, pipeline_depth, run_cmd):
+        parser = run_cmd.get_parser("wwatch3 run")
+        with pytest.raises(SystemExit):
+            parser.parse_args(
+                [
+                    "foo.yaml",
+                    "00:20:00",
+                    "results/foo/",
+                    "--pipeline-depth",
+                    pipeline_depth,
+                ]
+            )
+
 
 @pytest.mark.parametrize("n_days", (1, 2))
 class TestTakeAction:
@@ -230,6 +336,13 @@ class TestTakeAction:
             walltime="00:20:00",
             results_dir=Path("results dir"),
             n_days=n_days,
+            pipeline_depth=0,
+            async_post=False,
+            max_days_per_job=None,
+            job_array=False,
+            resume=False,
+            plan=False,
+            timings_dir=None,
             no_submit=False,
             quiet=False,
             start_date=start_date,
@@ -244,6 +357,13 @@ class TestTakeAction:
             walltime="00:20:00",
             results_dir=Path("results dir"),
             n_days=n_days,
+            pipeline_depth=0,
+            async_post=False,
+            max_days_per_job=None,
+            job_array=False,
+            resume=False,
+            plan=False,
+            timings_dir=None,
             no_submit=False,
             quiet=True,
             start_date=arrow.get("2019-10-07"),
@@ -261,6 +381,13 @@ class TestTakeAction:
             walltime="00:20:00",
             results_dir=Path("results dir"),
             n_days=n_days,
+            pipeline_depth=0,
+            async_post=False,
+            max_days_per_job=None,
+            job_array=False,
+            resume=False,
+            plan=False,
+            timings_dir=None,
             no_submit=True,
             quiet=False,
             start_date=arrow.get("2019-10-07"),
@@ -281,9 +408,7 @@ class TestRun:
         def mock_return(*args):
             return run_desc
 
-        monkeypatch.setattr(
-            wwatch3_cmd.run.nemo_cmd.prepare, "load_run_desc", mock_return
-        )
+        monkeypatch.setattr(nemo_cmd.prepare, "load_run_desc", mock_return)
 
     @staticmethod
     @pytest.fixture
@@ -293,6 +418,33 @@ class TestRun:
 
         monkeypatch.setattr(wwatch3_cmd.run, "_write_tmp_run_dir_run_desc", mock_write)
 
+    def test_nothing_created_for_missing_symlink_target(
+        self, mock_load_run_desc_return, run_desc, tmp_path, caplog, monkeypatch
+    ):
+        monkeypatch.setitem(
+            run_desc["forcing"], "forcing cache", os.fspath(tmp_path / "forcing_cache")
+        )
+        symlink_targets = wwatch3_cmd.run._symlink_targets
+
+        def mock_symlink_targets(mod_def_ww3_path, *args):
+            return symlink_targets(tmp_path / "missing" / "mod_def.ww3", *args)
+
+        monkeypatch.setattr(wwatch3_cmd.run, "_symlink_targets", mock_symlink_targets)
+        runs_dir = tmp_path / "scratch" / "wwatch3_runs"
+        existing = sorted(runs_dir.iterdir())
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run.run(
+                tmp_path / "wwatch3.yaml",
+                tmp_path / "results_dir",
+                start_date=arrow.get("2019-10-15"),
+                walltime="00:20:00",
+                no_submit=True,
+            )
+        assert caplog.messages[0].startswith("mod_def.ww3 symlink target not found")
+        assert not (tmp_path / "forcing_cache").exists()
+        assert not (tmp_path / "results_dir").exists()
+        assert sorted(runs_dir.iterdir()) == existing
+
     def test_no_submit(
         self,
         mock_load_run_desc_return,
@@ -327,206 +479,2598 @@ class TestRun:
         )
         assert submit_job_msg == "submit_job_msg"
 
+    def test_submit_job_chain(
+        self,
+        mock_load_run_desc_return,
+        mock_write_tmp_run_dir_run_desc,
+        run_desc,
+        tmp_path,
+        monkeypatch,
+    ):
+        sbatch_cmds = []
 
-class TestSbatchDirectives:
-    """Unit test for _sbatch_directives() function.
-    """
+        def mock_sbatch(cmd, *args, **kwargs):
+            sbatch_cmds.append(cmd)
+            return SimpleNamespace(stdout=f"Submitted batch job {len(sbatch_cmds)}\n")
 
-    def test_sbatch_directives(self, run_desc, tmp_path):
-        results_dir = tmp_path / "results_dir"
-        sbatch_directives = wwatch3_cmd.run._sbatch_directives(
-            run_desc, results_dir, "00:20:00"
+        monkeypatch.setattr(wwatch3_cmd.run.subprocess, "run", mock_sbatch)
+        submit_job_msg = wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml",
+            tmp_path / "results_dir",
+            start_date=arrow.get("2019-10-07"),
+            walltime="00:20:00",
+            n_days=5,
+            max_days_per_job=2,
         )
-        expected = textwrap.dedent(
-            f"""\
-            #SBATCH --job-name={run_desc['run_id']}
-            #SBATCH --mail-user=someone@eoas.ubc.ca
-            #SBATCH --mail-type=ALL
-            #SBATCH --account=def-allen
-            #SBATCH --constraint=skylake
-            #SBATCH --nodes=1
-            #SBATCH --ntasks-per-node=20
-            #SBATCH --mem=0
-            #SBATCH --time=00:20:00
-            # stdout and stderr file paths/names
-            #SBATCH --output={results_dir/"stdout"}
-            #SBATCH --error={results_dir/"stderr"}
-            """
+        assert submit_job_msg == (
+            "Submitted batch job 1\nSubmitted batch job 2\nSubmitted batch job 3\n"
         )
-        assert sbatch_directives == expected
+        runs_dir = tmp_path / "scratch" / "wwatch3_runs"
+        job_run_scripts = [
+            os.fspath(next(runs_dir.glob(f"SoGwaves_{ddmmmyy}_*")) / "SoGWW3.sh")
+            for ddmmmyy in ("07oct19", "09oct19", "11oct19")
+        ]
+        assert sorted(runs_dir.glob("*/SoGWW3.sh")) == sorted(
+            map(Path, job_run_scripts)
+        )
+        assert sbatch_cmds == [
+            ["sbatch", job_run_scripts[0]],
+            ["sbatch", "--dependency=afterok:1", job_run_scripts[1]],
+            ["sbatch", "--dependency=afterok:2", job_run_scripts[2]],
+        ]
 
+    def test_bad_submit_job_msg(
+        self,
+        mock_load_run_desc_return,
+        mock_write_tmp_run_dir_run_desc,
+        run_desc,
+        tmp_path,
+        caplog,
+        monkeypatch,
+    ):
+        def mock_sbatch(cmd, *args, **kwargs):
+            return SimpleNamespace(stdout="sbatch: error: Batch job submission failed")
+
+        monkeypatch.setattr(wwatch3_cmd.run.subprocess, "run", mock_sbatch)
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run.run(
+                tmp_path / "wwatch3.yaml",
+                tmp_path / "results_dir",
+                start_date=arrow.get("2019-10-07"),
+                walltime="00:20:00",
+                n_days=2,
+                max_days_per_job=1,
+            )
+        assert caplog.records[-1].levelname == "ERROR"
+        assert caplog.messages[-1].startswith("unable to get job id")
 
-class TestTmpRunDir:
-    """Integration tests for temporary run directory generated by `wwatch3 run` sub-command.
+    def test_bad_prnc_mode(
+        self,
+        mock_load_run_desc_return,
+        mock_write_tmp_run_dir_run_desc,
+        run_desc,
+        tmp_path,
+        caplog,
+        monkeypatch,
+    ):
+        monkeypatch.setitem(run_desc["forcing"], "prnc mode", "parallel")
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run.run(
+                tmp_path / "wwatch3.yaml",
+                tmp_path / "results_dir",
+                start_date=arrow.get("2019-10-07"),
+                walltime="00:20:00",
+                no_submit=True,
+            )
+        assert caplog.records[0].levelname == "ERROR"
+        assert caplog.messages[0].startswith(
+            "unrecognized forcing: prnc mode: parallel"
+        )
+
+    def test_bad_resources_no_tmp_run_dir(
+        self,
+        mock_load_run_desc_return,
+        mock_write_tmp_run_dir_run_desc,
+        run_desc,
+        tmp_path,
+        monkeypatch,
+    ):
+        monkeypatch.setitem(run_desc, "resources", {"tasks per node": 64})
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run.run(
+                tmp_path / "wwatch3.yaml",
+                tmp_path / "results_dir",
+                start_date=arrow.get("2019-10-07"),
+                walltime="00:20:00",
+            )
+        assert not list((tmp_path / "scratch" / "wwatch3_runs").glob("SoGwaves_*"))
+
+
+class TestPlanRun:
+    """Unit tests for _plan_run() function.
     """
 
     @staticmethod
     @pytest.fixture
-    def mock_arrow_now_return(monkeypatch):
+    def mock_load_run_desc_return(run_desc, monkeypatch):
         def mock_return(*args):
-            return arrow.get("2019-10-15 17:06:43.123456-0700")
+            return run_desc
 
-        monkeypatch.setattr(wwatch3_cmd.run.arrow, "now", mock_return)
+        monkeypatch.setattr(nemo_cmd.prepare, "load_run_desc", mock_return)
 
-    def test_tmp_run_dir_name_1_day(
-        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    @staticmethod
+    @pytest.fixture
+    def timings_dir(tmp_path):
+        timings_dir = tmp_path / "past_runs"
+        timings_dir.mkdir()
+        stage_seconds = {"prnc_wind": 60, "prnc_current": 60, "shel": 1200, "ounf": 60}
+        records = [
+            json.dumps(
+                {
+                    "run_id": "SoGwaves",
+                    "day": "20191001",
+                    "stage": stage,
+                    "start": 0.0,
+                    "end": float(seconds),
+                    "exit_status": 0,
+                    "peak_rss_kb": None,
+                    "n_procs": 40,
+                }
+            )
+            for stage, seconds in stage_seconds.items()
+        ]
+        (timings_dir / "wwatch3_timings.jsonl").write_text("\n".join(records))
+        return timings_dir
+
+    def test_no_dirs_created(
+        self, mock_load_run_desc_return, run_desc, timings_dir, tmp_path
     ):
-        results_dir = tmp_path / "results_dir" / "15oct19"
-        start_date = arrow.get("2019-10-15")
-        wwatch3_cmd.run.run(
-            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
+        runs_dir = Path(run_desc["paths"]["runs directory"])
+        runs_dir_contents = sorted(runs_dir.iterdir())
+        report = wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml",
+            tmp_path / "results_dir",
+            arrow.get("2019-10-15"),
+            "02:00:00",
+            n_days=3,
+            plan=True,
+            timings_dir=timings_dir,
         )
-        assert (
-            tmp_path
-            / "scratch"
-            / "wwatch3_runs"
-            / "SoGwaves_2019-10-15T170643.123456-0700"
-        ).exists()
+        assert report.startswith("plan for SoGwaves: 3 day(s) from 2019-10-15")
+        assert sorted(runs_dir.iterdir()) == runs_dir_contents
+        assert not (tmp_path / "results_dir").exists()
 
-    def test_tmp_run_dir_names_2_days(
-        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
-    ):
-        results_dir = tmp_path / "results_dir"
-        start_date = arrow.get("2019-10-15")
-        wwatch3_cmd.run.run(
-            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00", n_days=2
+    def test_plan(self, mock_load_run_desc_return, timings_dir, tmp_path):
+        report = wwatch3_cmd.run._plan_run(
+            tmp_path / "wwatch3.yaml",
+            tmp_path / "results_dir",
+            arrow.get("2019-10-15"),
+            "02:00:00",
+            n_days=3,
+            timings_dir=timings_dir,
         )
-        assert (
-            tmp_path
-            / "scratch"
-            / "wwatch3_runs"
-            / "SoGwaves_15oct19_2019-10-15T170643.123456-0700"
-        ).exists()
-        assert (
-            tmp_path
-            / "scratch"
-            / "wwatch3_runs"
-            / "SoGwaves_16oct19_2019-10-15T170643.123456-0700"
-        ).exists()
+        assert report.splitlines() == [
+            "plan for SoGwaves: 3 day(s) from 2019-10-15 in 1 job(s) of up to 3 day(s)",
+            "grid: 572 x 661 points, 25 frequencies x 24 directions",
+            "MPI layout: 1 node(s) x 20 tasks per node = 20 ww3_shel processes",
+            f"estimated time per day: 00:43:00 from 4 timing records in {timings_dir}",
+            "estimated time per job: 02:09:00 of 02:00:00 walltime - "
+            "NOT enough; use at least 02:23:20",
+            "estimated node-hours: 2.1 used",
+            "requested node-hours: 2.0",
+            "fields output per day: 48 times of 13 fields, 1.1 GiB before compression",
+            "scratch high-water mark: 3.1 GiB",
+        ]
 
-    def test_results_dir_name_1_day(
-        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    def test_plan_job_array_with_points(
+        self, mock_load_run_desc_return, run_desc, timings_dir, tmp_path, monkeypatch
     ):
-        results_dir = tmp_path / "results_dir" / "15oct19"
-        start_date = arrow.get("2019-10-15")
-        wwatch3_cmd.run.run(
-            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
+        del run_desc["restart"]
+        monkeypatch.setitem(
+            run_desc,
+            "output",
+            {
+                "fields": {"names": ["HS", "DIR", "T02"], "interval": 3600},
+                "points": {"locations": {"Halibut Bank": [-123.72, 49.34]}},
+            },
         )
-        assert results_dir.exists()
+        report = wwatch3_cmd.run._plan_run(
+            tmp_path / "wwatch3.yaml",
+            tmp_path / "results_dir",
+            arrow.get("2019-10-15"),
+            "01:00:00",
+            n_days=3,
+            job_array=True,
+            timings_dir=timings_dir,
+        )
+        lines = report.splitlines()
+        assert lines[0] == (
+            "plan for SoGwaves: 3 day(s) from 2019-10-15 in 3 array task(s) "
+            "of up to 1 day(s)"
+        )
+        assert lines[4] == (
+            "estimated time per job: 00:43:00 of 01:00:00 walltime - enough"
+        )
+        assert lines[6] == "requested node-hours: 3.0"
+        assert lines[7] == (
+            "fields output per day: 24 times of 3 fields, 103.8 MiB "
+            "before compression"
+        )
+        assert lines[8] == ("points output per day: 144 times at 1 point(s), 9.0 KiB")
 
-    def test_results_dir_names_2_days(
-        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    def test_plan_node_local_scratch(
+        self, mock_load_run_desc_return, run_desc, tmp_path, monkeypatch
     ):
-        results_dir = tmp_path / "results_dir"
-        start_date = arrow.get("2019-10-15")
-        wwatch3_cmd.run.run(
-            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00", n_days=2
+        monkeypatch.setitem(run_desc, "resources", {"node-local scratch": True})
+        report = wwatch3_cmd.run._plan_run(
+            tmp_path / "wwatch3.yaml",
+            tmp_path / "results_dir",
+            arrow.get("2019-10-15"),
+            "02:00:00",
         )
-        assert (results_dir / "15oct19").exists()
-        assert (results_dir / "16oct19").exists()
+        assert report.splitlines()[-1] == "node-local scratch high-water mark: 3.1 GiB"
 
-    def test_tmp_run_dir_files(
-        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
-    ):
-        results_dir = tmp_path / "results_dir" / "15oct19"
-        start_date = arrow.get("2019-10-15")
-        wwatch3_cmd.run.run(
-            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
+    def test_no_timing_records(self, mock_load_run_desc_return, tmp_path):
+        report = wwatch3_cmd.run._plan_run(
+            tmp_path / "wwatch3.yaml",
+            tmp_path / "results_dir",
+            arrow.get("2019-10-15"),
+            "02:00:00",
         )
-        template_dir = (
-            Path(__file__).parent.parent
-            / "cookiecutter"
+        assert (
+            f"time per day can't be estimated; no timing records of past runs in "
+            f"{tmp_path/'results_dir'}"
+        ) in report.splitlines()
+
+    def test_bad_walltime(self, mock_load_run_desc_return, tmp_path, caplog):
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run._plan_run(
+                tmp_path / "wwatch3.yaml",
+                tmp_path / "results_dir",
+                arrow.get("2019-10-15"),
+                "2 hours",
+            )
+        assert caplog.messages[0] == "invalid walltime: 2 hours - please use HH:MM:SS"
+
+
+class TestGridDimensions:
+    """Unit tests for _grid_dimensions() function.
+    """
+
+    def test_grid_dimensions(self):
+        grid = wwatch3_cmd.run._grid_dimensions(
+            wwatch3_cmd.run.TEMPLATE_DIR
             / "{{cookiecutter.tmp_run_dir}}"
+            / "ww3_grid.inp"
         )
-        template_files = {fp.name for fp in template_dir.iterdir()}
-        tmp_run_dir = (
-            tmp_path
-            / "scratch"
-            / "wwatch3_runs"
-            / "SoGwaves_2019-10-15T170643.123456-0700"
+        assert grid == {"nx": 572, "ny": 661, "n_freqs": 25, "n_dirs": 24}
+
+    def test_title_and_comment_variants(self, tmp_path):
+        ww3_grid_inp = tmp_path / "ww3_grid.inp"
+        ww3_grid_inp.write_text(
+            textwrap.dedent(
+                """\
+                $ Grid name
+                  'RECT grid of the Salish Sea  '
+                  $ Indented comment
+                $   1.1  0.04  15  36  0.
+                   1.1, 0.06665, 30, 36, 0.
+                $$ Model flags
+                     F T T T T T
+                END OF NAMELISTS
+                   'RECT'  T 'NONE'
+                $ Number of grid points
+                    120  80
+                """
+            )
         )
-        tmp_run_dir_files = {
-            fp.name
-            for fp in tmp_run_dir.iterdir()
-            if fp.is_file() and not fp.is_symlink()
-        }
-        assert tmp_run_dir_files.difference(template_files) == {"wwatch3.yaml"}
-
-    def test_tmp_run_dir_files_2nd_day_no_SoGWW3_sh(
-        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
-    ):
-        results_dir = tmp_path / "results_dir"
-        start_date = arrow.get("2019-10-15")
-        wwatch3_cmd.run.run(
-            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00", n_days=2
+        grid = wwatch3_cmd.run._grid_dimensions(ww3_grid_inp)
+        assert grid == {"nx": 120, "ny": 80, "n_freqs": 30, "n_dirs": 36}
+
+    def test_unreadable(self, tmp_path, caplog):
+        ww3_grid_inp = tmp_path / "ww3_grid.inp"
+        ww3_grid_inp.write_text(
+            textwrap.dedent(
+                """\
+                $ Grid name without quotes
+                  SoG_BCgrid_00500m
+                   1.1  0.06665  25  24  0.
+                   'RECT'  T 'NONE'
+                    572  661
+                """
+            )
         )
-        template_dir = (
-            Path(__file__).parent.parent
-            / "cookiecutter"
-            / "{{cookiecutter.tmp_run_dir}}"
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run._grid_dimensions(ww3_grid_inp)
+        assert caplog.records[0].levelname == "ERROR"
+        assert caplog.messages[0].startswith(
+            f"unable to read grid dimensions from {ww3_grid_inp}"
         )
-        tmp_run_dir = (
-            tmp_path
-            / "scratch"
-            / "wwatch3_runs"
-            / "SoGwaves_16oct19_2019-10-15T170643.123456-0700"
+
+    def test_no_grid_type(self, tmp_path, caplog):
+        ww3_grid_inp = tmp_path / "ww3_grid.inp"
+        ww3_grid_inp.write_text("'SoG'\n1.1  0.06665  25  24  0.\n572  661\n")
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run._grid_dimensions(ww3_grid_inp)
+        assert caplog.messages[0].endswith("grid type line not found")
+
+
+class TestRunConfig:
+    """Unit tests for RunConfig class.
+    """
+
+    def test_from_run_desc(self, run_desc, tmp_path):
+        config = wwatch3_cmd.run.RunConfig.from_run_desc(run_desc)
+        assert config.run_id == "SoGwaves"
+        assert config.email == "someone@eoas.ubc.ca"
+        assert config.runs_dir == tmp_path / "scratch" / "wwatch3_runs"
+        assert config.prnc_mode == "serial"
+        assert config.forcing_cache_dir == ""
+        assert config.restart_path == (
+            tmp_path / "scratch" / "wwatch3_runs" / "14oct19" / "restart001.ww3"
+        )
+        assert config.checkpoint_hours == 0
+        assert config.resources["n_procs"] == 20
+
+    def test_all_errors_reported(self, run_desc, caplog, monkeypatch):
+        monkeypatch.delitem(run_desc, "email")
+        monkeypatch.setitem(run_desc, "resources", {"nodes": 0})
+        monkeypatch.setitem(run_desc["forcing"], "prnc mode", "parallel")
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run.RunConfig.from_run_desc(run_desc)
+        assert all(record.levelname == "ERROR" for record in caplog.records)
+        assert any("email" in msg for msg in caplog.messages)
+        assert any(msg.startswith("resources: nodes: 0") for msg in caplog.messages)
+        assert any(
+            msg.startswith("unrecognized forcing: prnc mode: parallel")
+            for msg in caplog.messages
         )
-        tmp_run_dir_files = {
-            fp.name
-            for fp in tmp_run_dir.iterdir()
-            if fp.is_file() and not fp.is_symlink()
-        }
-        assert "SoGWW3.sh" not in tmp_run_dir_files
 
-    def test_tmp_run_dir_symlinks(
-        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
-    ):
-        results_dir = tmp_path / "results_dir" / "15oct19"
-        start_date = arrow.get("2019-10-15")
-        wwatch3_cmd.run.run(
-            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
+    @pytest.mark.parametrize("restart", ("restart001.ww3", ["restart001.ww3"]))
+    def test_section_not_mapping(self, restart, run_desc, caplog, monkeypatch):
+        monkeypatch.setitem(run_desc, "restart", restart)
+        monkeypatch.setitem(run_desc, "output", None)
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run.RunConfig.from_run_desc(run_desc)
+        assert [record.levelname for record in caplog.records] == ["ERROR"] * 2
+        assert caplog.messages == [
+            f"invalid restart: {restart} - please use a section of key: value lines",
+            "invalid output: None - please use a section of key: value lines",
+        ]
+
+    def test_forcing_cache(self, run_desc, tmp_path, monkeypatch):
+        monkeypatch.setitem(
+            run_desc["forcing"], "forcing cache", os.fspath(tmp_path / "forcing_cache")
         )
-        tmp_run_dir = (
-            tmp_path
-            / "scratch"
-            / "wwatch3_runs"
-            / "SoGwaves_2019-10-15T170643.123456-0700"
+        config = wwatch3_cmd.run.RunConfig.from_run_desc(run_desc)
+        assert config.forcing_cache_dir == tmp_path / "forcing_cache"
+        assert not (tmp_path / "forcing_cache").exists()
+
+    def test_bad_forcing_cache(self, run_desc, caplog, monkeypatch):
+        monkeypatch.setitem(run_desc["forcing"], "forcing cache", 42)
+        monkeypatch.delitem(run_desc, "email")
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run.RunConfig.from_run_desc(run_desc)
+        assert any(
+            msg == "invalid forcing: forcing cache: 42 - please use a directory path"
+            for msg in caplog.messages
         )
-        tmp_run_dir_links = {fp.name for fp in tmp_run_dir.iterdir() if fp.is_symlink()}
-        assert tmp_run_dir_links == {"mod_def.ww3", "restart.ww3", "wind", "current"}
+        assert any("email" in msg for msg in caplog.messages)
 
-    def test_tmp_run_dir_symlinks_no_restart(
-        self,
-        mock_arrow_now_return,
+    def test_immutable(self, run_desc):
+        config = wwatch3_cmd.run.RunConfig.from_run_desc(run_desc)
+        with pytest.raises(AttributeError):
+            config.run_id = "SoGwaves_test"
+
+    def test_evolve(self, run_desc, tmp_path):
+        config = wwatch3_cmd.run.RunConfig.from_run_desc(run_desc)
+        evolved = config.evolve(restart_path=tmp_path / "restart001.ww3")
+        assert evolved.restart_path == tmp_path / "restart001.ww3"
+        assert evolved.run_id == config.run_id
+        assert config.restart_path != evolved.restart_path
+
+
+class TestTmpRunDirTemplate:
+    """Unit tests for _TmpRunDirTemplate class.
+    """
+
+    @staticmethod
+    @pytest.fixture
+    def extra_context(run_desc, tmp_path):
+        return {
+            "batch_directives": wwatch3_cmd.run._sbatch_directives(
+                wwatch3_cmd.run.RunConfig.from_run_desc(run_desc),
+                tmp_path / "results_dir",
+                "00:20:00",
+            ),
+            "module_loads": "module load netcdf-fortran-mpi/4.4.4",
+            "run_id": "SoGwaves_15oct19",
+            "run_start_dates_yyyymmdd": "20191015\n  20191016",
+            "results_dirs": f"{tmp_path/'results_dir'/'15oct19'}\n  {tmp_path/'results_dir'/'16oct19'}",
+            "work_dirs": f"{tmp_path/'tmp_run_dir'}\n  {tmp_path/'tmp_run_dir_16oct19'}",
+            "runs_dir": Path(run_desc["paths"]["runs directory"]),
+            "run_start_date_yyyymmdd": "20191015",
+            "run_end_date_yyyymmdd": "20191016",
+            "mod_def_ww3_path": Path(run_desc["grid"]["mod_def.ww3 file"]),
+            "current_forcing_dir": Path(run_desc["forcing"]["current"]),
+            "wind_forcing_dir": Path(run_desc["forcing"]["wind"]),
+            "restart_path": Path(run_desc["restart"]["restart.ww3"]),
+            "results_dir": tmp_path / "results_dir",
+        }
+
+    @pytest.mark.parametrize("node_local_scratch", (True, False))
+    @pytest.mark.parametrize("output", (True, False))
+    @pytest.mark.parametrize("checkpoint", (True, False))
+    @pytest.mark.parametrize("forcing_cache", (True, False))
+    @pytest.mark.parametrize("restart", (True, False))
+    def test_render_matches_cookiecutter(
+        self,
+        restart,
+        forcing_cache,
+        checkpoint,
+        output,
+        node_local_scratch,
+        extra_context,
+        tmp_path,
+    ):
+        if not restart:
+            extra_context["restart_path"] = ""
+        else:
+            extra_context["prefetch_restart"] = True
+        if forcing_cache:
+            extra_context["forcing_cache_dir"] = tmp_path / "forcing_cache"
+        if output:
+            extra_context.update(
+                output_fields="HS DIR T02",
+                fields_interval_seconds=3600,
+                points_interval_seconds=900,
+                output_points="  -123.72 49.34  'Halibut Bank'",
+                fields_nccopy_args="-d 4 -s -c time/1",
+            )
+        if checkpoint:
+            extra_context.update(checkpoint_interval_hours=6, run_start_hour=12)
+        if node_local_scratch:
+            extra_context.update(node_local_scratch=True, async_post=True)
+        cookiecutter_run_dir = tmp_path / "cookiecutter_run_dir"
+        cookiecutter.main.cookiecutter(
+            os.fspath(wwatch3_cmd.run.TEMPLATE_DIR),
+            no_input=True,
+            output_dir=tmp_path,
+            extra_context=dict(extra_context, tmp_run_dir=cookiecutter_run_dir),
+        )
+        template = wwatch3_cmd.run._TmpRunDirTemplate(wwatch3_cmd.run.TEMPLATE_DIR)
+        tmp_run_dir = template.render(
+            dict(extra_context, tmp_run_dir=tmp_path / "tmp_run_dir")
+        )
+        assert tmp_run_dir == tmp_path / "tmp_run_dir"
+        assert sorted(fp.name for fp in tmp_run_dir.iterdir()) == sorted(
+            fp.name for fp in cookiecutter_run_dir.iterdir()
+        )
+        for expected in cookiecutter_run_dir.iterdir():
+            rendered = tmp_run_dir / expected.name
+            assert rendered.read_bytes() == expected.read_bytes()
+            assert rendered.stat().st_mode == expected.stat().st_mode
+
+    def test_templates_compiled_once(self, run_desc, tmp_path, monkeypatch):
+        templates = []
+
+        class MockTmpRunDirTemplate(wwatch3_cmd.run._TmpRunDirTemplate):
+            def __init__(self, template_dir):
+                super().__init__(template_dir)
+                templates.append(self)
+
+        monkeypatch.setattr(
+            wwatch3_cmd.run, "_TmpRunDirTemplate", MockTmpRunDirTemplate
+        )
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml",
+            tmp_path / "results_dir",
+            arrow.get("2019-10-15"),
+            "00:20:00",
+            n_days=3,
+            no_submit=True,
+        )
+        assert len(templates) == 1
+
+
+class TestTmpRunDirRunDesc:
+    """Unit tests for _TmpRunDirRunDesc class and _write_tmp_run_dir_run_desc()
+    function.
+    """
+
+    def test_day_yaml_matches_full_dump(self, run_desc, tmp_path):
+        run_desc["resources"] = {"nodes": 1, "tasks per node": 40}
+        run_desc["restart"]["checkpoint interval"] = 6
+        tmp_run_dir_run_desc = wwatch3_cmd.run._TmpRunDirRunDesc(
+            run_desc, tmp_path / "wwatch3.yaml", 3
+        )
+        restart_path = tmp_path / "16oct19" / "restart001.ww3"
+        day_run_desc = dict(
+            run_desc,
+            run_id="SoGwaves_17oct19",
+            restart={**run_desc["restart"], "restart.ww3": os.fspath(restart_path)},
+        )
+        assert tmp_run_dir_run_desc.day_yaml(
+            "SoGwaves_17oct19", restart_path
+        ) == yaml.safe_dump(day_run_desc, default_flow_style=False)
+
+    def test_day_keys_sorted_with_other_keys(self, run_desc, tmp_path):
+        run_desc["walltime"] = "08:00:00"
+        run_desc["vcs revisions"] = {"wwatch3": "abc123"}
+        tmp_run_dir_run_desc = wwatch3_cmd.run._TmpRunDirRunDesc(
+            run_desc, tmp_path / "wwatch3.yaml", 2
+        )
+        restart_path = tmp_path / "15oct19" / "restart001.ww3"
+        day_yaml = tmp_run_dir_run_desc.day_yaml("SoGwaves_16oct19", restart_path)
+        day_run_desc = dict(
+            run_desc,
+            run_id="SoGwaves_16oct19",
+            restart={**run_desc["restart"], "restart.ww3": os.fspath(restart_path)},
+        )
+        assert day_yaml == yaml.safe_dump(day_run_desc, default_flow_style=False)
+        top_level_keys = [
+            line.split(":")[0]
+            for line in day_yaml.splitlines()
+            if not line.startswith((" ", "-"))
+        ]
+        assert top_level_keys[-3:] == ["run_id", "vcs revisions", "walltime"]
+
+    def test_run_desc_unchanged(self, run_desc, tmp_path):
+        expected = yaml.safe_dump(run_desc)
+        tmp_run_dir_run_desc = wwatch3_cmd.run._TmpRunDirRunDesc(
+            run_desc, tmp_path / "wwatch3.yaml", 2
+        )
+        tmp_run_dir_run_desc.day_yaml("SoGwaves_16oct19", tmp_path / "restart001.ww3")
+        assert yaml.safe_dump(run_desc) == expected
+
+    def test_cold_start(self, run_desc, tmp_path):
+        del run_desc["restart"]
+        tmp_run_dir_run_desc = wwatch3_cmd.run._TmpRunDirRunDesc(
+            run_desc, tmp_path / "wwatch3.yaml", 2
+        )
+        day_run_desc = yaml.safe_load(
+            tmp_run_dir_run_desc.day_yaml("SoGwaves_16oct19", "")
+        )
+        assert day_run_desc["restart"] == {"restart.ww3": ""}
+
+    def test_write_1_day_copies_desc_file(self, run_desc, tmp_path):
+        desc_file = tmp_path / "wwatch3.yaml"
+        tmp_run_dir = tmp_path / "tmp_run_dir"
+        tmp_run_dir.mkdir()
+        wwatch3_cmd.run._write_tmp_run_dir_run_desc(
+            wwatch3_cmd.run._TmpRunDirRunDesc(run_desc, desc_file, 1),
+            tmp_run_dir,
+            "SoGwaves",
+            tmp_path / "restart001.ww3",
+        )
+        assert (tmp_run_dir / "wwatch3.yaml").read_text() == desc_file.read_text()
+
+    def test_write_multi_day(self, run_desc, tmp_path):
+        tmp_run_dir = tmp_path / "tmp_run_dir"
+        tmp_run_dir.mkdir()
+        restart_path = tmp_path / "15oct19" / "restart001.ww3"
+        wwatch3_cmd.run._write_tmp_run_dir_run_desc(
+            wwatch3_cmd.run._TmpRunDirRunDesc(run_desc, tmp_path / "wwatch3.yaml", 2),
+            tmp_run_dir,
+            "SoGwaves_16oct19",
+            restart_path,
+        )
+        with (tmp_run_dir / "wwatch3.yaml").open("rt") as f:
+            day_run_desc = yaml.safe_load(f)
+        assert day_run_desc["run_id"] == "SoGwaves_16oct19"
+        assert day_run_desc["restart"]["restart.ww3"] == os.fspath(restart_path)
+        assert day_run_desc["forcing"] == run_desc["forcing"]
+
+
+class TestSymlinkTargets:
+    """Unit tests for _symlink_targets() function.
+    """
+
+    def test_symlink_targets(self, tmp_path):
+        targets = wwatch3_cmd.run._symlink_targets(
+            tmp_path / "mod_def.ww3",
+            tmp_path / "current",
+            tmp_path / "wind",
+            tmp_path / "restart001.ww3",
+        )
+        assert targets == {
+            "mod_def.ww3": tmp_path / "mod_def.ww3",
+            "wind": tmp_path / "wind",
+            "current": tmp_path / "current",
+            "restart.ww3": tmp_path / "restart001.ww3",
+        }
+
+    def test_no_restart(self, tmp_path):
+        targets = wwatch3_cmd.run._symlink_targets(
+            tmp_path / "mod_def.ww3", tmp_path / "current", tmp_path / "wind", ""
+        )
+        assert "restart.ww3" not in targets
+
+
+class TestCheckSymlinkTargets:
+    """Unit tests for _check_symlink_targets() function.
+    """
+
+    def test_targets_exist(self, tmp_path, caplog):
+        (tmp_path / "mod_def.ww3").write_bytes(b"")
+        (tmp_path / "wind").mkdir()
+        wwatch3_cmd.run._check_symlink_targets(
+            {"mod_def.ww3": tmp_path / "mod_def.ww3", "wind": tmp_path / "wind"}
+        )
+        assert not caplog.records
+
+    def test_missing_targets_reported_together(self, tmp_path, caplog):
+        (tmp_path / "wind").mkdir()
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run._check_symlink_targets(
+                {
+                    "mod_def.ww3": tmp_path / "mod_def.ww3",
+                    "wind": tmp_path / "wind",
+                    "restart.ww3": tmp_path / "restart001.ww3",
+                }
+            )
+        assert [record.levelname for record in caplog.records] == ["ERROR"] * 2
+        assert caplog.messages == [
+            f"mod_def.ww3 symlink target not found: {tmp_path/'mod_def.ww3'}",
+            f"restart.ww3 symlink target not found: {tmp_path/'restart001.ww3'}",
+        ]
+
+
+class TestRestartChain:
+    """Unit tests for _restart_chain() function.
+    """
+
+    def test_cold_start(self):
+        days = list(arrow.Arrow.range("day", arrow.get("2019-10-15"), limit=2))
+        assert wwatch3_cmd.run._restart_chain("", days, True) == ["", ""]
+
+    def test_1_day(self, tmp_path):
+        restart_path = tmp_path / "archive" / "restart001.ww3"
+        restart_paths = wwatch3_cmd.run._restart_chain(
+            restart_path, [arrow.get("2019-10-15")], False
+        )
+        assert restart_paths == [restart_path]
+
+    def test_multi_day(self, tmp_path):
+        days = list(arrow.Arrow.range("day", arrow.get("2019-10-15"), limit=3))
+        restart_paths = wwatch3_cmd.run._restart_chain(
+            tmp_path / "14oct19" / "restart001.ww3", days, True
+        )
+        assert restart_paths == [
+            tmp_path / "14oct19" / "restart001.ww3",
+            tmp_path / "15oct19" / "restart001.ww3",
+            tmp_path / "16oct19" / "restart001.ww3",
+        ]
+
+
+class TestCheckRestartChain:
+    """Unit tests for _check_restart_chain() function.
+    """
+
+    days = list(arrow.Arrow.range("day", arrow.get("2019-10-15"), limit=3))
+
+    def test_chain_written_by_run(self, tmp_path, caplog):
+        (tmp_path / "14oct19").mkdir()
+        (tmp_path / "14oct19" / "restart001.ww3").write_bytes(b"")
+        results_dirs = [
+            tmp_path / ddmmmyy for ddmmmyy in ("15oct19", "16oct19", "17oct19")
+        ]
+        wwatch3_cmd.run._check_restart_chain(
+            self.days,
+            [
+                tmp_path / ddmmmyy / "restart001.ww3"
+                for ddmmmyy in ("14oct19", "15oct19", "16oct19")
+            ],
+            results_dirs,
+        )
+        assert not caplog.records
+
+    def test_cold_start(self, tmp_path, caplog):
+        wwatch3_cmd.run._check_restart_chain(
+            self.days,
+            ["", "", ""],
+            [tmp_path / "15oct19", tmp_path / "16oct19", tmp_path / "17oct19"],
+        )
+        assert not caplog.records
+
+    def test_existing_restart_files(self, tmp_path, caplog):
+        restart_paths = []
+        for ddmmmyy in ("14oct19", "15oct19", "16oct19"):
+            (tmp_path / "archive" / ddmmmyy).mkdir(parents=True)
+            (tmp_path / "archive" / ddmmmyy / "restart001.ww3").write_bytes(b"")
+            restart_paths.append(tmp_path / "archive" / ddmmmyy / "restart001.ww3")
+        results_dirs = [
+            tmp_path / "results" / ddmmmyy
+            for ddmmmyy in ("15oct19", "16oct19", "17oct19")
+        ]
+        wwatch3_cmd.run._check_restart_chain(self.days, restart_paths, results_dirs)
+        assert not caplog.records
+
+    def test_broken_links_reported_together(self, tmp_path, caplog):
+        restart_paths = [
+            tmp_path / "archive" / ddmmmyy / "restart001.ww3"
+            for ddmmmyy in ("14oct19", "15oct19", "16oct19")
+        ]
+        results_dirs = [
+            tmp_path / "results" / ddmmmyy
+            for ddmmmyy in ("15oct19", "16oct19", "17oct19")
+        ]
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run._check_restart_chain(self.days, restart_paths, results_dirs)
+        assert [record.levelname for record in caplog.records] == ["ERROR"] * 3
+        assert caplog.messages[0] == (
+            f"restart file for 2019-10-15 not found: {restart_paths[0]}"
+        )
+        assert caplog.messages[1] == (
+            f"restart file for 2019-10-16 not found, and won't be written by this run: "
+            f"{restart_paths[1]} - 2019-10-15 gathers its restart file into "
+            f"{results_dirs[0]/'restart001.ww3'}"
+        )
+
+    def test_broken_chain_no_tmp_run_dir(
+        self, mock_subprocess_stdout, run_desc, tmp_path, caplog
+    ):
+        runs_dir = tmp_path / "scratch" / "wwatch3_runs"
+        runs_dir_contents = sorted(runs_dir.iterdir())
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run.run(
+                tmp_path / "wwatch3.yaml",
+                tmp_path / "results_dir",
+                arrow.get("2019-10-17"),
+                "00:20:00",
+                n_days=3,
+            )
+        assert caplog.messages == [
+            f"restart file for 2019-10-19 not found, and won't be written by this run: "
+            f"{runs_dir/'18oct19'/'restart001.ww3'} - 2019-10-18 gathers its restart "
+            f"file into {tmp_path/'results_dir'/'18oct19'/'restart001.ww3'}"
+        ]
+        assert sorted(runs_dir.iterdir()) == runs_dir_contents
+
+
+class TestPrefetchRestart:
+    """Unit tests for _prefetch_restart() function.
+    """
+
+    def test_prefetch_restart(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(wwatch3_cmd.run, "RESTART_PREFETCH_CHUNK_BYTES", 7)
+        restart_path = tmp_path / "restart001.ww3"
+        restart_path.write_bytes(bytes(range(100)))
+        tmp_run_dir = tmp_path / "tmp_run_dir"
+        tmp_run_dir.mkdir()
+        wwatch3_cmd.run._prefetch_restart(restart_path, tmp_run_dir, streams=3)
+        restart_ww3 = tmp_run_dir / "restart.ww3"
+        assert not restart_ww3.is_symlink()
+        assert restart_ww3.read_bytes() == bytes(range(100))
+        assert sorted(path.name for path in tmp_run_dir.iterdir()) == ["restart.ww3"]
+
+    def test_empty_restart(self, tmp_path):
+        restart_path = tmp_path / "restart001.ww3"
+        restart_path.write_bytes(b"")
+        wwatch3_cmd.run._prefetch_restart(restart_path, tmp_path)
+        assert (tmp_path / "restart.ww3").read_bytes() == b""
+
+    def test_copy_error(self, tmp_path, caplog):
+        tmp_run_dir = tmp_path / "tmp_run_dir"
+        tmp_run_dir.mkdir()
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run._prefetch_restart(tmp_path / "restart001.ww3", tmp_run_dir)
+        assert caplog.records[0].levelname == "ERROR"
+        assert caplog.messages[0].startswith(
+            f"unable to prefetch restart file {tmp_path/'restart001.ww3'}: "
+        )
+        assert not list(tmp_run_dir.iterdir())
+
+
+class TestLinkTmpRunDir:
+    """Unit test for _link_tmp_run_dir() function.
+    """
+
+    def test_link_tmp_run_dir(self, tmp_path):
+        tmp_run_dir = tmp_path / "tmp_run_dir"
+        tmp_run_dir.mkdir()
+        wwatch3_cmd.run._link_tmp_run_dir(
+            tmp_run_dir,
+            {"mod_def.ww3": tmp_path / "mod_def.ww3", "wind": tmp_path / "wind"},
+        )
+        assert sorted(fp.name for fp in tmp_run_dir.iterdir()) == [
+            "mod_def.ww3",
+            "wind",
+        ]
+        assert Path(os.readlink(tmp_run_dir / "wind")) == tmp_path / "wind"
+
+
+class TestBatchResources:
+    """Unit tests for _batch_resources() function.
+    """
+
+    def test_defaults(self, run_desc):
+        resources = wwatch3_cmd.run._batch_resources(run_desc)
+        assert resources == {
+            "nodes": 1,
+            "tasks per node": 20,
+            "constraint": "skylake",
+            "memory": 0,
+            "node-local scratch": False,
+            "n_procs": 20,
+        }
+
+    def test_resources_section(self, run_desc, monkeypatch):
+        monkeypatch.setitem(
+            run_desc,
+            "resources",
+            {
+                "nodes": 2,
+                "tasks per node": 48,
+                "constraint": "cascade",
+                "memory": "187G",
+            },
+        )
+        resources = wwatch3_cmd.run._batch_resources(run_desc)
+        assert resources == {
+            "nodes": 2,
+            "tasks per node": 48,
+            "constraint": "cascade",
+            "memory": "187G",
+            "node-local scratch": False,
+            "n_procs": 96,
+        }
+
+    def test_node_local_scratch(self, run_desc, monkeypatch):
+        monkeypatch.setitem(run_desc, "resources", {"node-local scratch": True})
+        resources = wwatch3_cmd.run._batch_resources(run_desc)
+        assert resources["node-local scratch"]
+
+    def test_node_local_scratch_multi_node(self, run_desc, caplog, monkeypatch):
+        monkeypatch.setitem(
+            run_desc, "resources", {"nodes": 2, "node-local scratch": True}
+        )
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run._batch_resources(run_desc)
+        assert caplog.records[0].levelname == "ERROR"
+        assert caplog.messages[0].startswith(
+            "resources: nodes: 2 - node-local scratch can only be used by runs on 1 node"
+        )
+
+    def test_bad_node_local_scratch(self, run_desc, caplog, monkeypatch):
+        monkeypatch.setitem(run_desc, "resources", {"node-local scratch": "yes"})
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run._batch_resources(run_desc)
+        assert caplog.messages[0] == (
+            "resources: node-local scratch: yes - please use true or false"
+        )
+
+    def test_too_many_tasks_per_node(self, run_desc, caplog, monkeypatch):
+        monkeypatch.setitem(
+            run_desc, "resources", {"tasks per node": 40, "constraint": "broadwell"}
+        )
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run._batch_resources(run_desc)
+        assert caplog.records[0].levelname == "ERROR"
+        assert caplog.messages[0] == (
+            "resources: tasks per node: 40 - broadwell nodes have at most 32 cores"
+        )
+
+    def test_errors_reported_together(self, run_desc, caplog, monkeypatch):
+        monkeypatch.setitem(
+            run_desc,
+            "resources",
+            {"nodes": 0, "tasks per node": "twenty", "memory": "lots"},
+        )
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run._batch_resources(run_desc)
+        assert [record.levelname for record in caplog.records] == ["ERROR"] * 3
+        assert caplog.messages[0].startswith("resources: nodes: 0")
+        assert caplog.messages[1].startswith("resources: tasks per node: twenty")
+        assert caplog.messages[2].startswith("resources: memory: lots")
+
+    def test_1_mpi_process(self, run_desc, caplog, monkeypatch):
+        monkeypatch.setitem(run_desc, "resources", {"tasks per node": 1})
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run._batch_resources(run_desc)
+        assert caplog.messages[0].startswith("resources: nodes * tasks per node: 1")
+
+    def test_unknown_constraint(self, run_desc, caplog, monkeypatch):
+        monkeypatch.setitem(run_desc, "resources", {"constraint": "rome"})
+        resources = wwatch3_cmd.run._batch_resources(run_desc)
+        assert caplog.records[0].levelname == "WARNING"
+        assert resources["constraint"] == "rome"
+
+
+class TestOutputSettings:
+    """Unit tests for _output_settings() function.
+    """
+
+    def test_defaults(self, run_desc):
+        output = wwatch3_cmd.run._output_settings(run_desc, 0)
+        assert output == {
+            "fields": "HS LM WND CUR FP T02 DIR DP WCH WCC TWO FOC USS",
+            "fields interval": 1800,
+            "points interval": 600,
+            "points": "",
+        }
+
+    def test_output_section(self, run_desc, monkeypatch):
+        monkeypatch.setitem(
+            run_desc,
+            "output",
+            {
+                "fields": {"names": ["HS", "DIR", "T02"], "interval": 3600},
+                "points": {
+                    "interval": 900,
+                    "locations": {
+                        "Halibut Bank": [-123.72, 49.34],
+                        "Sentry Shoal": [-125.0, 49.91],
+                    },
+                },
+            },
+        )
+        output = wwatch3_cmd.run._output_settings(run_desc, 6)
+        assert output == {
+            "fields": "HS DIR T02",
+            "fields interval": 3600,
+            "points interval": 900,
+            "points": (
+                "  -123.72 49.34  'Halibut Bank'\n  -125.0 49.91  'Sentry Shoal'"
+            ),
+        }
+
+    def test_errors_reported_together(self, run_desc, caplog, monkeypatch):
+        monkeypatch.setitem(
+            run_desc,
+            "output",
+            {
+                "fields": {"names": ["HS", "HSIG", "WAVE"], "interval": 7000},
+                "points": {
+                    "interval": 0,
+                    "locations": {"Halibut Bank": [49.34], "it's": [-123, 49]},
+                },
+            },
+        )
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run._output_settings(run_desc, 0)
+        assert [record.levelname for record in caplog.records] == ["ERROR"] * 5
+        assert caplog.messages[0].startswith(
+            "unknown output: fields: names: HSIG, WAVE"
+        )
+        assert caplog.messages[1].startswith("output: fields: interval: 7000")
+        assert caplog.messages[2].startswith("output: points: interval: 0")
+        assert caplog.messages[3].startswith(
+            "output: points: locations: Halibut Bank: [49.34]"
+        )
+        assert caplog.messages[4].startswith("output: points: locations: it's")
+
+    def test_interval_doesnt_divide_checkpoint_interval(
+        self, run_desc, caplog, monkeypatch
+    ):
+        monkeypatch.setitem(run_desc, "output", {"fields": {"interval": 10800}})
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run._output_settings(run_desc, 4)
+        assert caplog.messages[0] == (
+            "output: fields: interval: 10800 - please use a number of seconds that "
+            "divides into restart: checkpoint interval: 4 hours"
+        )
+
+    def test_no_point_locations(self, run_desc, caplog, monkeypatch):
+        monkeypatch.setitem(run_desc, "output", {"points": {"interval": 600}})
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run._output_settings(run_desc, 0)
+        assert caplog.messages[0].startswith(
+            "output: points: locations - please give at least one point"
+        )
+
+
+class TestFieldsNccopyArgs:
+    """Unit tests for _fields_nccopy_args() function.
+    """
+
+    def test_no_compression(self, run_desc):
+        assert wwatch3_cmd.run._fields_nccopy_args(run_desc, 1800) == ""
+
+    def test_defaults(self, run_desc, monkeypatch):
+        monkeypatch.setitem(run_desc, "output", {"compression": {}})
+        assert wwatch3_cmd.run._fields_nccopy_args(run_desc, 1800) == "-d 4 -s"
+
+    @pytest.mark.parametrize(
+        "chunking, chunk_spec",
+        (("time series", "time/48,latitude/10,longitude/10"), ("map", "time/1")),
+    )
+    def test_compression_section(self, chunking, chunk_spec, run_desc, monkeypatch):
+        monkeypatch.setitem(
+            run_desc,
+            "output",
+            {
+                "compression": {
+                    "deflate level": 6,
+                    "shuffle": False,
+                    "chunking": chunking,
+                }
+            },
+        )
+        nccopy_args = wwatch3_cmd.run._fields_nccopy_args(run_desc, 1800)
+        assert nccopy_args == f"-d 6 -c {chunk_spec}"
+
+    @pytest.mark.parametrize(
+        "fields_interval, chunk_spec",
+        ((3600, "time/24"), (1800, "time/48"), (600, "time/144")),
+    )
+    def test_time_series_chunk_per_day(
+        self, fields_interval, chunk_spec, run_desc, monkeypatch
+    ):
+        monkeypatch.setitem(
+            run_desc, "output", {"compression": {"chunking": "time series"}}
+        )
+        nccopy_args = wwatch3_cmd.run._fields_nccopy_args(run_desc, fields_interval)
+        assert nccopy_args == f"-d 4 -s -c {chunk_spec},latitude/10,longitude/10"
+
+    def test_errors_reported_together(self, run_desc, caplog, monkeypatch):
+        monkeypatch.setitem(
+            run_desc,
+            "output",
+            {
+                "compression": {
+                    "deflate level": 10,
+                    "shuffle": "yes",
+                    "chunking": "point",
+                }
+            },
+        )
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run._fields_nccopy_args(run_desc, 1800)
+        assert [record.levelname for record in caplog.records] == ["ERROR"] * 3
+        assert caplog.messages[0].startswith("output: compression: deflate level: 10")
+        assert caplog.messages[1].startswith("output: compression: shuffle: yes")
+        assert caplog.messages[2] == (
+            "unrecognized output: compression: chunking: point - "
+            "please use one of time series, map"
+        )
+
+
+class TestSbatchDirectives:
+    """Unit tests for _sbatch_directives() function.
+    """
+
+    def test_sbatch_directives(self, run_desc, tmp_path):
+        results_dir = tmp_path / "results_dir"
+        sbatch_directives = wwatch3_cmd.run._sbatch_directives(
+            wwatch3_cmd.run.RunConfig.from_run_desc(run_desc), results_dir, "00:20:00"
+        )
+        expected = textwrap.dedent(
+            f"""\
+            #SBATCH --job-name={run_desc['run_id']}
+            #SBATCH --mail-user=someone@eoas.ubc.ca
+            #SBATCH --mail-type=ALL
+            #SBATCH --account=def-allen
+            #SBATCH --constraint=skylake
+            #SBATCH --nodes=1
+            #SBATCH --ntasks-per-node=20
+            #SBATCH --mem=0
+            #SBATCH --time=00:20:00
+            # stdout and stderr file paths/names
+            #SBATCH --output={results_dir/"stdout"}
+            #SBATCH --error={results_dir/"stderr"}
+            """
+        )
+        assert sbatch_directives == expected
+
+    def test_sbatch_directives_resources(self, run_desc, tmp_path, monkeypatch):
+        monkeypatch.setitem(
+            run_desc,
+            "resources",
+            {"nodes": 2, "tasks per node": 40, "constraint": "cascade", "memory": "0"},
+        )
+        results_dir = tmp_path / "results_dir"
+        sbatch_directives = wwatch3_cmd.run._sbatch_directives(
+            wwatch3_cmd.run.RunConfig.from_run_desc(run_desc), results_dir, "00:20:00"
+        )
+        expected = textwrap.dedent(
+            f"""\
+            #SBATCH --job-name={run_desc['run_id']}
+            #SBATCH --mail-user=someone@eoas.ubc.ca
+            #SBATCH --mail-type=ALL
+            #SBATCH --account=def-allen
+            #SBATCH --constraint=cascade
+            #SBATCH --nodes=2
+            #SBATCH --ntasks-per-node=40
+            #SBATCH --mem=0
+            #SBATCH --time=00:20:00
+            # stdout and stderr file paths/names
+            #SBATCH --output={results_dir/"stdout"}
+            #SBATCH --error={results_dir/"stderr"}
+            """
+        )
+        assert sbatch_directives == expected
+
+    def test_sbatch_directives_array(self, run_desc, tmp_path):
+        results_dir = tmp_path / "results_dir"
+        sbatch_directives = wwatch3_cmd.run._sbatch_directives(
+            wwatch3_cmd.run.RunConfig.from_run_desc(run_desc),
+            results_dir,
+            "00:20:00",
+            array_size=3,
+        )
+        assert sbatch_directives.endswith(
+            textwrap.dedent(
+                f"""\
+                #SBATCH --time=00:20:00
+                #SBATCH --array=0-2
+                # stdout and stderr file paths/names
+                #SBATCH --output={results_dir/"stdout_%a"}
+                #SBATCH --error={results_dir/"stderr_%a"}
+                """
+            )
+        )
+
+    def test_sbatch_directives_signal(self, run_desc, tmp_path):
+        results_dir = tmp_path / "results_dir"
+        sbatch_directives = wwatch3_cmd.run._sbatch_directives(
+            wwatch3_cmd.run.RunConfig.from_run_desc(run_desc),
+            results_dir,
+            "00:20:00",
+            signal_seconds=300,
+        )
+        assert sbatch_directives.endswith(
+            textwrap.dedent(
+                f"""\
+                #SBATCH --time=00:20:00
+                #SBATCH --signal=B:TERM@300
+                # stdout and stderr file paths/names
+                #SBATCH --output={results_dir/"stdout"}
+                #SBATCH --error={results_dir/"stderr"}
+                """
+            )
+        )
+
+
+class TestCheckNodeLocalScratch:
+    """Unit tests for _check_node_local_scratch() function.
+    """
+
+    @pytest.mark.parametrize(
+        "node_local_scratch, pipeline_depth", ((True, 0), (False, 2))
+    )
+    def test_ok(self, node_local_scratch, pipeline_depth, caplog):
+        wwatch3_cmd.run._check_node_local_scratch(
+            {"node-local scratch": node_local_scratch}, pipeline_depth
+        )
+        assert not caplog.records
+
+    def test_pipeline_depth(self, caplog):
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run._check_node_local_scratch({"node-local scratch": True}, 2)
+        assert caplog.records[0].levelname == "ERROR"
+        assert caplog.messages[0] == (
+            "--pipeline-depth can't be used with resources: node-local scratch: true"
+        )
+
+
+class TestCheckJobArray:
+    """Unit tests for _check_job_array() function.
+    """
+
+    def test_cold_start(self, run_desc, caplog, monkeypatch):
+        monkeypatch.delitem(run_desc, "restart")
+        wwatch3_cmd.run._check_job_array(
+            wwatch3_cmd.run.RunConfig.from_run_desc(run_desc), 0, False, None
+        )
+        assert not caplog.records
+
+    def test_restart(self, run_desc, caplog):
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run._check_job_array(
+                wwatch3_cmd.run.RunConfig.from_run_desc(run_desc), 0, False, None
+            )
+        assert caplog.records[0].levelname == "ERROR"
+        assert caplog.messages[0].startswith(
+            "job array runs can't start from a restart file"
+        )
+
+    def test_incompatible_options(self, run_desc, caplog, monkeypatch):
+        monkeypatch.delitem(run_desc, "restart")
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run._check_job_array(
+                wwatch3_cmd.run.RunConfig.from_run_desc(run_desc), 1, True, 5
+            )
+        assert caplog.messages == [
+            "--pipeline-depth can't be used with --job-array",
+            "--async-post can't be used with --job-array",
+            "--max-days-per-job can't be used with --job-array",
+        ]
+
+    def test_checkpoints(self, run_desc, caplog, monkeypatch):
+        monkeypatch.setitem(run_desc, "restart", {"checkpoint interval": 6})
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run._check_job_array(
+                wwatch3_cmd.run.RunConfig.from_run_desc(run_desc), 0, False, None
+            )
+        assert caplog.messages[0].startswith(
+            "job array runs can't save mid-day checkpoints"
+        )
+
+
+class TestResume:
+    """Unit tests for `wwatch3 run --resume` run preparation.
+    """
+
+    @staticmethod
+    @pytest.fixture
+    def mock_load_run_desc_return(run_desc, monkeypatch):
+        def mock_return(*args):
+            return run_desc
+
+        monkeypatch.setattr(nemo_cmd.prepare, "load_run_desc", mock_return)
+
+    @staticmethod
+    def complete_days(results_dir, ddmmmyys, restart=True):
+        for ddmmmyy in ddmmmyys:
+            day_results_dir = results_dir / ddmmmyy
+            day_results_dir.mkdir(parents=True)
+            yyyymmdd = arrow.get(ddmmmyy, "DDMMMYY").format("YYYYMMDD")
+            (day_results_dir / f"SoG_ww3_fields_{yyyymmdd}_{yyyymmdd}.nc").write_bytes(
+                b""
+            )
+            if restart:
+                (day_results_dir / "restart001.ww3").write_bytes(b"")
+
+    def test_resume_after_complete_days(
+        self, mock_load_run_desc_return, run_desc, tmp_path, caplog
+    ):
+        results_dir = tmp_path / "results_dir"
+        self.complete_days(results_dir, ("15oct19", "16oct19"))
+        caplog.set_level(logging.INFO)
+        run_script_files = wwatch3_cmd.run._prepare_run(
+            Path("wwatch3.yaml"),
+            results_dir,
+            arrow.get("2019-10-15"),
+            "00:20:00",
+            n_days=4,
+            resume=True,
+        )
+        assert (
+            caplog.messages[0] == "resuming run at 2019-10-17 after 2 complete day(s)"
+        )
+        assert len(run_script_files) == 1
+        tmp_run_dirs = sorted(
+            Path(run_desc["paths"]["runs directory"]).glob("SoGwaves_*")
+        )
+        assert [tmp_run_dir.name.split("_")[1] for tmp_run_dir in tmp_run_dirs] == [
+            "17oct19",
+            "18oct19",
+        ]
+        sogww3_sh = run_script_files[0].read_text()
+        assert "RUN_START_DATES=(\n  20191017\n  20191018\n)" in sogww3_sh
+        restart_ww3 = run_script_files[0].parent / "restart.ww3"
+        assert (
+            Path(os.readlink(restart_ww3)) == results_dir / "16oct19" / "restart001.ww3"
+        )
+
+    def test_resume_1_remaining_day(
+        self, mock_load_run_desc_return, run_desc, tmp_path
+    ):
+        results_dir = tmp_path / "results_dir"
+        self.complete_days(results_dir, ("15oct19",))
+        run_script_files = wwatch3_cmd.run._prepare_run(
+            Path("wwatch3.yaml"),
+            results_dir,
+            arrow.get("2019-10-15"),
+            "00:20:00",
+            n_days=2,
+            resume=True,
+        )
+        tmp_run_dir = run_script_files[0].parent
+        assert tmp_run_dir.name.startswith("SoGwaves_16oct19_")
+        sogww3_sh = run_script_files[0].read_text()
+        assert f"RESULTS_DIRS=(\n  {results_dir/'16oct19'}\n)" in sogww3_sh
+        with (tmp_run_dir / "wwatch3.yaml").open("rt") as f:
+            tmp_run_dir_run_desc = yaml.safe_load(f)
+        assert tmp_run_dir_run_desc["restart"]["restart.ww3"] == os.fspath(
+            results_dir / "15oct19" / "restart001.ww3"
+        )
+
+    def test_missing_restart_day_not_complete(
+        self, mock_load_run_desc_return, run_desc, tmp_path
+    ):
+        results_dir = tmp_path / "results_dir"
+        self.complete_days(results_dir, ("15oct19",))
+        self.complete_days(results_dir, ("16oct19",), restart=False)
+        run_script_files = wwatch3_cmd.run._prepare_run(
+            Path("wwatch3.yaml"),
+            results_dir,
+            arrow.get("2019-10-15"),
+            "00:20:00",
+            n_days=3,
+            resume=True,
+        )
+        assert run_script_files[0].parent.name.startswith("SoGwaves_16oct19_")
+
+    def test_partial_day_fields_complete(
+        self, mock_load_run_desc_return, run_desc, tmp_path, caplog
+    ):
+        results_dir = tmp_path / "results_dir"
+        self.complete_days(results_dir, ("15oct19",))
+        day_results_dir = results_dir / "16oct19"
+        day_results_dir.mkdir()
+        (day_results_dir / "SoG_ww3_fields_20191016_20191016_12.nc").write_bytes(b"")
+        (day_results_dir / "restart001.ww3").write_bytes(b"")
+        self.complete_days(results_dir, ("17oct19",))
+        caplog.set_level(logging.INFO)
+        run_script_files = wwatch3_cmd.run._prepare_run(
+            Path("wwatch3.yaml"),
+            results_dir,
+            arrow.get("2019-10-15"),
+            "00:20:00",
+            n_days=4,
+            resume=True,
+        )
+        assert caplog.records[0].levelname == "WARNING"
+        assert caplog.messages[0] == (
+            f"2019-10-16 was restarted from a checkpoint; its fields in "
+            f"{day_results_dir / 'SoG_ww3_fields_20191016_20191016_12.nc'} are partial"
+        )
+        assert (
+            caplog.messages[1] == "resuming run at 2019-10-18 after 3 complete day(s)"
+        )
+        assert run_script_files[0].parent.name.startswith("SoGwaves_18oct19_")
+
+    def test_partial_day_fields_without_restart_not_complete(
+        self, mock_load_run_desc_return, run_desc, tmp_path
+    ):
+        results_dir = tmp_path / "results_dir"
+        self.complete_days(results_dir, ("15oct19",))
+        day_results_dir = results_dir / "16oct19"
+        day_results_dir.mkdir()
+        (day_results_dir / "SoG_ww3_fields_20191016_20191016_12.nc").write_bytes(b"")
+        run_script_files = wwatch3_cmd.run._prepare_run(
+            Path("wwatch3.yaml"),
+            results_dir,
+            arrow.get("2019-10-15"),
+            "00:20:00",
+            n_days=3,
+            resume=True,
+        )
+        assert run_script_files[0].parent.name.startswith("SoGwaves_16oct19_")
+
+    def test_cold_start_needs_no_restart(
+        self, mock_load_run_desc_return, run_desc, tmp_path, monkeypatch
+    ):
+        monkeypatch.delitem(run_desc, "restart")
+        results_dir = tmp_path / "results_dir"
+        self.complete_days(results_dir, ("15oct19",), restart=False)
+        run_script_files = wwatch3_cmd.run._prepare_run(
+            Path("wwatch3.yaml"),
+            results_dir,
+            arrow.get("2019-10-15"),
+            "00:20:00",
+            n_days=2,
+            resume=True,
+        )
+        assert run_script_files[0].parent.name.startswith("SoGwaves_16oct19_")
+        assert not (run_script_files[0].parent / "restart.ww3").exists()
+
+    def test_all_days_complete(
+        self, mock_load_run_desc_return, run_desc, tmp_path, caplog
+    ):
+        results_dir = tmp_path / "results_dir"
+        self.complete_days(results_dir, ("15oct19", "16oct19"))
+        caplog.set_level(logging.INFO)
+        run_script_files = wwatch3_cmd.run._prepare_run(
+            Path("wwatch3.yaml"),
+            results_dir,
+            arrow.get("2019-10-15"),
+            "00:20:00",
+            n_days=2,
+            resume=True,
+        )
+        assert run_script_files == []
+        assert caplog.messages[0].startswith("all 2 day(s) of the run are complete")
+        assert not list(Path(run_desc["paths"]["runs directory"]).glob("SoGwaves_*"))
+
+    def test_no_complete_days(self, mock_load_run_desc_return, run_desc, tmp_path):
+        run_script_files = wwatch3_cmd.run._prepare_run(
+            Path("wwatch3.yaml"),
+            tmp_path / "results_dir",
+            arrow.get("2019-10-15"),
+            "00:20:00",
+            n_days=2,
+            resume=True,
+        )
+        assert run_script_files[0].parent.name.startswith("SoGwaves_15oct19_")
+
+    def test_resume_from_checkpoint(
+        self, mock_load_run_desc_return, run_desc, tmp_path, monkeypatch
+    ):
+        monkeypatch.setitem(run_desc["restart"], "checkpoint interval", 6)
+        results_dir = tmp_path / "results_dir"
+        self.complete_days(results_dir, ("15oct19",))
+        TestResumeCheckpoint.write_checkpoint(results_dir / "16oct19", hour=12)
+        run_script_files = wwatch3_cmd.run._prepare_run(
+            Path("wwatch3.yaml"),
+            results_dir,
+            arrow.get("2019-10-15"),
+            "00:20:00",
+            n_days=3,
+            resume=True,
+        )
+        tmp_run_dirs = sorted(
+            Path(run_desc["paths"]["runs directory"]).glob("SoGwaves_*")
+        )
+        assert Path(os.readlink(tmp_run_dirs[0] / "restart.ww3")) == (
+            results_dir / "16oct19" / "checkpoint_restart.ww3"
+        )
+        assert Path(os.readlink(tmp_run_dirs[1] / "restart.ww3")) == (
+            results_dir / "16oct19" / "restart001.ww3"
+        )
+        ww3_shel_inp = (tmp_run_dirs[0] / "ww3_shel.inp").read_text()
+        assert "   20191016 120000  Start time (YYYYMMDD HHmmss)\n" in ww3_shel_inp
+        assert "  20191016 180000 21600 20191017 000000\n" in ww3_shel_inp
+        ww3_ounf_inp = (tmp_run_dirs[0] / "ww3_ounf.inp").read_text()
+        assert "  20191016 120000 1800 24\n" in ww3_ounf_inp
+        ww3_shel_inp = (tmp_run_dirs[1] / "ww3_shel.inp").read_text()
+        assert "   20191017 000000  Start time (YYYYMMDD HHmmss)\n" in ww3_shel_inp
+        assert "  20191017 060000 21600 20191018 000000\n" in ww3_shel_inp
+        sogww3_sh = run_script_files[0].read_text()
+        assert "FIRST_DAY_START_HOUR=12\n" in sogww3_sh
+        assert (
+            "  { (( i > 0 )) || mv SoG_ww3_fields_${RUN_START_DATES[i]}_${RUN_START_DATES[i]}.nc \\\n"
+            "    SoG_ww3_fields_${RUN_START_DATES[i]}_${RUN_START_DATES[i]}_12.nc; } && \\\n"
+        ) in sogww3_sh
+        assert (
+            "  rm -f ${RESULTS_DIRS[i]}/checkpoint_restart.ww3 ${RESULTS_DIRS[i]}/${CHECKPOINT_FILE}\n"
+        ) in sogww3_sh
+
+
+class TestCheckpointHours:
+    """Unit tests for _checkpoint_hours() function.
+    """
+
+    def test_no_checkpoints(self, run_desc):
+        assert wwatch3_cmd.run._checkpoint_hours(run_desc) == 0
+
+    def test_checkpoint_interval(self, run_desc, monkeypatch):
+        monkeypatch.setitem(run_desc["restart"], "checkpoint interval", 6)
+        assert wwatch3_cmd.run._checkpoint_hours(run_desc) == 6
+
+    @pytest.mark.parametrize("checkpoint_hours", (0, 5, 24, 2.5, "6", True))
+    def test_bad_checkpoint_interval(
+        self, checkpoint_hours, run_desc, caplog, monkeypatch
+    ):
+        monkeypatch.setitem(
+            run_desc["restart"], "checkpoint interval", checkpoint_hours
+        )
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run._checkpoint_hours(run_desc)
+        assert caplog.records[0].levelname == "ERROR"
+        assert caplog.messages[0].startswith(
+            f"invalid restart: checkpoint interval: {checkpoint_hours}"
+        )
+
+
+class TestPrefetchRestartSetting:
+    """Unit tests for _prefetch_restart_setting() function.
+    """
+
+    def test_no_prefetch(self, run_desc):
+        assert not wwatch3_cmd.run._prefetch_restart_setting(run_desc)
+
+    def test_prefetch(self, run_desc, monkeypatch):
+        monkeypatch.setitem(run_desc["restart"], "prefetch", True)
+        assert wwatch3_cmd.run._prefetch_restart_setting(run_desc)
+
+    @pytest.mark.parametrize("prefetch", ("yes", 1))
+    def test_bad_prefetch(self, prefetch, run_desc, caplog, monkeypatch):
+        monkeypatch.setitem(run_desc["restart"], "prefetch", prefetch)
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run._prefetch_restart_setting(run_desc)
+        assert caplog.records[0].levelname == "ERROR"
+        assert caplog.messages[0] == (
+            f"invalid restart: prefetch: {prefetch} - please use true or false"
+        )
+
+    def test_prefetch_no_restart_file(self, run_desc, caplog, monkeypatch):
+        monkeypatch.setitem(run_desc, "restart", {"prefetch": True})
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run._prefetch_restart_setting(run_desc)
+        assert caplog.messages[0].startswith(
+            "restart: prefetch: true can't be used without restart: restart.ww3"
+        )
+
+
+class TestResumeCheckpoint:
+    """Unit tests for _resume_checkpoint() function.
+    """
+
+    @staticmethod
+    def write_checkpoint(day_results_dir, day="20191016", hour=12):
+        day_results_dir.mkdir(parents=True, exist_ok=True)
+        (day_results_dir / "checkpoint_restart.ww3").write_bytes(b"")
+        (day_results_dir / "wwatch3_checkpoint.json").write_text(
+            json.dumps({"day": day, "hour": hour, "restart": "checkpoint_restart.ww3"})
+        )
+
+    def test_checkpoint(self, tmp_path, caplog):
+        day_results_dir = tmp_path / "16oct19"
+        self.write_checkpoint(day_results_dir)
+        caplog.set_level(logging.INFO)
+        checkpoint = wwatch3_cmd.run._resume_checkpoint(
+            arrow.get("2019-10-16"), day_results_dir
+        )
+        assert checkpoint == (day_results_dir / "checkpoint_restart.ww3", 12)
+        assert caplog.messages[0].startswith(
+            "resuming 2019-10-16 from its 12:00 checkpoint"
+        )
+
+    def test_no_checkpoint(self, tmp_path, caplog):
+        checkpoint = wwatch3_cmd.run._resume_checkpoint(
+            arrow.get("2019-10-16"), tmp_path / "16oct19"
+        )
+        assert checkpoint is None
+        assert not caplog.records
+
+    @pytest.mark.parametrize("day, hour", (("20191015", 12), ("20191016", 0)))
+    def test_invalid_checkpoint(self, day, hour, tmp_path, caplog):
+        day_results_dir = tmp_path / "16oct19"
+        self.write_checkpoint(day_results_dir, day, hour)
+        checkpoint = wwatch3_cmd.run._resume_checkpoint(
+            arrow.get("2019-10-16"), day_results_dir
+        )
+        assert checkpoint is None
+        assert caplog.records[0].levelname == "WARNING"
+        assert caplog.messages[0].startswith("ignored invalid checkpoint record")
+
+    def test_missing_checkpoint_restart_file(self, tmp_path, caplog):
+        day_results_dir = tmp_path / "16oct19"
+        self.write_checkpoint(day_results_dir)
+        (day_results_dir / "checkpoint_restart.ww3").unlink()
+        checkpoint = wwatch3_cmd.run._resume_checkpoint(
+            arrow.get("2019-10-16"), day_results_dir
+        )
+        assert checkpoint is None
+        assert caplog.records[0].levelname == "WARNING"
+
+
+class TestCheckForcingFiles:
+    """Unit tests for _check_forcing_files() function.
+    """
+
+    def test_forcing_files_available(self, run_desc, caplog):
+        days = list(arrow.Arrow.range("day", arrow.get("2019-10-30"), limit=2))
+        wwatch3_cmd.run._check_forcing_files(
+            days,
+            Path(run_desc["forcing"]["current"]),
+            Path(run_desc["forcing"]["wind"]),
+        )
+        assert not caplog.records
+
+    def test_missing_days(self, run_desc, caplog):
+        days = list(arrow.Arrow.range("day", arrow.get("2019-10-31"), limit=3))
+        current_dir = Path(run_desc["forcing"]["current"])
+        (current_dir / "SoG_current_20191101.nc").write_bytes(b"")
+        wind_dir = Path(run_desc["forcing"]["wind"])
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run._check_forcing_files(days, current_dir, wind_dir)
+        assert caplog.messages == [
+            f"1 current forcing file(s) missing from {current_dir}: "
+            f"SoG_current_20191102.nc",
+            f"2 wind forcing file(s) missing from {wind_dir}: "
+            f"SoG_wind_20191101.nc, SoG_wind_20191102.nc",
+        ]
+
+    def test_missing_forcing_dir(self, run_desc, tmp_path, caplog):
+        days = [arrow.get("2019-10-15")]
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run._check_forcing_files(
+                days, Path(run_desc["forcing"]["current"]), tmp_path / "no_wind"
+            )
+        assert caplog.records[0].levelname == "ERROR"
+        assert caplog.messages[0].startswith("unable to read wind forcing directory")
+
+    def test_no_tmp_run_dir_for_missing_days(
+        self, run_desc, tmp_path, monkeypatch, caplog
+    ):
+        def mock_load_run_desc(desc_file):
+            return run_desc
+
+        monkeypatch.setattr(nemo_cmd.prepare, "load_run_desc", mock_load_run_desc)
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run.run(
+                Path("wwatch3.yaml"),
+                tmp_path / "results_dir",
+                start_date=arrow.get("2019-10-30"),
+                walltime="00:20:00",
+                n_days=3,
+                no_submit=True,
+            )
+        runs_dir = Path(run_desc["paths"]["runs directory"])
+        assert not list(runs_dir.glob("SoGwaves_*"))
+
+
+class TestForcingFileNames:
+    """Unit tests for _forcing_file_names() function.
+    """
+
+    def test_forcing_file_names(self, tmp_path):
+        forcing_dir = tmp_path / "wind"
+        forcing_dir.mkdir()
+        (forcing_dir / "SoG_wind_20191015.nc").write_bytes(b"")
+        (forcing_dir / "README").write_text("")
+        file_names = wwatch3_cmd.run._forcing_file_names(forcing_dir)
+        assert file_names == {"SoG_wind_20191015.nc"}
+
+    def test_index_file(self, tmp_path, forcing_index_cache_dir):
+        forcing_dir = tmp_path / "wind"
+        forcing_dir.mkdir()
+        (forcing_dir / "SoG_wind_20191015.nc").write_bytes(b"")
+        wwatch3_cmd.run._forcing_file_names(forcing_dir)
+        index_file = forcing_index_cache_dir / "wwatch3" / "forcing_index.json"
+        index = json.loads(index_file.read_text())
+        assert index == {
+            os.fspath(forcing_dir): {
+                "mtime_ns": forcing_dir.stat().st_mtime_ns,
+                "files": ["SoG_wind_20191015.nc"],
+            }
+        }
+
+    def test_unchanged_dir_not_scanned(self, tmp_path, monkeypatch):
+        forcing_dir = tmp_path / "wind"
+        forcing_dir.mkdir()
+        (forcing_dir / "SoG_wind_20191015.nc").write_bytes(b"")
+        wwatch3_cmd.run._forcing_file_names(forcing_dir)
+
+        def mock_scandir(path):
+            raise AssertionError(f"unexpected scan of {path}")
+
+        monkeypatch.setattr(wwatch3_cmd.run.os, "scandir", mock_scandir)
+        file_names = wwatch3_cmd.run._forcing_file_names(forcing_dir)
+        assert file_names == {"SoG_wind_20191015.nc"}
+
+    def test_changed_dir_rescanned(self, tmp_path):
+        forcing_dir = tmp_path / "wind"
+        forcing_dir.mkdir()
+        (forcing_dir / "SoG_wind_20191015.nc").write_bytes(b"")
+        wwatch3_cmd.run._forcing_file_names(forcing_dir)
+        (forcing_dir / "SoG_wind_20191016.nc").write_bytes(b"")
+        os.utime(forcing_dir, ns=(0, forcing_dir.stat().st_mtime_ns + 1))
+        file_names = wwatch3_cmd.run._forcing_file_names(forcing_dir)
+        assert file_names == {"SoG_wind_20191015.nc", "SoG_wind_20191016.nc"}
+
+    def test_corrupt_index_file(self, tmp_path, forcing_index_cache_dir):
+        index_file = forcing_index_cache_dir / "wwatch3" / "forcing_index.json"
+        index_file.parent.mkdir(parents=True)
+        index_file.write_text('{"/results/forcing/wind": {"mtime_ns": 16')
+        forcing_dir = tmp_path / "wind"
+        forcing_dir.mkdir()
+        (forcing_dir / "SoG_wind_20191015.nc").write_bytes(b"")
+        file_names = wwatch3_cmd.run._forcing_file_names(forcing_dir)
+        assert file_names == {"SoG_wind_20191015.nc"}
+        assert os.fspath(forcing_dir) in json.loads(index_file.read_text())
+
+    def test_concurrent_updates_merged(self, tmp_path, forcing_index_cache_dir):
+        forcing_dirs = []
+        for n in range(16):
+            forcing_dir = tmp_path / f"forcing_{n}"
+            forcing_dir.mkdir()
+            (forcing_dir / f"SoG_wind_201910{n + 10}.nc").write_bytes(b"")
+            forcing_dirs.append(forcing_dir)
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(wwatch3_cmd.run._forcing_file_names, forcing_dirs))
+        index_dir = forcing_index_cache_dir / "wwatch3"
+        index = json.loads((index_dir / "forcing_index.json").read_text())
+        assert sorted(index) == sorted(map(os.fspath, forcing_dirs))
+        assert [path.name for path in index_dir.iterdir()] == ["forcing_index.json"]
+
+
+class TestTmpRunDir:
+    """Integration tests for temporary run directory generated by `wwatch3 run` sub-command.
+    """
+
+    @staticmethod
+    @pytest.fixture
+    def mock_arrow_now_return(monkeypatch):
+        def mock_return(*args):
+            return arrow.get("2019-10-15 17:06:43.123456-0700")
+
+        monkeypatch.setattr(arrow, "now", mock_return)
+
+    def test_tmp_run_dir_name_1_day(
+        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    ):
+        results_dir = tmp_path / "results_dir" / "15oct19"
+        start_date = arrow.get("2019-10-15")
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
+        )
+        assert (
+            tmp_path
+            / "scratch"
+            / "wwatch3_runs"
+            / "SoGwaves_2019-10-15T170643.123456-0700"
+        ).exists()
+
+    def test_tmp_run_dir_names_2_days(
+        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    ):
+        results_dir = tmp_path / "results_dir"
+        start_date = arrow.get("2019-10-15")
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00", n_days=2
+        )
+        assert (
+            tmp_path
+            / "scratch"
+            / "wwatch3_runs"
+            / "SoGwaves_15oct19_2019-10-15T170643.123456-0700"
+        ).exists()
+        assert (
+            tmp_path
+            / "scratch"
+            / "wwatch3_runs"
+            / "SoGwaves_16oct19_2019-10-15T170643.123456-0700"
+        ).exists()
+
+    def test_results_dir_name_1_day(
+        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    ):
+        results_dir = tmp_path / "results_dir" / "15oct19"
+        start_date = arrow.get("2019-10-15")
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
+        )
+        assert results_dir.exists()
+
+    def test_results_dir_names_2_days(
+        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    ):
+        results_dir = tmp_path / "results_dir"
+        start_date = arrow.get("2019-10-15")
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00", n_days=2
+        )
+        assert (results_dir / "15oct19").exists()
+        assert (results_dir / "16oct19").exists()
+
+    def test_tmp_run_dir_files(
+        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    ):
+        results_dir = tmp_path / "results_dir" / "15oct19"
+        start_date = arrow.get("2019-10-15")
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
+        )
+        template_dir = (
+            Path(__file__).parent.parent
+            / "cookiecutter"
+            / "{{cookiecutter.tmp_run_dir}}"
+        )
+        template_files = {fp.name for fp in template_dir.iterdir()}
+        tmp_run_dir = (
+            tmp_path
+            / "scratch"
+            / "wwatch3_runs"
+            / "SoGwaves_2019-10-15T170643.123456-0700"
+        )
+        tmp_run_dir_files = {
+            fp.name
+            for fp in tmp_run_dir.iterdir()
+            if fp.is_file() and not fp.is_symlink()
+        }
+        assert tmp_run_dir_files.difference(template_files) == {"wwatch3.yaml"}
+
+    def test_tmp_run_dir_files_2nd_day_no_SoGWW3_sh(
+        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    ):
+        results_dir = tmp_path / "results_dir"
+        start_date = arrow.get("2019-10-15")
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00", n_days=2
+        )
+        template_dir = (
+            Path(__file__).parent.parent
+            / "cookiecutter"
+            / "{{cookiecutter.tmp_run_dir}}"
+        )
+        tmp_run_dir = (
+            tmp_path
+            / "scratch"
+            / "wwatch3_runs"
+            / "SoGwaves_16oct19_2019-10-15T170643.123456-0700"
+        )
+        tmp_run_dir_files = {
+            fp.name
+            for fp in tmp_run_dir.iterdir()
+            if fp.is_file() and not fp.is_symlink()
+        }
+        assert "SoGWW3.sh" not in tmp_run_dir_files
+
+    def test_tmp_run_dir_symlinks(
+        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    ):
+        results_dir = tmp_path / "results_dir" / "15oct19"
+        start_date = arrow.get("2019-10-15")
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
+        )
+        tmp_run_dir = (
+            tmp_path
+            / "scratch"
+            / "wwatch3_runs"
+            / "SoGwaves_2019-10-15T170643.123456-0700"
+        )
+        tmp_run_dir_links = {fp.name for fp in tmp_run_dir.iterdir() if fp.is_symlink()}
+        assert tmp_run_dir_links == {"mod_def.ww3", "restart.ww3", "wind", "current"}
+
+    def test_tmp_run_dir_symlinks_no_restart(
+        self,
+        mock_arrow_now_return,
+        mock_subprocess_stdout,
+        run_desc,
+        tmp_path,
+        monkeypatch,
+    ):
+        def mock_load_run_desc_return(*args):
+            monkeypatch.delitem(run_desc, "restart")
+            return run_desc
+
+        monkeypatch.setattr(
+            nemo_cmd.prepare, "load_run_desc", mock_load_run_desc_return
+        )
+        results_dir = tmp_path / "results_dir" / "15oct19"
+        start_date = arrow.get("2019-10-15")
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
+        )
+        tmp_run_dir = (
+            tmp_path
+            / "scratch"
+            / "wwatch3_runs"
+            / "SoGwaves_2019-10-15T170643.123456-0700"
+        )
+        tmp_run_dir_links = {fp.name for fp in tmp_run_dir.iterdir() if fp.is_symlink()}
+        assert tmp_run_dir_links == {"mod_def.ww3", "wind", "current"}
+
+    def test_restart_symlink_target(
+        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    ):
+        results_dir = tmp_path / "results_dir" / "15oct19"
+        start_date = arrow.get("2019-10-15")
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
+        )
+        tmp_run_dir = (
+            tmp_path
+            / "scratch"
+            / "wwatch3_runs"
+            / "SoGwaves_2019-10-15T170643.123456-0700"
+        )
+        assert os.readlink(tmp_run_dir / "restart.ww3") == os.fspath(
+            tmp_path / "scratch" / "wwatch3_runs" / "14oct19" / "restart001.ww3"
+        )
+
+    def test_restart_symlink_target_2nd_day(
+        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    ):
+        results_dir = tmp_path / "results_dir"
+        start_date = arrow.get("2019-10-15")
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00", n_days=2
+        )
+        tmp_run_dir = (
+            tmp_path
+            / "scratch"
+            / "wwatch3_runs"
+            / "SoGwaves_16oct19_2019-10-15T170643.123456-0700"
+        )
+        assert os.readlink(tmp_run_dir / "restart.ww3") == os.fspath(
+            tmp_path / "scratch" / "wwatch3_runs" / "15oct19" / "restart001.ww3"
+        )
+
+    def test_prefetched_restart(
+        self,
+        mock_arrow_now_return,
+        mock_subprocess_stdout,
+        run_desc,
+        tmp_path,
+        monkeypatch,
+    ):
+        def mock_load_run_desc_return(*args):
+            monkeypatch.setitem(run_desc["restart"], "prefetch", True)
+            return run_desc
+
+        monkeypatch.setattr(
+            nemo_cmd.prepare, "load_run_desc", mock_load_run_desc_return
+        )
+        restart_path = Path(run_desc["restart"]["restart.ww3"])
+        restart_path.write_bytes(b"restart")
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml",
+            tmp_path / "results_dir",
+            arrow.get("2019-10-15"),
+            "00:20:00",
+            n_days=2,
+        )
+        runs_dir = tmp_path / "scratch" / "wwatch3_runs"
+        tmp_run_dir = runs_dir / "SoGwaves_15oct19_2019-10-15T170643.123456-0700"
+        assert not (tmp_run_dir / "restart.ww3").is_symlink()
+        assert (tmp_run_dir / "restart.ww3").read_bytes() == b"restart"
+        assert "[[ -L restart.ww3 ]] || rm -f restart.ww3" in (
+            (tmp_run_dir / "SoGWW3.sh").read_text()
+        )
+        tmp_run_dir_16oct19 = (
+            runs_dir / "SoGwaves_16oct19_2019-10-15T170643.123456-0700"
+        )
+        assert (tmp_run_dir_16oct19 / "restart.ww3").is_symlink()
+
+    def test_timings_run_id_multi_day(
+        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    ):
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml",
+            tmp_path / "results_dir",
+            arrow.get("2019-10-15"),
+            "00:20:00",
+            n_days=3,
+            max_days_per_job=2,
+            no_submit=True,
+        )
+        runs_dir = tmp_path / "scratch" / "wwatch3_runs"
+        run_scripts = sorted(runs_dir.glob("SoGwaves_*/SoGWW3.sh"))
+        assert len(run_scripts) == 2
+        for run_script in run_scripts:
+            timings_record = next(
+                line
+                for line in run_script.read_text().splitlines()
+                if '"stage' in line and "echo" in line
+            )
+            assert timings_record.startswith('  echo "{\\"run_id\\": \\"SoGwaves\\", ')
+
+    def test_job_chain_2nd_job(
+        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    ):
+        results_dir = tmp_path / "results_dir"
+        start_date = arrow.get("2019-10-15")
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml",
+            results_dir,
+            start_date,
+            "00:20:00",
+            n_days=3,
+            max_days_per_job=2,
+            no_submit=True,
+        )
+        runs_dir = tmp_path / "scratch" / "wwatch3_runs"
+        tmp_run_dir = runs_dir / "SoGwaves_17oct19_2019-10-15T170643.123456-0700"
+        sogww3_sh = (tmp_run_dir / "SoGWW3.sh").read_text()
+        assert f"#SBATCH --output={results_dir / '17oct19' / 'stdout'}\n" in sogww3_sh
+        assert f"RESULTS_DIRS=(\n  {results_dir / '17oct19'}\n)\n" in sogww3_sh
+        assert f"WORK_DIRS=(\n  {tmp_run_dir}\n)\n" in sogww3_sh
+        assert os.readlink(tmp_run_dir / "restart.ww3") == os.fspath(
+            runs_dir / "16oct19" / "restart001.ww3"
+        )
+        assert not (
+            runs_dir / "SoGwaves_16oct19_2019-10-15T170643.123456-0700" / "SoGWW3.sh"
+        ).exists()
+
+    def test_ww3_ounf_inp_file(
+        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    ):
+        results_dir = tmp_path / "results_dir" / "15oct19"
+        start_date = arrow.get("2019-10-15")
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
+        )
+        run_start_date_yyyymmdd = start_date.format("YYYYMMDD")
+        expected = textwrap.dedent(
+            f"""\
+            $ WAVEWATCH III NETCDF Grid output post-processing
+            $
+            $ First output time (YYYYMMDD HHmmss), output increment (s), number of output times
+              {run_start_date_yyyymmdd} 000000 1800 48
+            $
+            $ Fields
+              N  by name
+              HS LM WND CUR FP T02 DIR DP WCH WCC TWO FOC USS
+            $
+            $ netCDF4 output
+            $ real numbers
+            $ swell partitions
+            $ one file
+              4
+              4
+              0 1 2
+              T
+            $
+            $ File prefix
+            $ number of characters in date
+            $ IX, IY range
+            $
+              SoG_ww3_fields_
+              8
+              1 1000000 1 1000000
+            """
+        )
+        tmp_run_dir = (
+            tmp_path
+            / "scratch"
+            / "wwatch3_runs"
+            / "SoGwaves_2019-10-15T170643.123456-0700"
+        )
+        tmp_run_dir_lines = (tmp_run_dir / "ww3_ounf.inp").read_text().splitlines()
+        assert tmp_run_dir_lines == expected.splitlines()
+
+    def test_ww3_ounp_inp_file(
+        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    ):
+        results_dir = tmp_path / "results_dir" / "15oct19"
+        start_date = arrow.get("2019-10-15")
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
+        )
+        run_start_date_yyyymmdd = start_date.format("YYYYMMDD")
+        expected = textwrap.dedent(
+            f"""\
+            $ WAVEWATCH III NETCDF Point output post-processing
+            $
+            $ First output time (YYYYMMDD HHmmss), output increment (s), number of output times
+              {run_start_date_yyyymmdd} 000000 600 144
+            $
+            $ All points defined in ww3_shel.inp
+              -1
+            $ File prefix
+            $ number of characters in date
+            $ netCDF4 output
+            $ one file, max number of points to process
+            $ tables of mean parameters
+            $ WW3 global attributes
+            $ time,station dimension order
+            $ WMO standard output
+              SoG_ww3_points_
+              8
+              4
+              T 100
+              2
+              0
+              T
+              6
+            """
+        )
+        tmp_run_dir = (
+            tmp_path
+            / "scratch"
+            / "wwatch3_runs"
+            / "SoGwaves_2019-10-15T170643.123456-0700"
+        )
+        tmp_run_dir_lines = (tmp_run_dir / "ww3_ounp.inp").read_text().splitlines()
+        assert tmp_run_dir_lines == expected.splitlines()
+
+    def test_ww3_prnc_current_inp_file(
+        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    ):
+        results_dir = tmp_path / "results_dir" / "15oct19"
+        start_date = arrow.get("2019-10-15")
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
+        )
+        run_start_date_yyyymmdd = start_date.format("YYYYMMDD")
+        expected = textwrap.dedent(
+            f"""\
+            $ WAVEWATCH III NETCDF Field preprocessor input ww3_prnc_current.inp
+            $
+            $ Forcing type, grid type, time in file, header
+              'CUR' 'LL' T T
+            $ Name of dimensions
+            $
+              x y
+            $
+            $ Sea water current component variable names
+              u_current v_current
+            $
+            $ Forcing source file path/name
+            $ File is produced by make_ww3_current_file worker
+              'current/SoG_current_{run_start_date_yyyymmdd}.nc'
+            """
+        )
+        tmp_run_dir = (
+            tmp_path
+            / "scratch"
+            / "wwatch3_runs"
+            / "SoGwaves_2019-10-15T170643.123456-0700"
+        )
+        tmp_run_dir_lines = (
+            (tmp_run_dir / "ww3_prnc_current.inp").read_text().splitlines()
+        )
+        assert tmp_run_dir_lines == expected.splitlines()
+
+    def test_ww3_prnc_wind_inp_file(
+        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    ):
+        results_dir = tmp_path / "results_dir" / "15oct19"
+        start_date = arrow.get("2019-10-15")
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
+        )
+        run_start_date_yyyymmdd = start_date.format("YYYYMMDD")
+        expected = textwrap.dedent(
+            f"""\
+            $ WAVEWATCH III NETCDF Field preprocessor input ww3_prnc_wind.inp
+            $
+            $ Forcing type, grid type, time in file, header
+               'WND' 'LL' T T
+            $
+            $ Dimension variable names
+              x y
+            $
+            $ Wind component variable names
+              u_wind v_wind
+            $
+            $ Forcing source file path/name
+            $ File is produced by make_ww3_wind_file worker
+              'wind/SoG_wind_{run_start_date_yyyymmdd}.nc'
+            """
+        )
+        tmp_run_dir = (
+            tmp_path
+            / "scratch"
+            / "wwatch3_runs"
+            / "SoGwaves_2019-10-15T170643.123456-0700"
+        )
+        tmp_run_dir_lines = (tmp_run_dir / "ww3_prnc_wind.inp").read_text().splitlines()
+        assert tmp_run_dir_lines == expected.splitlines()
+
+    def test_ww3_shel_inp_file(
+        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    ):
+        results_dir = tmp_path / "results_dir" / "15oct19"
+        start_date = arrow.get("2019-10-15")
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
+        )
+        run_start_date_yyyymmdd = start_date.format("YYYYMMDD")
+        run_end_date_yyyymmdd = start_date.shift(days=+1).format("YYYYMMDD")
+        expected = textwrap.dedent(
+            f"""\
+            $ WAVEWATCH III shell input file
+            $
+            $ Forcing/inputs to use
+              F F  Water levels w/ homogeneous field data
+              T F  Currents w/ homogeneous field data
+              T F  Winds w/ homogeneous field data
+              F    Ice concentration
+              F    Assimilation data : Mean parameters
+              F    Assimilation data : 1-D spectra
+              F    Assimilation data : 2-D spectra.
+            $
+               {run_start_date_yyyymmdd} 000000  Start time (YYYYMMDD HHmmss)
+               {run_end_date_yyyymmdd} 000000  End time (YYYYMMDD HHmmss)
+            $
+            $ Output server mode
+              2  dedicated process
+            $
+            $ Field outputs
+            $ Start time (YYYYMMDD HHmmss), Interval (s), End time (YYYYMMDD HHmmss)
+              {run_start_date_yyyymmdd} 000000 1800 {run_end_date_yyyymmdd} 000000
+            $ Fields
+              N  by name
+              HS LM WND CUR FP T02 DIR DP WCH WCC TWO FOC USS
+            $
+            $ Point outputs (required placeholder for unused feature)
+            $ Start time (YYYYMMDD HHmmss), Interval (s), End time (YYYYMMDD HHmmss)
+              {run_start_date_yyyymmdd} 000000 0 {run_end_date_yyyymmdd} 000000
+            $
+            $ Along-track output (required placeholder for unused feature)
+            $ Start time (YYYYMMDD HHmmss), Interval (s), End time (YYYYMMDD HHmmss)
+              {run_start_date_yyyymmdd} 000000 0 {run_end_date_yyyymmdd} 000000
+            $
+            $ Restart files
+            $ Start time (YYYYMMDD HHmmss), Interval (s), End time (YYYYMMDD HHmmss)
+              {run_end_date_yyyymmdd} 000000 3600 {run_end_date_yyyymmdd} 000000
+            $
+            $ Boundary data (required placeholder for unused feature)
+            $ Start time (YYYYMMDD HHmmss), Interval (s), End time (YYYYMMDD HHmmss)
+              {run_start_date_yyyymmdd} 000000 0 {run_end_date_yyyymmdd} 000000
+            $
+            $ Separated wave field data (required placeholder for unused feature)
+            $ Start time (YYYYMMDD HHmmss), Interval (s), End time (YYYYMMDD HHmmss)
+              {run_start_date_yyyymmdd} 000000 0 {run_end_date_yyyymmdd} 000000
+            $
+            $ Homogeneous field data (required placeholder for unused feature)
+              ’STP’
+            """
+        )
+        tmp_run_dir = (
+            tmp_path
+            / "scratch"
+            / "wwatch3_runs"
+            / "SoGwaves_2019-10-15T170643.123456-0700"
+        )
+        tmp_run_dir_lines = (tmp_run_dir / "ww3_shel.inp").read_text().splitlines()
+        assert tmp_run_dir_lines == expected.splitlines()
+
+    def test_output_section_inp_files(
+        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    ):
+        run_desc["output"] = {
+            "fields": {"names": ["HS", "DIR", "T02"], "interval": 3600},
+            "points": {
+                "interval": 900,
+                "locations": {"Halibut Bank": [-123.72, 49.34]},
+            },
+        }
+        with (tmp_path / "wwatch3.yaml").open("wt") as f:
+            yaml.safe_dump(run_desc, f)
+        results_dir = tmp_path / "results_dir" / "15oct19"
+        start_date = arrow.get("2019-10-15")
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
+        )
+        tmp_run_dir = (
+            tmp_path
+            / "scratch"
+            / "wwatch3_runs"
+            / "SoGwaves_2019-10-15T170643.123456-0700"
+        )
+        ww3_shel_inp = (tmp_run_dir / "ww3_shel.inp").read_text()
+        expected = textwrap.dedent(
+            """\
+            $ Field outputs
+            $ Start time (YYYYMMDD HHmmss), Interval (s), End time (YYYYMMDD HHmmss)
+              20191015 000000 3600 20191016 000000
+            $ Fields
+              N  by name
+              HS DIR T02
+            $
+            $ Point outputs
+            $ Start time (YYYYMMDD HHmmss), Interval (s), End time (YYYYMMDD HHmmss)
+              20191015 000000 900 20191016 000000
+            $ Longitude, latitude, name
+              -123.72 49.34  'Halibut Bank'
+              0.0 0.0  'STOPSTRING'
+            $
+            """
+        )
+        assert expected in ww3_shel_inp
+        ww3_ounf_inp = (tmp_run_dir / "ww3_ounf.inp").read_text()
+        assert "  20191015 000000 3600 24\n" in ww3_ounf_inp
+        assert "  HS DIR T02\n" in ww3_ounf_inp
+        ww3_ounp_inp = (tmp_run_dir / "ww3_ounp.inp").read_text()
+        assert "  20191015 000000 900 96\n" in ww3_ounp_inp
+
+    def test_SoGWW3_sh_file(
+        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    ):
+        results_dir = tmp_path / "results_dir" / "15oct19"
+        start_date = arrow.get("2019-10-15")
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
+        )
+        run_start_date_yyyymmdd = start_date.format("YYYYMMDD")
+        tmp_run_dir = (
+            tmp_path
+            / "scratch"
+            / "wwatch3_runs"
+            / "SoGwaves_2019-10-15T170643.123456-0700"
+        )
+        config = wwatch3_cmd.run.RunConfig.from_run_desc(run_desc)
+        expected = textwrap.dedent(
+            f"""\
+            #!/bin/bash
+            
+            {wwatch3_cmd.run._sbatch_directives(config, results_dir, "00:20:00")}
+            set -e  # abort on first error
+            set -u  # abort if undefinded variable is encountered
+            
+            module load netcdf-fortran-mpi/4.4.4
+            
+            WW3_EXE="$PROJECT/$USER/MIDOSS/wwatch3-5.16/exe"
+            MPIRUN="mpirun"
+            GATHER="$HOME/.local/bin/wwatch3 gather"
+            
+            RUN_START_DATES=(
+              {run_start_date_yyyymmdd}
+            )
+            
+            RESULTS_DIRS=(
+              {results_dir} 
+            )
+            WORK_DIRS=(
+              {tmp_run_dir} 
+            )
+
+            TIMINGS_FILE="wwatch3_timings.jsonl"
+            if /usr/bin/time -f %M -o /dev/null true 2>/dev/null
+            then
+              RSS_TIME="/usr/bin/time"
+            else
+              RSS_TIME=""
+            fi
+
+            timed() {{
+              # Run the command for stage $1 of day i, and append a timing record for it
+              # to the timings file in the day's results directory
+              local stage=$1
+              shift
+              local rss_file=$(mktemp)
+              local start=$(date +%s.%3N)
+              local status=0
+              if [[ -n ${{RSS_TIME}} ]]
+              then
+                ${{RSS_TIME}} -f %M -o ${{rss_file}} "$@" || status=$?
+              else
+                "$@" || status=$?
+              fi
+              local end=$(date +%s.%3N)
+              local peak_rss_kb=$(tail -n 1 ${{rss_file}})
+              rm -f ${{rss_file}}
+              [[ ${{peak_rss_kb}} =~ ^[0-9]+$ ]] || peak_rss_kb=null
+              echo "{{\\"run_id\\": \\"SoGwaves\\", \\"day\\": \\"${{RUN_START_DATES[i]}}\\", \\"stage\\": \\"${{stage}}\\", \\"start\\": ${{start}}, \\"end\\": ${{end}}, \\"exit_status\\": ${{status}}, \\"peak_rss_kb\\": ${{peak_rss_kb}}, \\"n_procs\\": 20}}" \\
+                >> ${{RESULTS_DIRS[i]}}/${{TIMINGS_FILE}}
+              return ${{status}}
+            }}
+            
+            for (( i=0; i<${{#RESULTS_DIRS[@]}}; ++i ))
+            do
+              echo "results dir: ${{RESULTS_DIRS[i]}}"
+
+              cd ${{WORK_DIRS[i]}}
+              echo "working dir: $(pwd)"
+
+              echo "Starting wind.nc file creation at $(date)"
+              ln -s ww3_prnc_wind.inp ww3_prnc.inp && \\
+              timed prnc_wind ${{WW3_EXE}}/ww3_prnc && \\
+              rm -f ww3_prnc.inp
+              echo "Ending wind.nc file creation at $(date)"
+
+              echo "Starting current.nc file creation at $(date)"
+              ln -s ww3_prnc_current.inp ww3_prnc.inp && \\
+              timed prnc_current ${{WW3_EXE}}/ww3_prnc && \\
+              rm -f ww3_prnc.inp
+              echo "Ending current.nc file creation at $(date)"
+
+              echo "Starting run at $(date)"
+              timed shel ${{MPIRUN}} -np 20 ${{WW3_EXE}}/ww3_shel && \\
+              mv log.ww3 ww3_shel.log && \\
+              rm current.ww3 wind.ww3 && \\
+              echo "Ended run at $(date)"
+
+              echo "Starting netCDF4 fields output at $(date)"
+              timed ounf ${{WW3_EXE}}/ww3_ounf && \\
+              mv SoG_ww3_fields_${{RUN_START_DATES[i]}}.nc \\
+                SoG_ww3_fields_${{RUN_START_DATES[i]}}_${{RUN_START_DATES[i]}}.nc && \\
+              rm out_grd.ww3
+              echo "Ending netCDF4 fields output at $(date)"
+
+              echo "Results gathering started at $(date)"
+              timed gather ${{GATHER}} ${{RESULTS_DIRS[i]}} --debug
+              echo "Results gathering ended at $(date)"
+
+              echo "Deleting run directory"
+              timed cleanup rmdir $(pwd)
+              echo "Finished at $(date)"
+            done
+            """
+        )
+        tmp_run_dir_lines = [
+            line.strip()
+            for line in (tmp_run_dir / "SoGWW3.sh").read_text().splitlines()
+        ]
+        assert tmp_run_dir_lines == [line.strip() for line in expected.splitlines()]
+
+    def test_SoGWW3_sh_file_2_days(
+        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    ):
+        results_dir = tmp_path / "results_dir"
+        start_date = arrow.get("2019-10-15")
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00", n_days=2
+        )
+        run_start_dates_yyyymmdd = (
+            f'  {arrow.get("2019-10-15").format("YYYYMMDD")}\n'
+            f'  {arrow.get("2019-10-16").format("YYYYMMDD")}'
+        )
+        results_dirs = f'  {results_dir/"15oct19"}\n' f'  {results_dir/"16oct19"}'
+        work_dirs = (
+            f'  {tmp_path / "scratch" / "wwatch3_runs" / "SoGwaves_15oct19_2019-10-15T170643.123456-0700"}\n'
+            f'  {tmp_path / "scratch" / "wwatch3_runs" / "SoGwaves_16oct19_2019-10-15T170643.123456-0700"}'
+        )
+        config = wwatch3_cmd.run.RunConfig.from_run_desc(run_desc)
+        expected = textwrap.dedent(
+            f"""\
+            #!/bin/bash
+            
+            {wwatch3_cmd.run._sbatch_directives(config, results_dir/"15oct19", "00:20:00")}
+            set -e  # abort on first error
+            set -u  # abort if undefinded variable is encountered
+            
+            module load netcdf-fortran-mpi/4.4.4
+            
+            WW3_EXE="$PROJECT/$USER/MIDOSS/wwatch3-5.16/exe"
+            MPIRUN="mpirun"
+            GATHER="$HOME/.local/bin/wwatch3 gather"
+            
+            RUN_START_DATES=(
+              {run_start_dates_yyyymmdd}
+            )
+            
+            RESULTS_DIRS=(
+              {results_dirs} 
+            )
+            WORK_DIRS=(
+              {work_dirs} 
+            )
+
+            TIMINGS_FILE="wwatch3_timings.jsonl"
+            if /usr/bin/time -f %M -o /dev/null true 2>/dev/null
+            then
+              RSS_TIME="/usr/bin/time"
+            else
+              RSS_TIME=""
+            fi
+
+            timed() {{
+              # Run the command for stage $1 of day i, and append a timing record for it
+              # to the timings file in the day's results directory
+              local stage=$1
+              shift
+              local rss_file=$(mktemp)
+              local start=$(date +%s.%3N)
+              local status=0
+              if [[ -n ${{RSS_TIME}} ]]
+              then
+                ${{RSS_TIME}} -f %M -o ${{rss_file}} "$@" || status=$?
+              else
+                "$@" || status=$?
+              fi
+              local end=$(date +%s.%3N)
+              local peak_rss_kb=$(tail -n 1 ${{rss_file}})
+              rm -f ${{rss_file}}
+              [[ ${{peak_rss_kb}} =~ ^[0-9]+$ ]] || peak_rss_kb=null
+              echo "{{\\"run_id\\": \\"SoGwaves\\", \\"day\\": \\"${{RUN_START_DATES[i]}}\\", \\"stage\\": \\"${{stage}}\\", \\"start\\": ${{start}}, \\"end\\": ${{end}}, \\"exit_status\\": ${{status}}, \\"peak_rss_kb\\": ${{peak_rss_kb}}, \\"n_procs\\": 20}}" \\
+                >> ${{RESULTS_DIRS[i]}}/${{TIMINGS_FILE}}
+              return ${{status}}
+            }}
+            
+            for (( i=0; i<${{#RESULTS_DIRS[@]}}; ++i ))
+            do
+              echo "results dir: ${{RESULTS_DIRS[i]}}"
+
+              cd ${{WORK_DIRS[i]}}
+              echo "working dir: $(pwd)"
+            
+              echo "Starting wind.nc file creation at $(date)"
+              ln -s ww3_prnc_wind.inp ww3_prnc.inp && \\
+              timed prnc_wind ${{WW3_EXE}}/ww3_prnc && \\
+              rm -f ww3_prnc.inp
+              echo "Ending wind.nc file creation at $(date)"
+              
+              echo "Starting current.nc file creation at $(date)"
+              ln -s ww3_prnc_current.inp ww3_prnc.inp && \\
+              timed prnc_current ${{WW3_EXE}}/ww3_prnc && \\
+              rm -f ww3_prnc.inp
+              echo "Ending current.nc file creation at $(date)"
+              
+              echo "Starting run at $(date)"
+              timed shel ${{MPIRUN}} -np 20 ${{WW3_EXE}}/ww3_shel && \\
+              mv log.ww3 ww3_shel.log && \\
+              rm current.ww3 wind.ww3 && \\
+              echo "Ended run at $(date)"
+              
+              echo "Starting netCDF4 fields output at $(date)"
+              timed ounf ${{WW3_EXE}}/ww3_ounf && \\
+              mv SoG_ww3_fields_${{RUN_START_DATES[i]}}.nc \\
+                SoG_ww3_fields_${{RUN_START_DATES[i]}}_${{RUN_START_DATES[i]}}.nc && \\
+              rm out_grd.ww3
+              echo "Ending netCDF4 fields output at $(date)"
+              
+              echo "Results gathering started at $(date)"
+              timed gather ${{GATHER}} ${{RESULTS_DIRS[i]}} --debug
+              echo "Results gathering ended at $(date)"
+              
+              echo "Deleting run directory"
+              timed cleanup rmdir $(pwd)
+              echo "Finished at $(date)"
+            done
+            """
+        )
+        tmp_run_dir_lines = [
+            line.strip()
+            for line in (
+                tmp_path
+                / "scratch"
+                / "wwatch3_runs"
+                / "SoGwaves_15oct19_2019-10-15T170643.123456-0700"
+                / "SoGWW3.sh"
+            )
+            .read_text()
+            .splitlines()
+        ]
+        assert tmp_run_dir_lines == [line.strip() for line in expected.splitlines()]
+
+    def test_SoGWW3_sh_file_concurrent_prnc(
+        self,
+        mock_arrow_now_return,
         mock_subprocess_stdout,
         run_desc,
         tmp_path,
         monkeypatch,
     ):
         def mock_load_run_desc_return(*args):
-            monkeypatch.delitem(run_desc, "restart")
+            monkeypatch.setitem(run_desc["forcing"], "prnc mode", "concurrent")
             return run_desc
 
         monkeypatch.setattr(
-            wwatch3_cmd.run.nemo_cmd.prepare, "load_run_desc", mock_load_run_desc_return
+            nemo_cmd.prepare, "load_run_desc", mock_load_run_desc_return
         )
         results_dir = tmp_path / "results_dir" / "15oct19"
         start_date = arrow.get("2019-10-15")
         wwatch3_cmd.run.run(
             tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
         )
+        expected = textwrap.indent(
+            textwrap.dedent(
+                """\
+              echo "working dir: $(pwd)"
+
+              echo "Starting concurrent wind.nc and current.nc file creation at $(date)"
+              PRNC_PIDS=()
+              for FORCING in wind current
+              do
+                (
+                  mkdir prnc_${FORCING} && \\
+                  cd prnc_${FORCING} && \\
+                  ln -s ../mod_def.ww3 mod_def.ww3 && \\
+                  ln -s ../${FORCING} ${FORCING} && \\
+                  ln -s ../ww3_prnc_${FORCING}.inp ww3_prnc.inp && \\
+                  timed prnc_${FORCING} ${WW3_EXE}/ww3_prnc && \\
+                  mv ${FORCING}.ww3 .. && \\
+                  cd .. && \\
+                  rm -rf prnc_${FORCING}
+                ) &
+                PRNC_PIDS+=($!)
+              done
+              PRNC_FAILED=0
+              for PID in ${PRNC_PIDS[@]}
+              do
+                wait ${PID} || PRNC_FAILED=1
+              done
+              if (( PRNC_FAILED ))
+              then
+                echo "ww3_prnc failed at $(date)" >&2
+                exit 1
+              fi
+              echo "Ending concurrent wind.nc and current.nc file creation at $(date)"
+
+              echo "Starting run at $(date)"
+            """
+            ),
+            "  ",
+        )
         tmp_run_dir = (
             tmp_path
             / "scratch"
             / "wwatch3_runs"
             / "SoGwaves_2019-10-15T170643.123456-0700"
         )
-        tmp_run_dir_links = {fp.name for fp in tmp_run_dir.iterdir() if fp.is_symlink()}
-        assert tmp_run_dir_links == {"mod_def.ww3", "wind", "current"}
+        sogww3_sh = (tmp_run_dir / "SoGWW3.sh").read_text()
+        assert expected in sogww3_sh
+        assert "ln -s ww3_prnc_wind.inp ww3_prnc.inp" not in sogww3_sh
 
-    def test_restart_symlink_target(
-        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    def test_SoGWW3_sh_file_forcing_cache(
+        self,
+        mock_arrow_now_return,
+        mock_subprocess_stdout,
+        run_desc,
+        tmp_path,
+        monkeypatch,
     ):
+        forcing_cache_dir = tmp_path / "forcing_cache"
+
+        def mock_load_run_desc_return(*args):
+            monkeypatch.setitem(
+                run_desc["forcing"], "forcing cache", os.fspath(forcing_cache_dir)
+            )
+            return run_desc
+
+        monkeypatch.setattr(
+            nemo_cmd.prepare, "load_run_desc", mock_load_run_desc_return
+        )
         results_dir = tmp_path / "results_dir" / "15oct19"
         start_date = arrow.get("2019-10-15")
         wwatch3_cmd.run.run(
@@ -538,110 +3082,126 @@ class TestTmpRunDir:
             / "wwatch3_runs"
             / "SoGwaves_2019-10-15T170643.123456-0700"
         )
-        assert os.readlink(tmp_run_dir / "restart.ww3") == os.fspath(
-            tmp_path / "scratch" / "wwatch3_runs" / "14oct19" / "restart001.ww3"
+        sogww3_sh = (tmp_run_dir / "SoGWW3.sh").read_text()
+        assert forcing_cache_dir.is_dir()
+        assert f'FORCING_CACHE="{forcing_cache_dir}"' in sogww3_sh
+        assert "cached_prnc() {" in sogww3_sh
+        assert (
+            "  cached_prnc wind timed prnc_wind ${WW3_EXE}/ww3_prnc && \\\n"
+            in sogww3_sh
+        )
+        assert (
+            "  cached_prnc current timed prnc_current ${WW3_EXE}/ww3_prnc && \\\n"
+            in sogww3_sh
         )
 
-    def test_restart_symlink_target_2nd_day(
+    def test_SoGWW3_sh_file_no_forcing_cache(
         self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
     ):
-        results_dir = tmp_path / "results_dir"
+        results_dir = tmp_path / "results_dir" / "15oct19"
         start_date = arrow.get("2019-10-15")
         wwatch3_cmd.run.run(
-            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00", n_days=2
+            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
         )
         tmp_run_dir = (
             tmp_path
             / "scratch"
             / "wwatch3_runs"
-            / "SoGwaves_16oct19_2019-10-15T170643.123456-0700"
-        )
-        assert os.readlink(tmp_run_dir / "restart.ww3") == os.fspath(
-            tmp_path / "scratch" / "wwatch3_runs" / "15oct19" / "restart001.ww3"
+            / "SoGwaves_2019-10-15T170643.123456-0700"
         )
+        sogww3_sh = (tmp_run_dir / "SoGWW3.sh").read_text()
+        assert "FORCING_CACHE" not in sogww3_sh
+        assert "cached_prnc" not in sogww3_sh
 
-    def test_ww3_ounf_inp_file(
+    def test_SoGWW3_sh_file_fields_compression(
         self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
     ):
+        run_desc["output"] = {"compression": {"chunking": "time series"}}
+        with (tmp_path / "wwatch3.yaml").open("wt") as f:
+            yaml.safe_dump(run_desc, f)
         results_dir = tmp_path / "results_dir" / "15oct19"
         start_date = arrow.get("2019-10-15")
         wwatch3_cmd.run.run(
             tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
         )
-        run_start_date_yyyymmdd = start_date.format("YYYYMMDD")
-        expected = textwrap.dedent(
-            f"""\
-            $ WAVEWATCH III NETCDF Grid output post-processing
-            $
-            $ First output time (YYYYMMDD HHmmss), output increment (s), number of output times
-              {run_start_date_yyyymmdd} 000000 1800 48
-            $
-            $ Fields
-              N  by name
-              HS LM WND CUR FP T02 DIR DP WCH WCC TWO FOC USS
-            $
-            $ netCDF4 output
-            $ real numbers
-            $ swell partitions
-            $ one file
-              4
-              4
-              0 1 2
-              T
-            $
-            $ File prefix
-            $ number of characters in date
-            $ IX, IY range
-            $
-              SoG_ww3_fields_
-              8
-              1 1000000 1 1000000
-            """
-        )
         tmp_run_dir = (
             tmp_path
             / "scratch"
             / "wwatch3_runs"
             / "SoGwaves_2019-10-15T170643.123456-0700"
         )
-        tmp_run_dir_lines = (tmp_run_dir / "ww3_ounf.inp").read_text().splitlines()
-        assert tmp_run_dir_lines == expected.splitlines()
+        sogww3_sh = (tmp_run_dir / "SoGWW3.sh").read_text()
+        expected = textwrap.indent(
+            textwrap.dedent(
+                """\
+              mv SoG_ww3_fields_${RUN_START_DATES[i]}.nc \\
+                SoG_ww3_fields_${RUN_START_DATES[i]}_${RUN_START_DATES[i]}.nc && \\
+              timed compress nccopy -d 4 -s -c time/48,latitude/10,longitude/10 \\
+                SoG_ww3_fields_${RUN_START_DATES[i]}_${RUN_START_DATES[i]}.nc SoG_ww3_fields_compressed.nc && \\
+              mv SoG_ww3_fields_compressed.nc \\
+                SoG_ww3_fields_${RUN_START_DATES[i]}_${RUN_START_DATES[i]}.nc && \\
+              rm out_grd.ww3
+            """
+            ),
+            "  ",
+        )
+        assert expected in sogww3_sh
 
-    def test_ww3_ounp_inp_file(
+    def test_SoGWW3_sh_file_points_output(
         self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
     ):
+        run_desc["output"] = {
+            "points": {"locations": {"Halibut Bank": [-123.72, 49.34]}}
+        }
+        with (tmp_path / "wwatch3.yaml").open("wt") as f:
+            yaml.safe_dump(run_desc, f)
         results_dir = tmp_path / "results_dir" / "15oct19"
         start_date = arrow.get("2019-10-15")
         wwatch3_cmd.run.run(
             tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
         )
-        run_start_date_yyyymmdd = start_date.format("YYYYMMDD")
-        expected = textwrap.dedent(
-            f"""\
-            $ WAVEWATCH III NETCDF Point output post-processing
-            $
-            $ First output time (YYYYMMDD HHmmss), output increment (s), number of output times
-              {run_start_date_yyyymmdd} 000000 600 144
-            $
-            $ All points defined in ww3_shel.inp
-              -1
-            $ File prefix
-            $ number of characters in date
-            $ netCDF4 output
-            $ one file, max number of points to process
-            $ tables of mean parameters
-            $ WW3 global attributes
-            $ time,station dimension order
-            $ WMO standard output
-              SoG_ww3_points_
-              8
-              4
-              T 100
-              2
-              0
-              T
-              6
+        tmp_run_dir = (
+            tmp_path
+            / "scratch"
+            / "wwatch3_runs"
+            / "SoGwaves_2019-10-15T170643.123456-0700"
+        )
+        sogww3_sh = (tmp_run_dir / "SoGWW3.sh").read_text()
+        expected = textwrap.indent(
+            textwrap.dedent(
+                """\
+              echo "Starting netCDF4 points output at $(date)"
+              timed ounp ${WW3_EXE}/ww3_ounp &
+              OUNP_PID=$!
+              echo "Starting netCDF4 fields output at $(date)"
+              timed ounf ${WW3_EXE}/ww3_ounf && \\
+            """
+            ),
+            "  ",
+        )
+        assert expected in sogww3_sh
+        expected = textwrap.indent(
+            textwrap.dedent(
+                """\
+              rm out_grd.ww3
+              echo "Ending netCDF4 fields output at $(date)"
+              # wait in an && list wouldn't stop the script if ww3_ounp failed
+              wait ${OUNP_PID} || exit 1
+              rm out_pnt.ww3
+              echo "Ending netCDF4 points output at $(date)"
             """
+            ),
+            "  ",
+        )
+        assert expected in sogww3_sh
+
+    def test_SoGWW3_sh_file_no_points_output(
+        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    ):
+        results_dir = tmp_path / "results_dir" / "15oct19"
+        start_date = arrow.get("2019-10-15")
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
         )
         tmp_run_dir = (
             tmp_path
@@ -649,84 +3209,234 @@ class TestTmpRunDir:
             / "wwatch3_runs"
             / "SoGwaves_2019-10-15T170643.123456-0700"
         )
-        tmp_run_dir_lines = (tmp_run_dir / "ww3_ounp.inp").read_text().splitlines()
-        assert tmp_run_dir_lines == expected.splitlines()
+        sogww3_sh = (tmp_run_dir / "SoGWW3.sh").read_text()
+        assert "ww3_ounp" not in sogww3_sh
 
-    def test_ww3_prnc_current_inp_file(
+    def test_SoGWW3_sh_file_checkpoints(
         self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
     ):
+        run_desc["restart"]["checkpoint interval"] = 6
+        with (tmp_path / "wwatch3.yaml").open("wt") as f:
+            yaml.safe_dump(run_desc, f)
         results_dir = tmp_path / "results_dir" / "15oct19"
         start_date = arrow.get("2019-10-15")
         wwatch3_cmd.run.run(
             tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
         )
-        run_start_date_yyyymmdd = start_date.format("YYYYMMDD")
+        tmp_run_dir = (
+            tmp_path
+            / "scratch"
+            / "wwatch3_runs"
+            / "SoGwaves_2019-10-15T170643.123456-0700"
+        )
+        sogww3_sh = (tmp_run_dir / "SoGWW3.sh").read_text()
+        assert "#SBATCH --signal=B:TERM@300\n" in sogww3_sh
+        assert "CHECKPOINT_HOURS=6\nFIRST_DAY_START_HOUR=0\n" in sogww3_sh
+        assert "trap save_checkpoint TERM\n" in sogww3_sh
+        expected = textwrap.indent(
+            textwrap.dedent(
+                """\
+              echo "Starting run at $(date)"
+              # ww3_shel runs in the background so that the SIGTERM trap runs while waiting for it
+              timed shel ${MPIRUN} -np 20 ${WW3_EXE}/ww3_shel &
+              SHEL_PID=$!
+              wait ${SHEL_PID} && \\
+              keep_end_of_day_restart && \\
+              mv log.ww3 ww3_shel.log && \\
+            """
+            ),
+            "  ",
+        )
+        assert expected in sogww3_sh
+        ww3_shel_inp = (tmp_run_dir / "ww3_shel.inp").read_text()
+        assert "  20191015 060000 21600 20191016 000000\n" in ww3_shel_inp
+
+    def test_SoGWW3_sh_file_pipelined(
+        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    ):
+        results_dir = tmp_path / "results_dir"
+        start_date = arrow.get("2019-10-15")
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml",
+            results_dir,
+            start_date,
+            "00:20:00",
+            n_days=3,
+            pipeline_depth=2,
+        )
         expected = textwrap.dedent(
-            f"""\
-            $ WAVEWATCH III NETCDF Field preprocessor input ww3_prnc_current.inp
-            $
-            $ Forcing type, grid type, time in file, header
-              'CUR' 'LL' T T
-            $ Name of dimensions
-            $
-              x y
-            $
-            $ Sea water current component variable names
-              u_current v_current
-            $
-            $ Forcing source file path/name
-            $ File is produced by make_ww3_current_file worker
-              'current/SoG_current_{run_start_date_yyyymmdd}.nc'
+            """\
+            N_DAYS=${#RESULTS_DIRS[@]}
+            PIPELINE_DEPTH=2
+            DAY_PRNC_PIDS=()
+            NEXT_PRNC_DAY=0
+            PRNC_SAVED_SECONDS=0
+
+            prnc_day() {
+              # Create the wind.ww3 and current.ww3 files for day $1 in its working directory
+              local i=$1
+              cd ${WORK_DIRS[i]}
+              local prnc_start=$(date +%s)
+
+              echo "Starting wind.nc file creation at $(date)"
             """
         )
         tmp_run_dir = (
             tmp_path
             / "scratch"
             / "wwatch3_runs"
-            / "SoGwaves_2019-10-15T170643.123456-0700"
+            / "SoGwaves_15oct19_2019-10-15T170643.123456-0700"
         )
-        tmp_run_dir_lines = (
-            (tmp_run_dir / "ww3_prnc_current.inp").read_text().splitlines()
+        sogww3_sh = (tmp_run_dir / "SoGWW3.sh").read_text()
+        assert expected in sogww3_sh
+        assert "  prnc_day ${NEXT_PRNC_DAY} &\n" in sogww3_sh
+        assert "  if ! wait ${DAY_PRNC_PIDS[i]}\n" in sogww3_sh
+        assert sogww3_sh.endswith(
+            'echo "Pipelined forcing pre-processing saved ${PRNC_SAVED_SECONDS}s of wall time"\n'
         )
-        assert tmp_run_dir_lines == expected.splitlines()
 
-    def test_ww3_prnc_wind_inp_file(
+    def test_SoGWW3_sh_file_async_post(
+        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    ):
+        results_dir = tmp_path / "results_dir"
+        start_date = arrow.get("2019-10-15")
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml",
+            results_dir,
+            start_date,
+            "00:20:00",
+            n_days=2,
+            async_post=True,
+        )
+        expected_post_day = textwrap.dedent(
+            """\
+            post_day() {
+              # Post-process and gather the results of day $1, and delete its working directory
+              local i=$1
+              cd ${WORK_DIRS[i]}
+
+              echo "Starting netCDF4 fields output at $(date)"
+            """
+        )
+        expected_loop_end = textwrap.dedent(
+            """\
+              echo "Ended run at $(date)"
+
+              # Make the restart file available to the next day before its ww3_shel run
+              mv restart[0-9][0-9][0-9].ww3 ${RESULTS_DIRS[i]}/
+
+              echo "Starting background post-processing at $(date)"
+              post_day ${i} &
+              POST_PIDS+=($!)
+            done
+            """
+        )
+        tmp_run_dir = (
+            tmp_path
+            / "scratch"
+            / "wwatch3_runs"
+            / "SoGwaves_15oct19_2019-10-15T170643.123456-0700"
+        )
+        sogww3_sh = (tmp_run_dir / "SoGWW3.sh").read_text()
+        assert expected_post_day in sogww3_sh
+        assert expected_loop_end in sogww3_sh
+        assert "  test ! -e out_grd.ww3\n" in sogww3_sh
+        assert sogww3_sh.count("${GATHER} ${RESULTS_DIRS[i]} --debug") == 1
+        assert sogww3_sh.endswith(
+            textwrap.dedent(
+                """\
+                  echo "Background post-processing failed at $(date)" >&2
+                  exit 1
+                fi
+                echo "Ended background post-processing at $(date)"
+                """
+            )
+        )
+
+    def test_SoGWW3_sh_file_node_local_scratch(
         self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
     ):
+        run_desc["resources"] = {"node-local scratch": True}
+        with (tmp_path / "wwatch3.yaml").open("wt") as f:
+            yaml.safe_dump(run_desc, f)
         results_dir = tmp_path / "results_dir" / "15oct19"
         start_date = arrow.get("2019-10-15")
         wwatch3_cmd.run.run(
             tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
         )
-        run_start_date_yyyymmdd = start_date.format("YYYYMMDD")
-        expected = textwrap.dedent(
-            f"""\
-            $ WAVEWATCH III NETCDF Field preprocessor input ww3_prnc_wind.inp
-            $
-            $ Forcing type, grid type, time in file, header
-               'WND' 'LL' T T
-            $
-            $ Dimension variable names
-              x y
-            $
-            $ Wind component variable names
-              u_wind v_wind
-            $
-            $ Forcing source file path/name
-            $ File is produced by make_ww3_wind_file worker
-              'wind/SoG_wind_{run_start_date_yyyymmdd}.nc'
-            """
+        tmp_run_dir = (
+            tmp_path
+            / "scratch"
+            / "wwatch3_runs"
+            / "SoGwaves_2019-10-15T170643.123456-0700"
+        )
+        sogww3_sh = (tmp_run_dir / "SoGWW3.sh").read_text()
+        assert "  LOCAL_DIRS+=(${SLURM_TMPDIR}/$(basename ${WORK_DIR}))\n" in sogww3_sh
+        assert (
+            "  timed stage_in cp -L --parents ${inputs[@]} ${LOCAL_DIRS[i]}/\n"
+            in sogww3_sh
+        )
+        expected = textwrap.indent(
+            textwrap.dedent(
+                """\
+                  cd ${WORK_DIRS[i]}
+                  echo "working dir: $(pwd)"
+                  stage_in
+                  echo "node-local dir: $(pwd)"
+
+                  echo "Starting wind.nc file creation at $(date)"
+                """
+            ),
+            "  ",
+        )
+        assert expected in sogww3_sh
+        expected = textwrap.indent(
+            textwrap.dedent(
+                """\
+                  echo "Staging out results from node-local scratch at $(date)"
+                  stage_out
+                  echo "Results gathering started at $(date)"
+                  timed gather ${GATHER} ${RESULTS_DIRS[i]} --debug
+                """
+            ),
+            "  ",
+        )
+        assert expected in sogww3_sh
+
+    def test_SoGWW3_sh_file_node_local_scratch_async_post(
+        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    ):
+        run_desc["resources"] = {"node-local scratch": True}
+        with (tmp_path / "wwatch3.yaml").open("wt") as f:
+            yaml.safe_dump(run_desc, f)
+        wwatch3_cmd.run.run(
+            tmp_path / "wwatch3.yaml",
+            tmp_path / "results_dir",
+            arrow.get("2019-10-15"),
+            "00:20:00",
+            n_days=2,
+            async_post=True,
         )
         tmp_run_dir = (
             tmp_path
             / "scratch"
             / "wwatch3_runs"
-            / "SoGwaves_2019-10-15T170643.123456-0700"
+            / "SoGwaves_15oct19_2019-10-15T170643.123456-0700"
         )
-        tmp_run_dir_lines = (tmp_run_dir / "ww3_prnc_wind.inp").read_text().splitlines()
-        assert tmp_run_dir_lines == expected.splitlines()
+        sogww3_sh = (tmp_run_dir / "SoGWW3.sh").read_text()
+        expected_post_day = textwrap.dedent(
+            """\
+            post_day() {
+              # Post-process and gather the results of day $1, and delete its working directory
+              local i=$1
+              cd ${LOCAL_DIRS[i]}
 
-    def test_ww3_shel_inp_file(
+              echo "Starting netCDF4 fields output at $(date)"
+            """
+        )
+        assert expected_post_day in sogww3_sh
+
+    def test_SoGWW3_sh_file_no_node_local_scratch(
         self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
     ):
         results_dir = tmp_path / "results_dir" / "15oct19"
@@ -734,252 +3444,93 @@ class TestTmpRunDir:
         wwatch3_cmd.run.run(
             tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
         )
-        run_start_date_yyyymmdd = start_date.format("YYYYMMDD")
-        run_end_date_yyyymmdd = start_date.shift(days=+1).format("YYYYMMDD")
-        expected = textwrap.dedent(
-            f"""\
-            $ WAVEWATCH III shell input file
-            $
-            $ Forcing/inputs to use
-              F F  Water levels w/ homogeneous field data
-              T F  Currents w/ homogeneous field data
-              T F  Winds w/ homogeneous field data
-              F    Ice concentration
-              F    Assimilation data : Mean parameters
-              F    Assimilation data : 1-D spectra
-              F    Assimilation data : 2-D spectra.
-            $
-               {run_start_date_yyyymmdd} 000000  Start time (YYYYMMDD HHmmss)
-               {run_end_date_yyyymmdd} 000000  End time (YYYYMMDD HHmmss)
-            $
-            $ Output server mode
-              2  dedicated process
-            $
-            $ Field outputs
-            $ Start time (YYYYMMDD HHmmss), Interval (s), End time (YYYYMMDD HHmmss)
-              {run_start_date_yyyymmdd} 000000 1800 {run_end_date_yyyymmdd} 000000
-            $ Fields
-              N  by name
-              HS LM WND CUR FP T02 DIR DP WCH WCC TWO FOC USS
-            $
-            $ Point outputs (required placeholder for unused feature)
-            $ Start time (YYYYMMDD HHmmss), Interval (s), End time (YYYYMMDD HHmmss)
-              {run_start_date_yyyymmdd} 000000 0 {run_end_date_yyyymmdd} 000000
-            $
-            $ Along-track output (required placeholder for unused feature)
-            $ Start time (YYYYMMDD HHmmss), Interval (s), End time (YYYYMMDD HHmmss)
-              {run_start_date_yyyymmdd} 000000 0 {run_end_date_yyyymmdd} 000000
-            $
-            $ Restart files
-            $ Start time (YYYYMMDD HHmmss), Interval (s), End time (YYYYMMDD HHmmss)
-              {run_end_date_yyyymmdd} 000000 3600 {run_end_date_yyyymmdd} 000000
-            $
-            $ Boundary data (required placeholder for unused feature)
-            $ Start time (YYYYMMDD HHmmss), Interval (s), End time (YYYYMMDD HHmmss)
-              {run_start_date_yyyymmdd} 000000 0 {run_end_date_yyyymmdd} 000000
-            $
-            $ Separated wave field data (required placeholder for unused feature)
-            $ Start time (YYYYMMDD HHmmss), Interval (s), End time (YYYYMMDD HHmmss)
-              {run_start_date_yyyymmdd} 000000 0 {run_end_date_yyyymmdd} 000000
-            $
-            $ Homogeneous field data (required placeholder for unused feature)
-              ’STP’
-            """
-        )
         tmp_run_dir = (
             tmp_path
             / "scratch"
             / "wwatch3_runs"
             / "SoGwaves_2019-10-15T170643.123456-0700"
         )
-        tmp_run_dir_lines = (tmp_run_dir / "ww3_shel.inp").read_text().splitlines()
-        assert tmp_run_dir_lines == expected.splitlines()
+        sogww3_sh = (tmp_run_dir / "SoGWW3.sh").read_text()
+        assert "SLURM_TMPDIR" not in sogww3_sh
+        assert "stage_" not in sogww3_sh
 
-    def test_SoGWW3_sh_file(
-        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
+    def test_SoGWW3_sh_file_mpirun_n_procs(
+        self,
+        mock_arrow_now_return,
+        mock_subprocess_stdout,
+        run_desc,
+        tmp_path,
+        monkeypatch,
     ):
+        def mock_load_run_desc_return(*args):
+            monkeypatch.setitem(
+                run_desc, "resources", {"nodes": 2, "tasks per node": 48}
+            )
+            return run_desc
+
+        monkeypatch.setattr(
+            nemo_cmd.prepare, "load_run_desc", mock_load_run_desc_return
+        )
         results_dir = tmp_path / "results_dir" / "15oct19"
         start_date = arrow.get("2019-10-15")
         wwatch3_cmd.run.run(
             tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00"
         )
-        run_start_date_yyyymmdd = start_date.format("YYYYMMDD")
         tmp_run_dir = (
             tmp_path
             / "scratch"
             / "wwatch3_runs"
             / "SoGwaves_2019-10-15T170643.123456-0700"
         )
-        expected = textwrap.dedent(
-            f"""\
-            #!/bin/bash
-            
-            {wwatch3_cmd.run._sbatch_directives(run_desc, results_dir, "00:20:00")}
-            set -e  # abort on first error
-            set -u  # abort if undefinded variable is encountered
-            
-            module load netcdf-fortran-mpi/4.4.4
-            
-            WW3_EXE="$PROJECT/$USER/MIDOSS/wwatch3-5.16/exe"
-            MPIRUN="mpirun"
-            GATHER="$HOME/.local/bin/wwatch3 gather"
-            
-            RUN_START_DATES=(
-              {run_start_date_yyyymmdd}
-            )
-            
-            RESULTS_DIRS=(
-              {results_dir} 
-            )
-            WORK_DIRS=(
-              {tmp_run_dir} 
-            )
-            
-            for (( i=0; i<${{#RESULTS_DIRS[@]}}; ++i ))
-            do
-              echo "results dir: ${{RESULTS_DIRS[i]}}"
-
-              cd ${{WORK_DIRS[i]}}
-              echo "working dir: $(pwd)"
-
-              echo "Starting wind.nc file creation at $(date)"
-              ln -s ww3_prnc_wind.inp ww3_prnc.inp && \\
-              ${{WW3_EXE}}/ww3_prnc && \\
-              rm -f ww3_prnc.inp
-              echo "Ending wind.nc file creation at $(date)"
-
-              echo "Starting current.nc file creation at $(date)"
-              ln -s ww3_prnc_current.inp ww3_prnc.inp && \\
-              ${{WW3_EXE}}/ww3_prnc && \\
-              rm -f ww3_prnc.inp
-              echo "Ending current.nc file creation at $(date)"
-
-              echo "Starting run at $(date)"
-              ${{MPIRUN}} -np 20 ${{WW3_EXE}}/ww3_shel && \\
-              mv log.ww3 ww3_shel.log && \\
-              rm current.ww3 wind.ww3 && \\
-              echo "Ended run at $(date)"
-
-              echo "Starting netCDF4 fields output at $(date)"
-              ${{WW3_EXE}}/ww3_ounf && \\
-              mv SoG_ww3_fields_${{RUN_START_DATES[i]}}.nc \\
-                SoG_ww3_fields_${{RUN_START_DATES[i]}}_${{RUN_START_DATES[i]}}.nc && \\
-              rm out_grd.ww3
-              echo "Ending netCDF4 fields output at $(date)"
+        sogww3_sh = (tmp_run_dir / "SoGWW3.sh").read_text()
+        assert "#SBATCH --nodes=2\n#SBATCH --ntasks-per-node=48\n" in sogww3_sh
+        assert "  timed shel ${MPIRUN} -np 96 ${WW3_EXE}/ww3_shel && \\\n" in sogww3_sh
 
-              echo "Results gathering started at $(date)"
-              ${{GATHER}} ${{RESULTS_DIRS[i]}} --debug
-              echo "Results gathering ended at $(date)"
+    def test_SoGWW3_sh_file_job_array(
+        self,
+        mock_arrow_now_return,
+        mock_subprocess_stdout,
+        run_desc,
+        tmp_path,
+        caplog,
+        monkeypatch,
+    ):
+        def mock_load_run_desc_return(*args):
+            monkeypatch.delitem(run_desc, "restart")
+            return run_desc
 
-              echo "Deleting run directory"
-              rmdir $(pwd)
-              echo "Finished at $(date)"
-            done
-            """
+        monkeypatch.setattr(
+            nemo_cmd.prepare, "load_run_desc", mock_load_run_desc_return
         )
-        tmp_run_dir_lines = [
-            line.strip()
-            for line in (tmp_run_dir / "SoGWW3.sh").read_text().splitlines()
-        ]
-        assert tmp_run_dir_lines == [line.strip() for line in expected.splitlines()]
-
-    def test_SoGWW3_sh_file_2_days(
-        self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
-    ):
         results_dir = tmp_path / "results_dir"
         start_date = arrow.get("2019-10-15")
         wwatch3_cmd.run.run(
-            tmp_path / "wwatch3.yaml", results_dir, start_date, "00:20:00", n_days=2
-        )
-        run_start_dates_yyyymmdd = (
-            f'  {arrow.get("2019-10-15").format("YYYYMMDD")}\n'
-            f'  {arrow.get("2019-10-16").format("YYYYMMDD")}'
+            tmp_path / "wwatch3.yaml",
+            results_dir,
+            start_date,
+            "00:20:00",
+            n_days=3,
+            job_array=True,
         )
-        results_dirs = f'  {results_dir/"15oct19"}\n' f'  {results_dir/"16oct19"}'
-        work_dirs = (
-            f'  {tmp_path / "scratch" / "wwatch3_runs" / "SoGwaves_15oct19_2019-10-15T170643.123456-0700"}\n'
-            f'  {tmp_path / "scratch" / "wwatch3_runs" / "SoGwaves_16oct19_2019-10-15T170643.123456-0700"}'
+        tmp_run_dir = (
+            tmp_path
+            / "scratch"
+            / "wwatch3_runs"
+            / "SoGwaves_15oct19_2019-10-15T170643.123456-0700"
         )
+        sogww3_sh = (tmp_run_dir / "SoGWW3.sh").read_text()
+        assert "#SBATCH --array=0-2\n" in sogww3_sh
+        assert f"#SBATCH --output={results_dir}/stdout_%a\n" in sogww3_sh
         expected = textwrap.dedent(
-            f"""\
-            #!/bin/bash
-            
-            {wwatch3_cmd.run._sbatch_directives(run_desc, results_dir/"15oct19", "00:20:00")}
-            set -e  # abort on first error
-            set -u  # abort if undefinded variable is encountered
-            
-            module load netcdf-fortran-mpi/4.4.4
-            
-            WW3_EXE="$PROJECT/$USER/MIDOSS/wwatch3-5.16/exe"
-            MPIRUN="mpirun"
-            GATHER="$HOME/.local/bin/wwatch3 gather"
-            
-            RUN_START_DATES=(
-              {run_start_dates_yyyymmdd}
-            )
-            
-            RESULTS_DIRS=(
-              {results_dirs} 
-            )
-            WORK_DIRS=(
-              {work_dirs} 
-            )
-            
-            for (( i=0; i<${{#RESULTS_DIRS[@]}}; ++i ))
-            do
-              echo "results dir: ${{RESULTS_DIRS[i]}}"
-
-              cd ${{WORK_DIRS[i]}}
-              echo "working dir: $(pwd)"
-            
-              echo "Starting wind.nc file creation at $(date)"
-              ln -s ww3_prnc_wind.inp ww3_prnc.inp && \\
-              ${{WW3_EXE}}/ww3_prnc && \\
-              rm -f ww3_prnc.inp
-              echo "Ending wind.nc file creation at $(date)"
-              
-              echo "Starting current.nc file creation at $(date)"
-              ln -s ww3_prnc_current.inp ww3_prnc.inp && \\
-              ${{WW3_EXE}}/ww3_prnc && \\
-              rm -f ww3_prnc.inp
-              echo "Ending current.nc file creation at $(date)"
-              
-              echo "Starting run at $(date)"
-              ${{MPIRUN}} -np 20 ${{WW3_EXE}}/ww3_shel && \\
-              mv log.ww3 ww3_shel.log && \\
-              rm current.ww3 wind.ww3 && \\
-              echo "Ended run at $(date)"
-              
-              echo "Starting netCDF4 fields output at $(date)"
-              ${{WW3_EXE}}/ww3_ounf && \\
-              mv SoG_ww3_fields_${{RUN_START_DATES[i]}}.nc \\
-                SoG_ww3_fields_${{RUN_START_DATES[i]}}_${{RUN_START_DATES[i]}}.nc && \\
-              rm out_grd.ww3
-              echo "Ending netCDF4 fields output at $(date)"
-              
-              echo "Results gathering started at $(date)"
-              ${{GATHER}} ${{RESULTS_DIRS[i]}} --debug
-              echo "Results gathering ended at $(date)"
-              
-              echo "Deleting run directory"
-              rmdir $(pwd)
-              echo "Finished at $(date)"
-            done
+            """\
+            i=${SLURM_ARRAY_TASK_ID}
+            exec >> ${RESULTS_DIRS[i]}/stdout 2>> ${RESULTS_DIRS[i]}/stderr
             """
         )
-        tmp_run_dir_lines = [
-            line.strip()
-            for line in (
-                tmp_path
-                / "scratch"
-                / "wwatch3_runs"
-                / "SoGwaves_15oct19_2019-10-15T170643.123456-0700"
-                / "SoGWW3.sh"
-            )
-            .read_text()
-            .splitlines()
-        ]
-        assert tmp_run_dir_lines == [line.strip() for line in expected.splitlines()]
+        assert expected in sogww3_sh
+        assert "for (( i=0" not in sogww3_sh
+        assert "\ndone\n" not in sogww3_sh
+        assert not [r for r in caplog.records if r.levelname == "WARNING"]
 
     def test_ww3_grid_inp_file(
         self, mock_arrow_now_return, mock_subprocess_stdout, run_desc, tmp_path
@@ -0,0 +1,261 @@
+#  Copyright 2019-2021, the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""WWatch3-Cmd run-batch sub-command plug-in unit tests.
+"""
+import os
+from pathlib import Path
+import subprocess
+import textwrap
+from types import SimpleNamespace
+
+import arrow
+import pytest
+
+import wwatch3_cmd.main
+import wwatch3_cmd.run
+import wwatch3_cmd.run_batch
+
+
+@pytest.fixture
+def run_batch_cmd():
+    return wwatch3_cmd.run_batch.RunBatch(wwatch3_cmd.main.WWatch3App, [])
+
+
+@pytest.fixture(autouse=True)
+def forcing_index_cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", os.fspath(tmp_path / "cache"))
+
+
+@pytest.fixture
+def desc_files(tmp_path):
+    runs_dir = tmp_path / "scratch" / "wwatch3_runs"
+    runs_dir.mkdir(parents=True)
+    mod_def_ww3 = tmp_path / "mod_def.ww3"
+    mod_def_ww3.write_bytes(b"")
+    for forcing in ("current", "wind"):
+        (tmp_path / forcing).mkdir()
+        (tmp_path / forcing / f"SoG_{forcing}_20191015.nc").write_bytes(b"")
+    desc_files = []
+    for member in ("a", "b", "c"):
+        desc_file = tmp_path / "ensemble" / f"SoGwaves_{member}.yaml"
+        desc_file.parent.mkdir(exist_ok=True)
+        desc_file.write_text(
+            textwrap.dedent(
+                f"""\
+                run_id: SoGwaves_{member}
+                account: def-allen
+                email: someone@eoas.ubc.ca
+
+                paths:
+                  runs directory: {os.fspath(runs_dir)}
+
+                grid:
+                  mod_def.ww3 file: {os.fspath(mod_def_ww3)}
+
+                forcing:
+                  current: {os.fspath(tmp_path / "current")}
+                  wind: {os.fspath(tmp_path / "wind")}
+                """
+            )
+        )
+        desc_files.append(desc_file)
+    return desc_files
+
+
+class TestParser:
+    """Unit tests for `wwatch3 run-batch` sub-command command-line parser.
+    """
+
+    def test_get_parser(self, run_batch_cmd):
+        parser = run_batch_cmd.get_parser("wwatch3 run-batch")
+        assert parser.prog == "wwatch3 run-batch"
+
+    def test_parsed_args_defaults(self, run_batch_cmd):
+        parser = run_batch_cmd.get_parser("wwatch3 run-batch")
+        parsed_args = parser.parse_args(
+            ["00:20:00", "results/", "a.yaml", "ensemble/*.yaml"]
+        )
+        assert parsed_args.walltime == "00:20:00"
+        assert parsed_args.results_dir == Path("results/")
+        assert parsed_args.desc_files == ["a.yaml", "ensemble/*.yaml"]
+        assert parsed_args.manifest is None
+        assert not parsed_args.no_submit
+        assert parsed_args.start_date == arrow.now().floor("day")
+        assert parsed_args.n_days == 1
+        assert parsed_args.prep_workers == 8
+        assert parsed_args.max_submits == 4
+
+    def test_parsed_args_manifest(self, run_batch_cmd):
+        parser = run_batch_cmd.get_parser("wwatch3 run-batch")
+        parsed_args = parser.parse_args(
+            ["00:20:00", "results/", "--manifest", "ensemble.txt"]
+        )
+        assert parsed_args.desc_files == []
+        assert parsed_args.manifest == Path("ensemble.txt")
+
+    @pytest.mark.parametrize("option", ("--prep-workers", "--max-submits"))
+    def test_bad_concurrency(self, option, run_batch_cmd):
+        parser = run_batch_cmd.get_parser("wwatch3 run-batch")
+        with pytest.raises(SystemExit):
+            parser.parse_args(["00:20:00", "results/", "a.yaml", option, "0"])
+
+
+class TestRunBatch:
+    """Unit tests for run_batch() function.
+    """
+
+    def test_no_submit(self, desc_files, tmp_path):
+        rows = wwatch3_cmd.run_batch.run_batch(
+            desc_files,
+            tmp_path / "results",
+            arrow.get("2019-10-15"),
+            "00:20:00",
+            no_submit=True,
+        )
+        assert [row[:3] for row in rows] == [
+            ("SoGwaves_a", os.fspath(desc_files[0]), ""),
+            ("SoGwaves_b", os.fspath(desc_files[1]), ""),
+            ("SoGwaves_c", os.fspath(desc_files[2]), ""),
+        ]
+        assert all(row[3].startswith("prepared: ") for row in rows)
+        runs_dir = tmp_path / "scratch" / "wwatch3_runs"
+        assert len(list(runs_dir.glob("SoGwaves_?_*/SoGWW3.sh"))) == 3
+        sogww3_sh = next(runs_dir.glob("SoGwaves_b_*/SoGWW3.sh")).read_text()
+        assert f"#SBATCH --output={tmp_path/'results'/'SoGwaves_b'/'stdout'}" in (
+            sogww3_sh
+        )
+
+    def test_submit(self, desc_files, tmp_path, monkeypatch):
+        job_ids = {"SoGwaves_a": 101, "SoGwaves_b": 102, "SoGwaves_c": 103}
+
+        def mock_sbatch(cmd, *args, **kwargs):
+            run_id = Path(cmd[-1]).parent.name.rsplit("_", 1)[0]
+            return SimpleNamespace(stdout=f"Submitted batch job {job_ids[run_id]}\n")
+
+        monkeypatch.setattr(wwatch3_cmd.run.subprocess, "run", mock_sbatch)
+        rows = wwatch3_cmd.run_batch.run_batch(
+            desc_files, tmp_path / "results", arrow.get("2019-10-15"), "00:20:00"
+        )
+        assert [(row[0], row[2], row[3]) for row in rows] == [
+            ("SoGwaves_a", "101", "submitted"),
+            ("SoGwaves_b", "102", "submitted"),
+            ("SoGwaves_c", "103", "submitted"),
+        ]
+
+    def test_failures_dont_stop_other_runs(
+        self, desc_files, tmp_path, caplog, monkeypatch
+    ):
+        desc_files[0].write_text(
+            desc_files[0].read_text().replace("forcing:", "no-forcing:")
+        )
+
+        def mock_sbatch(cmd, *args, **kwargs):
+            if "SoGwaves_c" in cmd[-1]:
+                raise subprocess.CalledProcessError(1, cmd)
+            return SimpleNamespace(stdout="Submitted batch job 102\n")
+
+        monkeypatch.setattr(wwatch3_cmd.run.subprocess, "run", mock_sbatch)
+        rows = wwatch3_cmd.run_batch.run_batch(
+            desc_files, tmp_path / "results", arrow.get("2019-10-15"), "00:20:00"
+        )
+        assert [(row[0], row[2], row[3]) for row in rows] == [
+            (
+                "SoGwaves_a",
+                "",
+                'failed: preparation error: "forcing: current" key not found - '
+                "please check your run description YAML file; "
+                '"forcing: wind" key not found - '
+                "please check your run description YAML file",
+            ),
+            ("SoGwaves_b", "102", "submitted"),
+            (
+                "SoGwaves_c",
+                "",
+                "failed: submission error: sbatch exited with status 1",
+            ),
+        ]
+        assert caplog.records[-1].levelname == "ERROR"
+        assert caplog.messages[-1] == "2 of 3 runs failed"
+
+    def test_parallel_preparation_errors_in_their_rows(self, desc_files, tmp_path):
+        desc_files[0].write_text(desc_files[0].read_text().replace("email:", "e:"))
+        desc_files[2].write_text(
+            desc_files[2].read_text().replace("account:", "no-account:")
+        )
+        rows = wwatch3_cmd.run_batch.run_batch(
+            desc_files,
+            tmp_path / "results",
+            arrow.get("2019-10-15"),
+            "00:20:00",
+            prep_workers=3,
+            no_submit=True,
+        )
+        assert rows[0][3] == (
+            'failed: preparation error: "email" key not found - '
+            "please check your run description YAML file"
+        )
+        assert rows[1][3].startswith("prepared: ")
+        assert rows[2][3] == (
+            'failed: preparation error: "account" key not found - '
+            "please check your run description YAML file"
+        )
+
+
+class TestDescFiles:
+    """Unit tests for _desc_files() function.
+    """
+
+    def test_paths_and_globs(self, desc_files, tmp_path):
+        paths = wwatch3_cmd.run_batch._desc_files(
+            [
+                os.fspath(desc_files[1]),
+                os.fspath(tmp_path / "ensemble" / "SoGwaves_*.yaml"),
+            ]
+        )
+        assert paths == [desc_files[1], desc_files[0], desc_files[2]]
+
+    def test_manifest(self, desc_files, tmp_path):
+        manifest = tmp_path / "ensemble.txt"
+        manifest.write_text(
+            textwrap.dedent(
+                """\
+                # sensitivity study members
+
+                ensemble/SoGwaves_c.yaml
+                ensemble/SoGwaves_[ab].yaml
+                """
+            )
+        )
+        paths = wwatch3_cmd.run_batch._desc_files([], manifest)
+        assert paths == [
+            tmp_path / "ensemble" / "SoGwaves_c.yaml",
+            tmp_path / "ensemble" / "SoGwaves_a.yaml",
+            tmp_path / "ensemble" / "SoGwaves_b.yaml",
+        ]
+
+    def test_no_matches(self, tmp_path, caplog):
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run_batch._desc_files([os.fspath(tmp_path / "*.yaml")])
+        assert caplog.records[0].levelname == "ERROR"
+
+    def test_no_desc_files(self, caplog):
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run_batch._desc_files([])
+        assert caplog.messages[0] == "no run description files given"
+
+    def test_manifest_not_found(self, tmp_path, caplog):
+        with pytest.raises(SystemExit):
+            wwatch3_cmd.run_batch._desc_files([], tmp_path / "ensemble.txt")
+        assert caplog.messages[0].startswith("manifest file not found")
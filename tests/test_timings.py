@@ -0,0 +1,135 @@
+#  Copyright 2019-2021, the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""WWatch3-Cmd timings sub-command plug-in unit tests.
+"""
+import json
+from pathlib import Path
+
+import pytest
+
+import wwatch3_cmd.main
+import wwatch3_cmd.timings
+
+
+@pytest.fixture
+def timings_cmd():
+    return wwatch3_cmd.timings.Timings(wwatch3_cmd.main.WWatch3App, [])
+
+
+@pytest.fixture
+def results_dir(tmp_path):
+    def record(run_id, day, stage, start, seconds, exit_status=0, peak_rss_kb=None):
+        return json.dumps(
+            {
+                "run_id": run_id,
+                "day": day,
+                "stage": stage,
+                "start": start,
+                "end": start + seconds,
+                "exit_status": exit_status,
+                "peak_rss_kb": peak_rss_kb,
+            }
+        )
+
+    for run_id, day, shel_seconds, exit_status in (
+        ("SoGwaves_15oct19", "20191015", 1200, 0),
+        ("SoGwaves_15oct19", "20191016", 1800, 1),
+    ):
+        day_results_dir = tmp_path / f"{int(day[-2:])}oct19"
+        day_results_dir.mkdir()
+        (day_results_dir / "wwatch3_timings.jsonl").write_text(
+            "\n".join(
+                (
+                    record(run_id, day, "shel", 1571184000.0, shel_seconds),
+                    record(run_id, day, "prnc_wind", 1571183900.0, 60.5, 0, 2048),
+                    record(run_id, day, "ounf", 1571185900.0, 30, exit_status, 1024),
+                )
+            )
+        )
+    return tmp_path
+
+
+class TestParser:
+    """Unit tests for `wwatch3 timings` sub-command command-line parser.
+    """
+
+    def test_get_parser(self, timings_cmd):
+        parser = timings_cmd.get_parser("wwatch3 timings")
+        assert parser.prog == "wwatch3 timings"
+
+    def test_parsed_args_defaults(self, timings_cmd):
+        parser = timings_cmd.get_parser("wwatch3 timings")
+        parsed_args = parser.parse_args(["results/"])
+        assert parsed_args.results_dir == Path("results/")
+        assert parsed_args.group_by == "stage"
+
+    @pytest.mark.parametrize("group_by", ("stage", "day", "run"))
+    def test_parsed_args_group_by(self, group_by, timings_cmd):
+        parser = timings_cmd.get_parser("wwatch3 timings")
+        parsed_args = parser.parse_args(["results/", "--group-by", group_by])
+        assert parsed_args.group_by == group_by
+
+    def test_bad_group_by(self, timings_cmd):
+        parser = timings_cmd.get_parser("wwatch3 timings")
+        with pytest.raises(SystemExit):
+            parser.parse_args(["results/", "--group-by", "node"])
+
+
+class TestTimings:
+    """Unit tests for timings() function.
+    """
+
+    def test_group_by_stage(self, results_dir):
+        columns, rows = wwatch3_cmd.timings.timings(results_dir)
+        assert columns == wwatch3_cmd.timings.SUMMARY_COLUMNS
+        assert rows == [
+            ("prnc_wind", 2, 0, 60.5, 60.5, 60.5, 121.0, 2.0),
+            ("shel", 2, 0, 1500.0, 1200.0, 1800.0, 3000.0, None),
+            ("ounf", 2, 1, 30.0, 30.0, 30.0, 60.0, 1.0),
+        ]
+
+    def test_group_by_day(self, results_dir):
+        columns, rows = wwatch3_cmd.timings.timings(results_dir, "day")
+        assert columns == ("day",) + wwatch3_cmd.timings.SUMMARY_COLUMNS
+        assert [row[:4] for row in rows] == [
+            ("20191015", "prnc_wind", 1, 0),
+            ("20191015", "shel", 1, 0),
+            ("20191015", "ounf", 1, 0),
+            ("20191016", "prnc_wind", 1, 0),
+            ("20191016", "shel", 1, 0),
+            ("20191016", "ounf", 1, 1),
+        ]
+
+    def test_group_by_run(self, results_dir):
+        columns, rows = wwatch3_cmd.timings.timings(results_dir, "run")
+        assert columns[0] == "run id"
+        assert [row[:3] for row in rows] == [
+            ("SoGwaves_15oct19", "prnc_wind", 2),
+            ("SoGwaves_15oct19", "shel", 2),
+            ("SoGwaves_15oct19", "ounf", 2),
+        ]
+
+    def test_malformed_record(self, results_dir, caplog):
+        with (results_dir / "15oct19" / "wwatch3_timings.jsonl").open("at") as f:
+            f.write('\n{"run_id": "SoGwaves_15oct19", "day": "2019')
+        columns, rows = wwatch3_cmd.timings.timings(results_dir)
+        assert rows[1][:2] == ("shel", 2)
+        assert caplog.records[0].levelname == "WARNING"
+        assert caplog.messages[0].startswith("skipped malformed timing record at ")
+
+    def test_no_records(self, tmp_path, caplog):
+        columns, rows = wwatch3_cmd.timings.timings(tmp_path)
+        assert rows == []
+        assert caplog.records[0].levelname == "WARNING"
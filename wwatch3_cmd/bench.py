@@ -0,0 +1,420 @@
+#  Copyright 2019-2021, the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""WWatch3-Cmd command plug-ins for bench and bench-report sub-commands.
+
+Prepare and submit a set of WaveWatch III® runs over a range of MPI process counts,
+and report the ww3_shel throughput and parallel efficiency of those runs.
+"""
+import csv
+from copy import deepcopy
+import datetime
+import json
+import logging
+import math
+from pathlib import Path
+
+import cliff.command
+import cliff.lister
+
+import wwatch3_cmd.run
+
+# Heavier dependencies are imported where they are used to keep plug-in loading fast
+
+logger = logging.getLogger(__name__)
+
+REPORT_COLUMNS = (
+    "MPI processes",
+    "simulated days",
+    "ww3_shel wall seconds",
+    "simulated days per wall hour",
+    "speedup",
+    "parallel efficiency",
+)
+
+
+class Bench(cliff.command.Command):
+    """Prepare and submit WaveWatch III® runs to benchmark ww3_shel scaling.
+    """
+
+    def get_parser(self, prog_name):
+        import arrow
+
+        parser = super().get_parser(prog_name)
+        parser.description = """
+            Prepare and submit a WaveWatch III® run described in DESC_FILE
+            for each of the MPI process counts given by --n-procs.
+            The results of each run are gathered in an npN/ directory in RESULTS_DIR,
+            where N is the number of MPI processes.
+            Use `wwatch3 bench-report RESULTS_DIR` to report on the runs
+            after they have finished.
+
+            If RESULTS_DIR does not exist it will be created.
+        """
+        parser.add_argument(
+            "desc_file",
+            metavar="DESC_FILE",
+            type=Path,
+            help="run description YAML file",
+        )
+        parser.add_argument(
+            "walltime",
+            metavar="WALLTIME",
+            type=str,
+            help="HPC batch job walltime for each run; formatted as HH:MM:SS",
+        )
+        parser.add_argument(
+            "results_dir",
+            metavar="RESULTS_DIR",
+            type=Path,
+            help="directory to store the benchmark runs results into",
+        )
+        parser.add_argument(
+            "--n-procs",
+            dest="n_procs_list",
+            type=wwatch3_cmd.run.Run._positive_int,
+            nargs="+",
+            required=True,
+            help="""
+                Numbers of ww3_shel MPI processes to do benchmark runs with;
+                e.g. --n-procs 20 40 80
+                """,
+        )
+        parser.add_argument(
+            "--no-submit",
+            dest="no_submit",
+            action="store_true",
+            help="""
+            Prepare the temporary run directories, and the bash scripts to
+            execute the WaveWatch III® runs, but don't submit the runs to the queue.
+            """,
+        )
+        parser.add_argument(
+            "-q",
+            "--quiet",
+            action="store_true",
+            help="don't show the run directory paths or job submission messages",
+        )
+        parser.add_argument(
+            "--start-date",
+            type=wwatch3_cmd.run.Run._arrow_date,
+            default=arrow.now().floor("day"),
+            help=f"""
+                Date to start the runs on. Use YYYY-MM-DD format.
+                Defaults to {arrow.now().floor('day').format('YYYY-MM-DD')}.
+                """,
+        )
+        parser.add_argument(
+            "--n-days",
+            type=wwatch3_cmd.run.Run._positive_int,
+            default=1,
+            help="Number of days to run in each benchmark run. Defaults to 1.",
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        """Execute the `wwatch3 bench` sub-command.
+
+        The messages generated upon submission of the runs to the queue
+        manager are logged to the console.
+
+        :param parsed_args: Arguments and options parsed from the command-line.
+        :type parsed_args: :class:`argparse.Namespace` instance
+        """
+        submit_job_msgs = bench(
+            parsed_args.desc_file,
+            parsed_args.results_dir,
+            parsed_args.start_date,
+            parsed_args.walltime,
+            parsed_args.n_procs_list,
+            n_days=parsed_args.n_days,
+            no_submit=parsed_args.no_submit,
+            quiet=parsed_args.quiet,
+        )
+        if parsed_args.quiet:
+            return
+        for n_procs, submit_job_msg in submit_job_msgs.items():
+            if submit_job_msg:
+                logger.info(f"{n_procs} MPI processes: {submit_job_msg.strip()}")
+
+
+class BenchReport(cliff.lister.Lister):
+    """Report ww3_shel throughput and parallel efficiency of benchmark runs.
+    """
+
+    def get_parser(self, prog_name):
+        parser = super().get_parser(prog_name)
+        parser.description = """
+            Report the ww3_shel throughput and parallel efficiency of the
+            finished benchmark runs in RESULTS_DIR that were submitted by
+            `wwatch3 bench`.
+            The report is also saved in bench_results.csv and bench_results.json
+            files in RESULTS_DIR.
+        """
+        parser.add_argument(
+            "results_dir",
+            metavar="RESULTS_DIR",
+            type=Path,
+            help="directory that the benchmark runs results were stored in",
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        """Execute the `wwatch3 bench-report` sub-command.
+
+        :param parsed_args: Arguments and options parsed from the command-line.
+        :type parsed_args: :class:`argparse.Namespace` instance
+
+        :returns: Report column names, and rows.
+        :rtype: 2-tuple
+        """
+        return REPORT_COLUMNS, bench_report(parsed_args.results_dir)
+
+
+def bench(
+    desc_file,
+    results_dir,
+    start_date,
+    walltime,
+    n_procs_list,
+    n_days=1,
+    no_submit=False,
+    quiet=False,
+):
+    """Prepare, and submit to the queue manager, a run for each of the MPI process
+    counts in :kbd:`n_procs_list`.
+
+    Each run uses a copy of the run description with :kbd:`_npN` appended to the
+    :kbd:`run_id`, where :kbd:`N` is the MPI process count,
+    and the node and task layout for that MPI process count in its
+    :kbd:`resources` section.
+    Those run description files are stored in :kbd:`results_dir`,
+    and the runs are prepared and submitted by :py:func:`wwatch3_cmd.run.run`.
+
+    :param desc_file: File path/name of the YAML run description file.
+    :type desc_file: :py:class:`pathlib.Path`
+
+    :param results_dir: Path of the directory in which to store the benchmark
+                        runs results;
+                        it will be created if it does not exist.
+    :type results_dir: :py:class:`pathlib.Path`
+
+    :param start_date: Date to start the runs on.
+    :type :py:class:`arrow.Arrow`:
+
+    :param str walltime: HPC batch job walltime to use for each run;
+                         formatted as :kbd:`HH:MM:SS`.
+
+    :param n_procs_list: Numbers of :program:`ww3_shel` MPI processes to do
+                         benchmark runs with.
+    :type n_procs_list: list of int
+
+    :param int n_days: Number of days to run in each benchmark run.
+
+    :param boolean no_submit: Prepare the temporary run directories,
+                              and the run scripts, but don't submit the runs
+                              to the queue.
+
+    :param boolean quiet: Don't show the run directory path messages.
+
+    :returns: Messages generated by queue manager upon submission of the
+              run scripts, keyed by MPI process count.
+    :rtype: dict
+    """
+    import nemo_cmd.prepare
+    import yaml
+
+    run_desc = nemo_cmd.prepare.load_run_desc(desc_file)
+    run_id = nemo_cmd.prepare.get_run_desc_value(run_desc, ("run_id",))
+    resources = wwatch3_cmd.run._batch_resources(run_desc)
+    results_dir = wwatch3_cmd.run._resolve_results_dir(results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    n_procs_list = sorted(set(n_procs_list))
+    layouts = {
+        n_procs: _bench_resources(resources, n_procs) for n_procs in n_procs_list
+    }
+    submit_job_msgs = {}
+    for n_procs, layout in layouts.items():
+        np_run_desc = deepcopy(run_desc)
+        np_run_desc.update({"run_id": f"{run_id}_np{n_procs}", "resources": layout})
+        np_desc_file = results_dir / f"{desc_file.stem}_np{n_procs}.yaml"
+        with np_desc_file.open("wt") as f:
+            yaml.safe_dump(np_run_desc, f, default_flow_style=False)
+        submit_job_msgs[n_procs] = wwatch3_cmd.run.run(
+            np_desc_file,
+            results_dir / f"np{n_procs}",
+            start_date,
+            walltime,
+            n_days=n_days,
+            no_submit=no_submit,
+            quiet=quiet,
+        )
+    return submit_job_msgs
+
+
+def _bench_resources(resources, n_procs):
+    """Calculate the node and task layout for a benchmark run.
+
+    The run description's :kbd:`tasks per node` value is used as the maximum number
+    of tasks per node, and the MPI processes are spread evenly over as few nodes
+    as possible.
+    The rest of the run description's resources,
+    like :kbd:`node-local scratch`,
+    are used unchanged.
+
+    :param dict resources: Batch job node and MPI task layout from
+                           :py:func:`wwatch3_cmd.run._batch_resources`.
+
+    :param int n_procs: Number of :program:`ww3_shel` MPI processes.
+
+    :returns: Contents of the :kbd:`resources` section of the run description for
+              the benchmark run.
+    :rtype: dict
+
+    :raises: :py:exc:`SystemExit` if the MPI processes can't be spread evenly
+             over the nodes,
+             or if a run in node-local scratch would need more than 1 node.
+    """
+    max_tasks_per_node = resources["tasks per node"]
+    nodes = math.ceil(n_procs / max_tasks_per_node)
+    if n_procs % nodes:
+        logger.error(
+            f"{n_procs} MPI processes can't be spread evenly over {nodes} nodes "
+            f"with at most {max_tasks_per_node} tasks per node"
+        )
+        raise SystemExit(2)
+    if resources["node-local scratch"] and nodes > 1:
+        logger.error(
+            f"{n_procs} MPI processes need {nodes} nodes with at most "
+            f"{max_tasks_per_node} tasks per node, but node-local scratch can only "
+            f"be used by runs on 1 node"
+        )
+        raise SystemExit(2)
+    layout = {**resources, "nodes": nodes, "tasks per node": n_procs // nodes}
+    # The number of MPI processes is calculated from the layout when the run is
+    # prepared
+    layout.pop("n_procs", None)
+    return layout
+
+
+def bench_report(results_dir):
+    """Calculate the :program:`ww3_shel` throughput and parallel efficiency
+    of the benchmark runs in :kbd:`results_dir`,
+    and save the report in :file:`bench_results.csv` and :file:`bench_results.json`
+    files in :kbd:`results_dir`.
+
+    The :program:`ww3_shel` wall time for each day is calculated from the
+    :kbd:`Starting run at` and :kbd:`Ended run at` lines in the :file:`stdout` file(s)
+    of the run.
+    Speedup and parallel efficiency are relative to the run with the fewest
+    MPI processes.
+
+    :param results_dir: Path of the directory that the benchmark runs results
+                        were stored in.
+    :type results_dir: :py:class:`pathlib.Path`
+
+    :returns: Report rows in :py:data:`REPORT_COLUMNS` order.
+    :rtype: list of tuples
+    """
+    results_dir = wwatch3_cmd.run._resolve_results_dir(results_dir)
+    np_results_dirs = {
+        int(np_results_dir.name[2:]): np_results_dir
+        for np_results_dir in results_dir.glob("np*")
+        if np_results_dir.is_dir() and np_results_dir.name[2:].isdigit()
+    }
+    timings = {}
+    for n_procs, np_results_dir in sorted(np_results_dirs.items()):
+        shel_seconds = []
+        for stdout in sorted(np_results_dir.rglob("stdout")):
+            try:
+                shel_seconds.extend(_shel_run_seconds(stdout.read_text().splitlines()))
+            except ValueError as exc:
+                logger.warning(
+                    f"unable to read ww3_shel run times from {stdout}: {exc} - "
+                    f"skipping it"
+                )
+        if not shel_seconds or not sum(shel_seconds):
+            logger.warning(f"no finished ww3_shel runs found in {np_results_dir}")
+            continue
+        timings[n_procs] = (len(shel_seconds), sum(shel_seconds))
+    rows = []
+    if timings:
+        ref_n_procs, (ref_sim_days, ref_wall_seconds) = next(iter(timings.items()))
+    for n_procs, (sim_days, wall_seconds) in timings.items():
+        seconds_per_day = wall_seconds / sim_days
+        speedup = (ref_wall_seconds / ref_sim_days) / seconds_per_day
+        rows.append(
+            (
+                n_procs,
+                sim_days,
+                wall_seconds,
+                round(3600 / seconds_per_day, 2),
+                round(speedup, 3),
+                round(speedup * ref_n_procs / n_procs, 3),
+            )
+        )
+    with (results_dir / "bench_results.csv").open("wt", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(REPORT_COLUMNS)
+        writer.writerows(rows)
+    with (results_dir / "bench_results.json").open("wt") as f:
+        json.dump([dict(zip(REPORT_COLUMNS, row)) for row in rows], f, indent=2)
+    return rows
+
+
+def _shel_run_seconds(stdout_lines):
+    """Calculate the :program:`ww3_shel` wall time of each day of a run from the
+    :kbd:`Starting run at` and :kbd:`Ended run at` lines in its :file:`stdout` file.
+
+    The times are the output of the :command:`date` command;
+    e.g. :kbd:`Tue Oct 15 17:06:43 PDT 2019`.
+    The time zone is ignored because the start and end times are in the same one.
+
+    :param stdout_lines: Lines from the :file:`stdout` file of a run.
+    :type stdout_lines: list of str
+
+    :returns: Wall time in seconds of each day that finished.
+    :rtype: list of int
+
+    :raises: :py:exc:`ValueError` if a start or end time can't be parsed.
+    """
+    shel_seconds = []
+    start = None
+    for line in stdout_lines:
+        if line.startswith("Starting run at "):
+            start = _parse_date_output(line[len("Starting run at ") :])
+        elif line.startswith("Ended run at ") and start is not None:
+            end = _parse_date_output(line[len("Ended run at ") :])
+            shel_seconds.append(int((end - start).total_seconds()))
+            start = None
+    return shel_seconds
+
+
+def _parse_date_output(date_output):
+    """Parse the output of the :command:`date` command, ignoring its time zone.
+
+    :param str date_output: :command:`date` command output;
+                            e.g. :kbd:`Tue Oct 15 17:06:43 PDT 2019`.
+
+    :rtype: :py:class:`datetime.datetime`
+
+    :raises: :py:exc:`ValueError` if the output is not in that format.
+    """
+    try:
+        weekday, month, day, time, *_, year = date_output.split()
+    except ValueError:
+        raise ValueError(f"unrecognized date output: {date_output.strip()}")
+    return datetime.datetime.strptime(
+        f"{month} {day} {time} {year}", "%b %d %H:%M:%S %Y"
+    )
@@ -0,0 +1,340 @@
+#  Copyright 2019-2021, the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""WWatch3-Cmd command plug-in for gather sub-command.
+
+Gather the results files from a WaveWatch III® run into a results directory.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import logging
+import os
+from pathlib import Path
+import shutil
+
+import cliff.command
+
+import wwatch3_cmd.run
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "wwatch3_gather.sha256"
+# Size of the blocks that files are read and written in while they are copied
+# and checksummed
+CHUNK_BYTES = 16 * 1024 * 1024
+
+
+class Gather(cliff.command.Command):
+    """Gather results files from a WaveWatch III® run into a results directory.
+    """
+
+    def get_parser(self, prog_name):
+        parser = super().get_parser(prog_name)
+        parser.description = f"""
+            Move all of the files from the current directory into RESULTS_DIR.
+            Files are renamed if RESULTS_DIR is on the same file system as the
+            current directory, replacing any files of the same names.
+            Otherwise they are copied several at a time,
+            and each copy is verified with a SHA-256 checksum before the original
+            is deleted.
+            Files that are already in RESULTS_DIR with the same checksum
+            are not copied again.
+            The checksums of the copied files are recorded in {MANIFEST_FILE}
+            in RESULTS_DIR in sha256sum format.
+            Directories are merged into directories of the same names
+            in RESULTS_DIR.
+
+            If RESULTS_DIR does not exist it will be created.
+        """
+        parser.add_argument(
+            "results_dir",
+            metavar="RESULTS_DIR",
+            type=Path,
+            help="directory to store results into",
+        )
+        parser.add_argument(
+            "--streams",
+            type=wwatch3_cmd.run.Run._positive_int,
+            default=4,
+            help="""
+                Number of files to copy, or checksum, at the same time.
+                Defaults to 4.
+                """,
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        """Execute the `wwatch3 gather` sub-command.
+
+        :param parsed_args: Arguments and options parsed from the command-line.
+        :type parsed_args: :class:`argparse.Namespace` instance
+        """
+        gather(parsed_args.results_dir, streams=parsed_args.streams)
+
+
+def gather(results_dir, streams=4, run_dir=None):
+    """Move all of the files from :kbd:`run_dir` into :kbd:`results_dir`,
+    and record the checksums of the files that had to be copied in the
+    :file:`wwatch3_gather.sha256` manifest in :kbd:`results_dir`.
+
+    Files that are renamed into :kbd:`results_dir` because it is on the same
+    file system as :kbd:`run_dir` are not read to calculate checksums,
+    so that gathering multi-GB results files stays cheap;
+    any manifest entries for files that they replace are removed.
+
+    Symlinks to mid-day checkpoint restart files are deleted instead of being
+    gathered because the checkpoint restart file is deleted from the results
+    directory when the day that was restarted from it finishes.
+
+    :param results_dir: Path of the directory in which to store the run results;
+                        it will be created if it does not exist.
+    :type results_dir: :py:class:`pathlib.Path`
+
+    :param int streams: Number of files to copy, or checksum, at the same time.
+
+    :param run_dir: Path of the directory to gather the results files from;
+                    defaults to the current working directory.
+    :type run_dir: :py:class:`pathlib.Path`
+
+    :returns: SHA-256 checksums of the copied files, keyed by file name.
+    :rtype: dict
+
+    :raises: :py:exc:`SystemExit` if any of the files can't be gathered;
+             the files that can't be gathered are left in :kbd:`run_dir`.
+    """
+    run_dir = Path.cwd() if run_dir is None else run_dir
+    results_dir = wwatch3_cmd.run._resolve_results_dir(results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    same_file_system = _same_file_system(run_dir, results_dir)
+    paths = sorted(path for path in run_dir.iterdir() if path != results_dir)
+    files = [path for path in paths if path.is_file() and not path.is_symlink()]
+    others = [path for path in paths if path not in files]
+    checksums, renamed, errors = {}, [], []
+    with ThreadPoolExecutor(max_workers=streams) as pool:
+        futures = {
+            pool.submit(_gather_file, path, results_dir, same_file_system): path
+            for path in files
+        }
+        for future, path in futures.items():
+            try:
+                checksum = future.result()
+            except OSError as exc:
+                errors.append(f"unable to gather {path}: {exc}")
+                continue
+            if checksum is None:
+                renamed.append(path.name)
+            else:
+                checksums[path.name] = checksum
+    for path in others:
+        try:
+            if _checkpoint_link(path):
+                path.unlink()
+                continue
+            _move(path, results_dir / path.name)
+        except OSError as exc:
+            errors.append(f"unable to gather {path}: {exc}")
+    _update_manifest(results_dir, checksums, renamed)
+    if errors:
+        for error in errors:
+            logger.error(error)
+        raise SystemExit(2)
+    logger.info(f"gathered {len(paths)} files from {run_dir} into {results_dir}")
+    return checksums
+
+
+def _checkpoint_link(path):
+    """Check whether a path is a symlink to a mid-day checkpoint restart file.
+
+    :param path: Path to check.
+    :type path: :py:class:`pathlib.Path`
+
+    :rtype: boolean
+    """
+    return (
+        path.is_symlink()
+        and Path(os.readlink(path)).name == wwatch3_cmd.run.CHECKPOINT_RESTART_FILE
+    )
+
+
+def _same_file_system(run_dir, results_dir):
+    """Check whether files can be renamed from :kbd:`run_dir` to :kbd:`results_dir`
+    instead of being copied.
+
+    :param run_dir: Path of the directory to gather the results files from.
+    :type run_dir: :py:class:`pathlib.Path`
+
+    :param results_dir: Path of the directory in which to store the run results.
+    :type results_dir: :py:class:`pathlib.Path`
+
+    :rtype: boolean
+    """
+    return os.stat(run_dir).st_dev == os.stat(results_dir).st_dev
+
+
+def _gather_file(path, results_dir, same_file_system):
+    """Move a file into :kbd:`results_dir`, verifying the copy with a checksum
+    if the file has to be copied.
+
+    Renaming a file replaces any file of the same name in :kbd:`results_dir`,
+    so there is no need to check whether it is already there.
+
+    :param path: Path of the file to gather.
+    :type path: :py:class:`pathlib.Path`
+
+    :param results_dir: Path of the directory in which to store the run results.
+    :type results_dir: :py:class:`pathlib.Path`
+
+    :param boolean same_file_system: Rename the file instead of copying it.
+
+    :returns: SHA-256 checksum of the file,
+              or :py:obj:`None` if the file was renamed.
+    :rtype: str
+
+    :raises: :py:exc:`OSError` if the file can't be moved,
+             or the checksum of its copy doesn't match.
+    """
+    dest = results_dir / path.name
+    if same_file_system:
+        os.replace(path, dest)
+        return None
+    if dest.is_file() and dest.stat().st_size == path.stat().st_size:
+        checksum = _sha256(path)
+        if _sha256(dest) == checksum:
+            logger.debug(f"skipped copy of {path}; it is already in {results_dir}")
+            path.unlink()
+            return checksum
+    checksum = _copy_file(path, dest)
+    path.unlink()
+    return checksum
+
+
+def _copy_file(path, dest):
+    """Copy a file, calculating its checksum in the same pass,
+    and verify the copy against that checksum before it is given its final name.
+
+    :param path: Path of the file to copy.
+    :type path: :py:class:`pathlib.Path`
+
+    :param dest: Path to copy the file to.
+    :type dest: :py:class:`pathlib.Path`
+
+    :returns: SHA-256 checksum of the file.
+    :rtype: str
+
+    :raises: :py:exc:`OSError` if the file can't be copied,
+             or the checksum of its copy doesn't match.
+    """
+    tmp_dest = dest.with_name(f".{dest.name}.gather")
+    sha256 = hashlib.sha256()
+    try:
+        with path.open("rb") as src, tmp_dest.open("wb") as dst:
+            for chunk in iter(lambda: src.read(CHUNK_BYTES), b""):
+                sha256.update(chunk)
+                dst.write(chunk)
+        shutil.copystat(path, tmp_dest)
+        checksum = sha256.hexdigest()
+        if _sha256(tmp_dest) != checksum:
+            raise OSError(f"checksum of copy does not match {checksum}")
+        os.replace(tmp_dest, dest)
+    except OSError:
+        if tmp_dest.exists():
+            tmp_dest.unlink()
+        raise
+    return checksum
+
+
+def _sha256(path):
+    """Calculate the SHA-256 checksum of a file.
+
+    :param path: Path of the file.
+    :type path: :py:class:`pathlib.Path`
+
+    :rtype: str
+    """
+    sha256 = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _move(path, dest):
+    """Move a symlink or directory into the results directory.
+
+    Symlinks are re-created with the same target rather than copying the files
+    that they point to.
+    A directory whose name is already used by a directory in the results directory,
+    as happens when a gather is repeated, has its contents merged into that
+    directory; files in it replace files of the same name.
+
+    :param path: Path of the symlink or directory to move.
+    :type path: :py:class:`pathlib.Path`
+
+    :param dest: Path to move it to.
+    :type dest: :py:class:`pathlib.Path`
+
+    :raises: :py:exc:`OSError` if it can't be moved.
+    """
+    if path.is_symlink():
+        if dest.is_symlink() or dest.is_file():
+            dest.unlink()
+        dest.symlink_to(os.readlink(path))
+        path.unlink()
+        return
+    if dest.is_dir() and not dest.is_symlink():
+        for child in path.iterdir():
+            if child.is_symlink() or child.is_dir():
+                _move(child, dest / child.name)
+            else:
+                shutil.move(os.fspath(child), os.fspath(dest / child.name))
+        path.rmdir()
+        return
+    if dest.is_symlink() or dest.exists():
+        dest.unlink()
+    shutil.move(os.fspath(path), os.fspath(dest))
+
+
+def _update_manifest(results_dir, checksums, renamed=()):
+    """Add the checksums of copied files to the :file:`wwatch3_gather.sha256`
+    manifest in :kbd:`results_dir`, and remove the entries for files that were
+    replaced by renamed files.
+
+    The manifest is in the format used by :command:`sha256sum`,
+    so the files can be verified with :command:`sha256sum -c wwatch3_gather.sha256`.
+
+    :param results_dir: Path of the directory in which the run results are stored.
+    :type results_dir: :py:class:`pathlib.Path`
+
+    :param dict checksums: SHA-256 checksums of copied files, keyed by file name.
+
+    :param renamed: Names of files that were renamed into :kbd:`results_dir`.
+    :type renamed: list of str
+    """
+    manifest = results_dir / MANIFEST_FILE
+    if not checksums and not (renamed and manifest.exists()):
+        return
+    entries = {}
+    if manifest.exists():
+        for line in manifest.read_text().splitlines():
+            checksum, _, name = line.partition("  ")
+            if name:
+                entries[name] = checksum
+    for name in renamed:
+        entries.pop(name, None)
+    entries.update(checksums)
+    tmp_manifest = manifest.with_name(f".{MANIFEST_FILE}.{os.getpid()}")
+    tmp_manifest.write_text(
+        "".join(f"{entries[name]}  {name}\n" for name in sorted(entries))
+    )
+    os.replace(tmp_manifest, manifest)
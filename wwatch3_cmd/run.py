@@ -17,30 +17,133 @@
 Prepare for, execute, and gather the results of a run of the WaveWatch III® model.
 """
 import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
 import logging
 import os
-from copy import deepcopy
 from pathlib import Path
+import re
 import shlex
 import shutil
 import subprocess
+import tempfile
 import textwrap
+import threading
 
-import arrow
-import arrow.parser
 import cliff.command
-import cookiecutter.main
-import nemo_cmd.prepare
-import yaml
+
+# arrow, jinja2, nemo_cmd.prepare, and yaml are imported in the functions
+# that use them so that the plug-in loads quickly for `wwatch3 help`
+# and command-line errors
 
 logger = logging.getLogger(__name__)
 
+TEMPLATE_DIR = Path(__file__).parent.parent / "cookiecutter"
+PRNC_MODES = ("serial", "concurrent")
+# Run description sections that have keys in them
+RUN_DESC_SECTIONS = ("paths", "grid", "forcing", "restart", "resources", "output")
+DEFAULT_BATCH_RESOURCES = {
+    "nodes": 1,
+    "tasks per node": 20,
+    "constraint": "skylake",
+    "memory": 0,
+    "node-local scratch": False,
+}
+# Largest number of cores per node for each node type on the clusters that we use
+CORES_PER_NODE = {
+    "broadwell": 32,
+    "skylake": 48,
+    "cascade": 48,
+}
+MEMORY_RE = re.compile(r"^\d+[KMGT]?$")
+# Seconds before the time limit that Slurm sends SIGTERM to run scripts that
+# save mid-day checkpoints
+CHECKPOINT_SIGNAL_SECONDS = 300
+CHECKPOINT_FILE = "wwatch3_checkpoint.json"
+# Name that the run script saves a day's mid-day checkpoint restart file as
+# in the day's results directory
+CHECKPOINT_RESTART_FILE = "checkpoint_restart.ww3"
+# Serializes updates of the forcing directories index by runs that are prepared
+# in threads of the same process
+_FORCING_INDEX_LOCK = threading.Lock()
+# Size of the blocks that a restart file is copied in by parallel streams when it
+# is prefetched into the temporary run directory
+RESTART_PREFETCH_CHUNK_BYTES = 16 * 1024 * 1024
+RESTART_PREFETCH_STREAMS = 4
+DEFAULT_OUTPUT_FIELDS = "HS LM WND CUR FP T02 DIR DP WCH WCC TWO FOC USS".split()
+DEFAULT_FIELDS_INTERVAL = 1800
+DEFAULT_POINTS_INTERVAL = 600
+# Output field names that ww3_shel and ww3_ounf recognize, by output group
+WW3_FIELD_NAMES = (
+    # Forcing fields
+    "DPT CUR WND AST WLV ICE IBG D50 IC1 IC5 "
+    # Standard mean wave parameters
+    "HS LM T02 T0M1 T01 FP DIR SPR DP HIG "
+    # Frequency-dependent parameters
+    "EF TH1M STH1M TH2M STH2M WN "
+    # Spectral partition parameters
+    "PHS PTP PLP PDIR PSPR PWS PDP PQP PPE PGW PSW PTM10 PT01 PT02 PEP TWS PNR "
+    # Atmosphere-waves layer
+    "UST CHA CGE FAW TAW TWA WCC WCF WCH WCM FWS "
+    # Wave-ocean layer
+    "SXY TWO BHD FOC TUS USS P2S USF P2L TWI FIC "
+    # Wave-bottom layer
+    "ABR UBR BED FBB TBB "
+    # Spectrum parameters
+    "MSS MSC WL02 AXT AYT AXY "
+    # Numerical diagnostics
+    "DTD FC CFX CFD CFK "
+    # User defined
+    "U1 U2"
+).split()
+DEFAULT_FIELDS_COMPRESSION = {
+    "deflate level": 4,
+    "shuffle": True,
+    "chunking": None,
+}
+# Number of values at each grid point of the output fields that have more than 1;
+# partition fields have a value for each of the 3 partitions in ww3_ounf.inp,
+# and frequency-dependent fields have a value for each frequency
+FIELD_COMPONENTS = {
+    "CUR": 2,
+    "WND": 2,
+    "UST": 2,
+    "TAW": 2,
+    "TWA": 2,
+    "SXY": 3,
+    "TWO": 2,
+    "TUS": 2,
+    "USS": 2,
+    "ABR": 2,
+    "UBR": 2,
+    "BED": 2,
+    "TBB": 2,
+    "MSS": 2,
+}
+PARTITION_FIELDS = (
+    "PHS PTP PLP PDIR PSPR PWS PDP PQP PPE PGW PSW PTM10 PT01 PT02 PEP".split()
+)
+FREQUENCY_FIELDS = "EF TH1M STH1M TH2M STH2M WN".split()
+# Number of mean parameters in each ww3_ounp point output table record
+POINT_TABLE_PARAMETERS = 16
+# Fraction of the batch job walltime that the planned run time may use
+PLAN_WALLTIME_FRACTION = 0.9
+# nccopy chunk specs for the layouts that fields netCDF files can be rechunked to;
+# dimensions that aren't named are chunked with their full length,
+# and {n_times} is the number of fields output times in a day
+FIELDS_CHUNKINGS = {
+    "time series": "time/{n_times},latitude/10,longitude/10",
+    "map": "time/1",
+}
+
 
 class Run(cliff.command.Command):
     """Prepare, execute, and gather results from a WaveWatch III® model run.
     """
 
     def get_parser(self, prog_name):
+        import arrow
+
         parser = super().get_parser(prog_name)
         parser.description = """
             Prepare, execute, and gather the results from a WaveWatch III®
@@ -100,6 +203,81 @@ class Run(cliff.command.Command):
             default=1,
             help="Number of days of runs to execute in the batch job. Defaults to 1.",
         )
+        parser.add_argument(
+            "--pipeline-depth",
+            type=self._non_negative_int,
+            default=0,
+            help="""
+                For multi-day runs, the number of days ahead of the ww3_shel run
+                for which to do the ww3_prnc forcing pre-processing in the background.
+                Bounds the number of days of wind.ww3 and current.ww3 files on
+                scratch at any time.
+                Defaults to 0; i.e. no pipelining.
+                """,
+        )
+        parser.add_argument(
+            "--async-post",
+            dest="async_post",
+            action="store_true",
+            help="""
+                Run the ww3_ounf post-processing, results gathering, and
+                temporary run directory deletion for each day in the background,
+                so that ww3_shel for the next day can start as soon as the
+                restart file is available.
+                """,
+        )
+        parser.add_argument(
+            "--max-days-per-job",
+            type=self._positive_int,
+            default=None,
+            help="""
+                Maximum number of days of runs to execute in each batch job.
+                Runs with more than this number of days are split into a chain
+                of batch jobs, each of which starts after the previous one
+                finishes successfully.
+                Defaults to --n-days; i.e. all of the days in one batch job.
+                """,
+        )
+        parser.add_argument(
+            "--job-array",
+            dest="job_array",
+            action="store_true",
+            help="""
+                For multi-day runs with no restart file, submit a Slurm array job
+                with one task for each day so that the days run in parallel
+                instead of one after another.
+                """,
+        )
+        parser.add_argument(
+            "--resume",
+            action="store_true",
+            help="""
+                Skip the days at the start of the run that are already complete;
+                i.e. that have their fields netCDF file, and restart file
+                (if the run uses one) in their results directory.
+                The remaining days are prepared and submitted, starting from the
+                restart file of the last complete day.
+                """,
+        )
+        parser.add_argument(
+            "--plan",
+            action="store_true",
+            help="""
+                Report estimates of the node-hours, output volume per day,
+                scratch high-water mark, and whether WALLTIME is long enough,
+                for the run, without creating any directories, or submitting it.
+                """,
+        )
+        parser.add_argument(
+            "--timings-dir",
+            type=Path,
+            default=None,
+            help="""
+                Directory tree of past runs results to take the per-stage timings
+                from for the --plan estimates.
+                Defaults to RESULTS_DIR.
+                """,
+        )
         return parser
 
     @staticmethod
@@ -115,12 +293,55 @@ class Run(cliff.command.Command):
 
         :raises: :py:exc:`argparse.ArgumentTypeError`
         """
+        import arrow
+        import arrow.parser
+
         try:
             return arrow.get(string, "YYYY-MM-DD")
         except arrow.parser.ParserError:
             msg = f"unrecognized date format: {string} - please use YYYY-MM-DD"
             raise argparse.ArgumentTypeError(msg)
 
+    @staticmethod
+    def _non_negative_int(string):
+        """Convert a string to a non-negative integer or raise
+        :py:exc:`argparse.ArgumentTypeError`.
+
+        :arg str string: String to convert.
+
+        :returns: String converted to an integer.
+
+        :raises: :py:exc:`argparse.ArgumentTypeError`
+        """
+        try:
+            value = int(string)
+        except ValueError:
+            value = -1
+        if value < 0:
+            msg = f"invalid value: {string} - please use an integer >= 0"
+            raise argparse.ArgumentTypeError(msg)
+        return value
+
+    @staticmethod
+    def _positive_int(string):
+        """Convert a string to a positive integer or raise
+        :py:exc:`argparse.ArgumentTypeError`.
+
+        :arg str string: String to convert.
+
+        :returns: String converted to an integer.
+
+        :raises: :py:exc:`argparse.ArgumentTypeError`
+        """
+        try:
+            value = int(string)
+        except ValueError:
+            value = 0
+        if value < 1:
+            msg = f"invalid value: {string} - please use an integer > 0"
+            raise argparse.ArgumentTypeError(msg)
+        return value
+
     def take_action(self, parsed_args):
         """Execute the `wwatch3 run` sub-coomand.
 
@@ -136,15 +357,35 @@ class Run(cliff.command.Command):
             parsed_args.start_date,
             parsed_args.walltime,
             n_days=parsed_args.n_days,
+            pipeline_depth=parsed_args.pipeline_depth,
+            async_post=parsed_args.async_post,
+            max_days_per_job=parsed_args.max_days_per_job,
+            job_array=parsed_args.job_array,
+            resume=parsed_args.resume,
             no_submit=parsed_args.no_submit,
             quiet=parsed_args.quiet,
+            plan=parsed_args.plan,
+            timings_dir=parsed_args.timings_dir,
         )
         if submit_job_msg and not parsed_args.quiet:
             logger.info(submit_job_msg)
 
 
 def run(
-    desc_file, results_dir, start_date, walltime, n_days=1, no_submit=False, quiet=False
+    desc_file,
+    results_dir,
+    start_date,
+    walltime,
+    n_days=1,
+    pipeline_depth=0,
+    async_post=False,
+    max_days_per_job=None,
+    job_array=False,
+    resume=False,
+    no_submit=False,
+    quiet=False,
+    plan=False,
+    timings_dir=None,
 ):
     """Create and populate a temporary run directory, and a run script,
     and submit the run to the queue manager.
@@ -152,6 +393,19 @@ def run(
     The run script is stored in :file:`SoGWW3.sh` in the temporary run directory.
     That script is submitted to the queue manager in a subprocess.
 
+    Runs with more than :kbd:`max_days_per_job` days are split into a chain of
+    batch jobs, each with its own run script in the temporary run directory of
+    its first day.
+    Each job after the first is submitted with an :kbd:`afterok` dependency on the
+    previous one so that it starts from the restart file of the previous job's
+    last day.
+
+    Runs with no restart file can instead be submitted as a Slurm array job with
+    one task for each day, so that the days run in parallel.
+
+    Runs that were interrupted, for example by a job timeout, can be resumed;
+    the days at the start of the run whose results are complete are skipped.
+
     :param desc_file: File path/name of the YAML run description file.
     :type desc_file: :py:class:`pathlib.Path`
 
@@ -167,6 +421,27 @@ def run(
 
     :param int n_days: Number of days of runs to execute in the batch job.
 
+    :param int pipeline_depth: Number of days ahead of the :program:`ww3_shel` run
+                               for which to do the :program:`ww3_prnc` forcing
+                               pre-processing in the background;
+                               0 means no pipelining.
+
+    :param boolean async_post: Run the :program:`ww3_ounf` post-processing,
+                               results gathering, and temporary run directory
+                               deletion for each day in the background.
+
+    :param int max_days_per_job: Maximum number of days of runs to execute in
+                                 each batch job;
+                                 :py:obj:`None` means all of the days in one job.
+
+    :param boolean job_array: Submit the run as a Slurm array job with one task for
+                              each day;
+                              only for runs with no restart file.
+
+    :param boolean resume: Skip the days at the start of the run whose results
+                           are already complete, and start the rest of the run
+                           from the restart file of the last complete day.
+
     :param boolean no_submit: Prepare the temporary run directory,
                               and the run script to execute the WaveWatch III® run,
                               but don't submit the run to the queue.
@@ -175,81 +450,202 @@ def run(
                           the default is to show the temporary run directory
                           path.
 
-    :returns: Message generated by queue manager upon submission of the
-              run script.
+    :param boolean plan: Don't prepare or submit the run;
+                         return a report of the estimated node-hours,
+                         output volume, and scratch space that it will use instead.
+
+    :param timings_dir: Path of the directory tree of past runs results to take
+                        the per-stage timings from for the :kbd:`plan` estimates;
+                        defaults to :kbd:`results_dir`.
+    :type timings_dir: :py:class:`pathlib.Path`
+
+    :returns: Message(s) generated by queue manager upon submission of the
+              run script(s), or the plan report.
     :rtype: str
     """
-    run_desc = nemo_cmd.prepare.load_run_desc(desc_file)
-    run_id = nemo_cmd.prepare.get_run_desc_value(run_desc, ("run_id",))
-    runs_dir = nemo_cmd.prepare.get_run_desc_value(
-        run_desc, ("paths", "runs directory"), resolve_path=True
-    )
-    mod_def_ww3_path = nemo_cmd.prepare.get_run_desc_value(
-        run_desc, ("grid", "mod_def.ww3 file"), resolve_path=True
-    )
-    current_forcing_dir = nemo_cmd.prepare.get_run_desc_value(
-        run_desc, ("forcing", "current"), resolve_path=True
-    )
-    wind_forcing_dir = nemo_cmd.prepare.get_run_desc_value(
-        run_desc, ("forcing", "wind"), resolve_path=True
+    if plan:
+        return _plan_run(
+            desc_file,
+            results_dir,
+            start_date,
+            walltime,
+            n_days=n_days,
+            pipeline_depth=pipeline_depth,
+            async_post=async_post,
+            max_days_per_job=max_days_per_job,
+            job_array=job_array,
+            timings_dir=timings_dir,
+        )
+    run_script_files = _prepare_run(
+        desc_file,
+        results_dir,
+        start_date,
+        walltime,
+        n_days=n_days,
+        pipeline_depth=pipeline_depth,
+        async_post=async_post,
+        max_days_per_job=max_days_per_job,
+        job_array=job_array,
+        resume=resume,
+        quiet=quiet,
     )
+    if no_submit:
+        return
+    return _submit_jobs(run_script_files)
+
+
+def _prepare_run(
+    desc_file,
+    results_dir,
+    start_date,
+    walltime,
+    n_days=1,
+    pipeline_depth=0,
+    async_post=False,
+    max_days_per_job=None,
+    job_array=False,
+    resume=False,
+    quiet=False,
+    tmp_run_dir_template=None,
+):
+    """Create and populate the temporary run directories, and the run script(s),
+    for a run.
+
+    See :py:func:`run` for descriptions of the parameters that it shares.
+
+    :param tmp_run_dir_template: Compiled temporary run directory templates;
+                                 they are loaded from :py:data:`TEMPLATE_DIR`
+                                 if not provided.
+    :type tmp_run_dir_template: :py:class:`_TmpRunDirTemplate`
+
+    :returns: Run script file paths, in job submission order;
+              empty if all of the days of a resumed run are complete.
+    :rtype: list of :py:class:`pathlib.Path`
+    """
+    import arrow
+
+    config = RunConfig.load(desc_file)
+    _check_node_local_scratch(config.resources, pipeline_depth)
+    if job_array:
+        _check_job_array(config, pipeline_depth, async_post, max_days_per_job)
     days = list(arrow.Arrow.range("day", start_date, limit=n_days))
-    run_start_dates_yyyymmdd = (
-        [start_date.format("YYYYMMDD")]
-        if n_days == 1
-        else [day.format("YYYYMMDD") for day in days]
-    )
+    multi_day = n_days > 1
     results_dirs = (
         [_resolve_results_dir(results_dir)]
-        if n_days == 1
+        if not multi_day
         else [
             _resolve_results_dir(results_dir) / (day.format("DDMMMYY").lower())
             for day in days
         ]
     )
+    checkpoint = None
+    if resume:
+        n_complete = _complete_days(config, days, results_dirs)
+        if n_complete == n_days:
+            logger.info(
+                f"all {n_days} day(s) of the run are complete in {results_dir}; "
+                f"nothing to resume"
+            )
+            return []
+        if n_complete:
+            config = config.evolve(
+                restart_path=_resume_restart_path(config, results_dirs[n_complete - 1])
+            )
+            logger.info(
+                f"resuming run at {days[n_complete].format('YYYY-MM-DD')} "
+                f"after {n_complete} complete day(s)"
+            )
+            days, results_dirs = days[n_complete:], results_dirs[n_complete:]
+            start_date = days[0]
+        checkpoint = _resume_checkpoint(days[0], results_dirs[0])
+    _check_forcing_files(days, config.current_forcing_dir, config.wind_forcing_dir)
+    restart_paths = _restart_chain(config.restart_path, days, multi_day)
+    if checkpoint:
+        restart_paths[0] = checkpoint[0]
+    _check_restart_chain(days, restart_paths, results_dirs)
+    run_start_dates_yyyymmdd = (
+        [start_date.format("YYYYMMDD")]
+        if not multi_day
+        else [day.format("YYYYMMDD") for day in days]
+    )
     tmp_run_dir_timestamp = arrow.now().format("YYYY-MM-DDTHHmmss.SSSSSSZ")
     tmp_run_dirs = (
-        [runs_dir / f"{run_id}_{tmp_run_dir_timestamp}"]
-        if n_days == 1
+        [config.runs_dir / f"{config.run_id}_{tmp_run_dir_timestamp}"]
+        if not multi_day
         else [
-            runs_dir
-            / f"{run_id}_{day.format('DDMMMYY').lower()}_{tmp_run_dir_timestamp}"
+            config.runs_dir
+            / f"{config.run_id}_{day.format('DDMMMYY').lower()}_{tmp_run_dir_timestamp}"
             for day in days
         ]
     )
-    for day, day_results_dir, tmp_run_dir in zip(days, results_dirs, tmp_run_dirs):
-        day_run_id = run_id
-        try:
-            restart_path = nemo_cmd.prepare.get_run_desc_value(
-                run_desc, ("restart", "restart.ww3"), resolve_path=True, fatal=False
-            )
-        except KeyError:
-            restart_path = ""
+    days_per_job = min(max_days_per_job or len(days), len(days))
+    jobs = [slice(i, i + days_per_job) for i in range(0, len(days), days_per_job)]
+    if tmp_run_dir_template is None:
+        tmp_run_dir_template = _TmpRunDirTemplate(TEMPLATE_DIR)
+    tmp_run_dir_run_desc = _TmpRunDirRunDesc(config.run_desc, desc_file, n_days)
+    _check_symlink_targets(
+        _symlink_targets(
+            config.mod_def_ww3_path,
+            config.current_forcing_dir,
+            config.wind_forcing_dir,
+            restart_paths[0],
+        )
+    )
+    # Everything has been checked, so the file system can be changed
+    if config.forcing_cache_dir:
+        config.forcing_cache_dir.mkdir(parents=True, exist_ok=True)
+    for i, (day, day_results_dir, tmp_run_dir) in enumerate(
+        zip(days, results_dirs, tmp_run_dirs)
+    ):
+        job = jobs[i // days_per_job]
+        day_run_id = config.run_id
+        restart_path = restart_paths[i]
+        prefetch_restart = i == 0 and config.prefetch_restart and bool(restart_path)
         cookiecutter_context = {
             "tmp_run_dir": tmp_run_dir,
-            "run_start_dates_yyyymmdd": "\n  ".join(run_start_dates_yyyymmdd),
-            "results_dirs": "\n  ".join(map(os.fspath, results_dirs)),
-            "work_dirs": "\n  ".join(map(os.fspath, tmp_run_dirs)),
-            "batch_directives": _sbatch_directives(run_desc, day_results_dir, walltime),
+            "run_start_dates_yyyymmdd": "\n  ".join(run_start_dates_yyyymmdd[job]),
+            "results_dirs": "\n  ".join(map(os.fspath, results_dirs[job])),
+            "work_dirs": "\n  ".join(map(os.fspath, tmp_run_dirs[job])),
+            "batch_directives": _sbatch_directives(
+                config,
+                _resolve_results_dir(results_dir) if job_array else day_results_dir,
+                walltime,
+                array_size=len(days) if job_array else None,
+                signal_seconds=(
+                    CHECKPOINT_SIGNAL_SECONDS if config.checkpoint_hours else None
+                ),
+            ),
+            "n_procs": config.resources["n_procs"],
+            "node_local_scratch": config.resources["node-local scratch"],
             "module_loads": "module load netcdf-fortran-mpi/4.4.4",
-            "run_id": run_id,
-            "runs_dir": runs_dir,
+            "run_id": config.run_id,
+            # Timing records are for the whole run, not the day that its job starts on
+            "timings_run_id": config.run_id,
+            "runs_dir": config.runs_dir,
             "run_start_date_yyyymmdd": start_date.format("YYYYMMDD"),
             "run_end_date_yyyymmdd": start_date.shift(days=+1).format("YYYYMMDD"),
-            "mod_def_ww3_path": mod_def_ww3_path,
-            "current_forcing_dir": current_forcing_dir,
-            "wind_forcing_dir": wind_forcing_dir,
+            "mod_def_ww3_path": config.mod_def_ww3_path,
+            "current_forcing_dir": config.current_forcing_dir,
+            "wind_forcing_dir": config.wind_forcing_dir,
+            "prnc_mode": config.prnc_mode,
+            "forcing_cache_dir": config.forcing_cache_dir,
+            "output_fields": config.output["fields"],
+            "fields_interval_seconds": config.output["fields interval"],
+            "points_interval_seconds": config.output["points interval"],
+            "output_points": config.output["points"],
+            "fields_nccopy_args": config.fields_nccopy_args,
+            "pipeline_depth": pipeline_depth,
+            "async_post": async_post,
+            "job_array": job_array,
             "restart_path": restart_path,
+            "prefetch_restart": prefetch_restart,
+            "run_start_hour": 0,
+            "checkpoint_interval_hours": config.checkpoint_hours,
             "results_dir": day_results_dir,
         }
-        if n_days > 1:
-            day_run_id = f"{run_id}_{day.format('DDMMMYY').lower()}"
-            if restart_path:
-                daym1_ddmmmyy = day.shift(days=-1).format("DDMMMYY").lower()
-                restart_path = (
-                    restart_path.parent.parent / daym1_ddmmmyy
-                ) / restart_path.name
-            else:
+        if multi_day:
+            day_run_id = f"{config.run_id}_{day.format('DDMMMYY').lower()}"
+            if not restart_path and not job_array:
                 logger.warning(
                     "You have requested a multi-day run with no restart file path. "
                     "Each day of the run will start from calm wave fields. "
@@ -260,97 +656,1686 @@ def run(
                     "run_id": day_run_id,
                     "run_start_date_yyyymmdd": day.format("YYYYMMDD"),
                     "run_end_date_yyyymmdd": day.shift(days=+1).format("YYYYMMDD"),
-                    "restart_path": restart_path,
                 }
             )
-        cookiecutter.main.cookiecutter(
-            os.fspath(Path(__file__).parent.parent / "cookiecutter"),
-            no_input=True,
-            output_dir=runs_dir,
-            extra_context=cookiecutter_context,
+        if i == 0 and checkpoint:
+            cookiecutter_context["run_start_hour"] = checkpoint[1]
+        symlink_targets = _symlink_targets(
+            config.mod_def_ww3_path,
+            config.current_forcing_dir,
+            config.wind_forcing_dir,
+            restart_path,
         )
-        day_run_desc = deepcopy(run_desc)
-        day_run_desc.update(
-            {"run_id": day_run_id, "restart": {"restart.ww3": os.fspath(restart_path)}}
+        tmp_run_dir_template.render(cookiecutter_context)
+        if prefetch_restart:
+            _prefetch_restart(symlink_targets.pop("restart.ww3"), tmp_run_dir)
+        _link_tmp_run_dir(tmp_run_dir, symlink_targets)
+        _write_tmp_run_dir_run_desc(
+            tmp_run_dir_run_desc, tmp_run_dir, day_run_id, restart_path
         )
-        _write_tmp_run_dir_run_desc(day_run_desc, tmp_run_dir, desc_file, n_days)
         if not quiet:
             logger.info(f"Created temporary run directory {tmp_run_dir}")
         day_results_dir.mkdir(parents=True, exist_ok=True)
-    try:
-        for tmp_run_dir in tmp_run_dirs[1:]:
+    job_tmp_run_dirs = [tmp_run_dirs[job][0] for job in jobs]
+    for tmp_run_dir in tmp_run_dirs:
+        if tmp_run_dir not in job_tmp_run_dirs:
             (tmp_run_dir / "SoGWW3.sh").unlink()
-    except IndexError:
-        # len(tmp_run_dirs) == 1 for n_days == 1
-        pass
-    run_script_file = tmp_run_dirs[0] / "SoGWW3.sh"
+    run_script_files = [tmp_run_dir / "SoGWW3.sh" for tmp_run_dir in job_tmp_run_dirs]
     if not quiet:
-        logger.info(f"Wrote job run script to {run_script_file}")
-    if no_submit:
-        return
-    sbatch_cmd = f"sbatch {run_script_file}"
-    submit_job_msg = subprocess.run(
-        shlex.split(sbatch_cmd),
-        check=True,
-        universal_newlines=True,
-        stdout=subprocess.PIPE,
-    ).stdout
-    return submit_job_msg
+        for run_script_file in run_script_files:
+            logger.info(f"Wrote job run script to {run_script_file}")
+    return run_script_files
 
 
-def _write_tmp_run_dir_run_desc(run_desc, tmp_run_dir, desc_file, n_days):
-    """Write the run description to a YAML file in the temporary run directory
-    so that it is preserved with the run results.
+def _plan_run(
+    desc_file,
+    results_dir,
+    start_date,
+    walltime,
+    n_days=1,
+    pipeline_depth=0,
+    async_post=False,
+    max_days_per_job=None,
+    job_array=False,
+    timings_dir=None,
+):
+    """Estimate the node-hours, output volume per day, and scratch high-water mark
+    of a run, and whether its walltime is long enough, without creating any
+    directories.
 
-    Extracted into a separate function to improve testability of the run() function.
+    The run description is checked in the same way that it is when the run is
+    prepared.
+    The time per day is estimated from the mean time of each stage in the timing
+    records of past runs in :kbd:`timings_dir`,
+    with the :program:`ww3_shel` times scaled linearly to the run's number of
+    MPI processes.
+    The output and scratch volumes are estimated from the grid dimensions in
+    :file:`ww3_grid.inp`, the output settings, and the sizes of the first day's
+    forcing files.
+    All of the estimates are approximate;
+    compression of the fields files, and overlap of stages, are not accounted for.
+
+    See :py:func:`run` for descriptions of the parameters that it shares.
+
+    :returns: Plan report.
+    :rtype: str
+    """
+    import wwatch3_cmd.timings
+
+    config = RunConfig.load(desc_file)
+    _check_node_local_scratch(config.resources, pipeline_depth)
+    if job_array:
+        _check_job_array(config, pipeline_depth, async_post, max_days_per_job)
+    run_id, resources, output = config.run_id, config.resources, config.output
+    checkpoint_hours = config.checkpoint_hours
+    current_forcing_dir = config.current_forcing_dir
+    wind_forcing_dir = config.wind_forcing_dir
+    walltime_seconds = _walltime_seconds(walltime)
+    grid = _grid_dimensions(
+        TEMPLATE_DIR / "{{cookiecutter.tmp_run_dir}}" / "ww3_grid.inp"
+    )
+    days_per_job = 1 if job_array else min(max_days_per_job or n_days, n_days)
+    n_jobs = -(-n_days // days_per_job)
+    n_procs, nodes = resources["n_procs"], resources["nodes"]
+    report = [
+        f"plan for {run_id}: {n_days} day(s) from {start_date.format('YYYY-MM-DD')} "
+        f"in {n_days if job_array else n_jobs} "
+        f"{'array task(s)' if job_array else 'job(s)'} of up to {days_per_job} day(s)",
+        f"grid: {grid['nx']} x {grid['ny']} points, "
+        f"{grid['n_freqs']} frequencies x {grid['n_dirs']} directions",
+        f"MPI layout: {nodes} node(s) x {resources['tasks per node']} tasks per node "
+        f"= {n_procs} ww3_shel processes",
+    ]
+
+    timings_dir = _resolve_results_dir(
+        results_dir if timings_dir is None else timings_dir
+    )
+    stage_seconds = {}
+    records = (
+        wwatch3_cmd.timings._load_timings(timings_dir) if timings_dir.is_dir() else []
+    )
+    for record in records:
+        if record.get("exit_status", 0) != 0:
+            continue
+        seconds = record["end"] - record["start"]
+        if record["stage"] == "shel" and isinstance(record.get("n_procs"), int):
+            seconds *= record["n_procs"] / n_procs
+        stage_seconds.setdefault(record["stage"], []).append(seconds)
+    if stage_seconds:
+        day_seconds = sum(
+            sum(seconds) / len(seconds) for seconds in stage_seconds.values()
+        )
+        job_seconds = day_seconds * days_per_job
+        report.append(
+            f"estimated time per day: {_format_seconds(day_seconds)} "
+            f"from {sum(map(len, stage_seconds.values()))} timing records in "
+            f"{timings_dir}"
+        )
+        if job_seconds <= walltime_seconds * PLAN_WALLTIME_FRACTION:
+            walltime_verdict = "enough"
+        else:
+            walltime_verdict = (
+                f"NOT enough; use at least "
+                f"{_format_seconds(job_seconds / PLAN_WALLTIME_FRACTION)}"
+            )
+        report.extend(
+            (
+                f"estimated time per job: {_format_seconds(job_seconds)} of "
+                f"{walltime} walltime - {walltime_verdict}",
+                f"estimated node-hours: {nodes * day_seconds * n_days / 3600:.1f} used",
+            )
+        )
+    else:
+        report.append(
+            f"time per day can't be estimated; "
+            f"no timing records of past runs in {timings_dir}"
+        )
+    n_jobs_or_tasks = n_days if job_array else n_jobs
+    report.append(
+        f"requested node-hours: {nodes * walltime_seconds * n_jobs_or_tasks / 3600:.1f}"
+    )
+
+    grid_values = grid["nx"] * grid["ny"]
+    field_values = sum(
+        grid["n_freqs"]
+        if field in FREQUENCY_FIELDS
+        else 3
+        if field in PARTITION_FIELDS
+        else FIELD_COMPONENTS.get(field, 1)
+        for field in output["fields"].split()
+    )
+    n_field_times = 86400 // output["fields interval"]
+    fields_bytes = 4 * grid_values * field_values * n_field_times
+    report.append(
+        f"fields output per day: {n_field_times} times of "
+        f"{len(output['fields'].split())} fields, {_format_bytes(fields_bytes)} "
+        f"before compression"
+    )
+    points_bytes = 0
+    if output["points"]:
+        n_points = len(output["points"].splitlines())
+        n_point_times = 86400 // output["points interval"]
+        points_bytes = 4 * n_points * n_point_times * POINT_TABLE_PARAMETERS
+        report.append(
+            f"points output per day: {n_point_times} times at {n_points} point(s), "
+            f"{_format_bytes(points_bytes)}"
+        )
+    forcing_bytes = sum(
+        (forcing_dir / f"SoG_{forcing}_{start_date.format('YYYYMMDD')}.nc")
+        .stat()
+        .st_size
+        for forcing, forcing_dir in (
+            ("current", current_forcing_dir),
+            ("wind", wind_forcing_dir),
+        )
+        if (forcing_dir / f"SoG_{forcing}_{start_date.format('YYYYMMDD')}.nc").exists()
+    )
+    restart_bytes = 4 * grid_values * grid["n_freqs"] * grid["n_dirs"]
+    n_restarts = 24 // checkpoint_hours if checkpoint_hours else 1
+    post_bytes = 2 * (fields_bytes + points_bytes)
+    day_scratch_bytes = forcing_bytes + n_restarts * restart_bytes + post_bytes
+    if job_array:
+        scratch_bytes = n_days * day_scratch_bytes
+    else:
+        scratch_bytes = (
+            day_scratch_bytes
+            + min(pipeline_depth, days_per_job - 1) * forcing_bytes
+            + (post_bytes if async_post and days_per_job > 1 else 0)
+        )
+    scratch = "node-local scratch" if resources["node-local scratch"] else "scratch"
+    report.append(f"{scratch} high-water mark: {_format_bytes(scratch_bytes)}")
+    return "\n".join(report)
+
+
+def _walltime_seconds(walltime):
+    """Convert a batch job walltime to seconds.
+
+    :param str walltime: HPC batch job walltime; formatted as :kbd:`HH:MM:SS`.
+
+    :rtype: int
+
+    :raises: :py:exc:`SystemExit` if the walltime is not formatted as
+             :kbd:`HH:MM:SS`.
+    """
+    try:
+        hours, minutes, seconds = map(int, walltime.split(":"))
+    except ValueError:
+        logger.error(f"invalid walltime: {walltime} - please use HH:MM:SS")
+        raise SystemExit(2)
+    return hours * 3600 + minutes * 60 + seconds
+
+
+def _grid_dimensions(ww3_grid_inp):
+    """Read the grid and spectral dimensions from a :file:`ww3_grid.inp` file.
+
+    The file is read the way that :program:`ww3_grid` reads it:
+    lines that start with :kbd:`$` are comments,
+    the first line that isn't a comment is the quoted grid name,
+    the next one is the spectral grid
+    (frequency increment factor, first frequency, number of frequencies,
+    number of directions, and direction offset),
+    and the line after the :kbd:`'RECT'`, :kbd:`'CURV'`, or :kbd:`'UNST'`
+    grid type line that follows the model flags and namelists starts with the
+    numbers of grid points in the x and y directions.
+
+    :param ww3_grid_inp: Path of the :file:`ww3_grid.inp` file.
+    :type ww3_grid_inp: :py:class:`pathlib.Path`
+
+    :returns: Number of grid points in the x and y directions,
+              and number of frequencies and directions.
+    :rtype: dict
+
+    :raises: :py:exc:`SystemExit` if the dimensions can't be read from the file.
+    """
+    lines = [
+        line.strip()
+        for line in ww3_grid_inp.read_text().splitlines()
+        if line.strip() and not line.lstrip().startswith("$")
+    ]
+    try:
+        grid_name, spectral_grid, *lines = lines
+        if grid_name[0] not in "'’\"":
+            raise ValueError(f"grid name is not quoted: {grid_name}")
+        values = re.split(r"[\s,]+", spectral_grid)
+        n_freqs, n_dirs = int(values[2]), int(values[3])
+        grid_type_line = next(
+            i
+            for i, line in enumerate(lines)
+            if line.split()[0].strip("'’\"") in ("RECT", "CURV", "UNST")
+        )
+        values = re.split(r"[\s,]+", lines[grid_type_line + 1])
+        nx, ny = int(values[0]), int(values[1])
+    except (ValueError, IndexError, StopIteration) as exc:
+        logger.error(
+            f"unable to read grid dimensions from {ww3_grid_inp}: "
+            f"{str(exc) or 'grid type line not found'}"
+        )
+        raise SystemExit(2)
+    return {"nx": nx, "ny": ny, "n_freqs": n_freqs, "n_dirs": n_dirs}
+
+
+def _format_seconds(seconds):
+    """Format a number of seconds as :kbd:`HH:MM:SS`.
+
+    :param float seconds: Number of seconds.
+
+    :rtype: str
+    """
+    minutes, seconds = divmod(round(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def _format_bytes(n_bytes):
+    """Format a number of bytes in the largest binary unit that it is at least 1 of.
+
+    :param int n_bytes: Number of bytes.
+
+    :rtype: str
+    """
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if n_bytes < 1024:
+            return f"{n_bytes:.1f} {unit}"
+        n_bytes /= 1024
+    return f"{n_bytes:.1f} TiB"
+
+
+def _submit_jobs(run_script_files):
+    """Submit run scripts to the queue manager.
+
+    Each run script after the first is submitted with an :kbd:`afterok`
+    dependency on the job of the one before it.
+
+    :param run_script_files: Run script file paths, in job submission order.
+    :type run_script_files: list of :py:class:`pathlib.Path`
+
+    :returns: Messages generated by queue manager upon submission of the
+              run scripts.
+    :rtype: str
+    """
+    submit_job_msgs = []
+    for run_script_file in run_script_files:
+        dependency = (
+            f"--dependency=afterok:{_job_id(submit_job_msgs[-1])} "
+            if submit_job_msgs
+            else ""
+        )
+        sbatch_cmd = f"sbatch {dependency}{run_script_file}"
+        submit_job_msg = subprocess.run(
+            shlex.split(sbatch_cmd),
+            check=True,
+            universal_newlines=True,
+            stdout=subprocess.PIPE,
+        ).stdout
+        submit_job_msgs.append(submit_job_msg)
+    return "".join(submit_job_msgs)
+
+
+def _job_id(submit_job_msg):
+    """Get the job id from the message generated by the queue manager upon
+    submission of a run script.
+
+    :param str submit_job_msg: Job submission message;
+                               e.g. :kbd:`Submitted batch job 12345`.
+
+    :returns: Job id.
+    :rtype: str
+
+    :raises: :py:exc:`SystemExit` if there is no job id in the message.
+    """
+    job_id = submit_job_msg.split()[-1] if submit_job_msg.split() else ""
+    if not job_id.isdigit():
+        logger.error(
+            f"unable to get job id from job submission message: {submit_job_msg} - "
+            f"the rest of the job chain has not been submitted"
+        )
+        raise SystemExit(2)
+    return job_id
+
+
+class RunConfig:
+    """Values from a run description that have been validated,
+    and had their paths resolved, once for a run.
+
+    All of the run description values that preparing a run uses are looked up
+    and checked by :py:meth:`from_run_desc`.
+    All of the problems that are found are logged as errors before
+    :py:exc:`SystemExit` is raised, so that they can be fixed in one go,
+    and before anything is created on the file system.
+
+    Run configurations are immutable;
+    use :py:meth:`evolve` to get a copy with some values changed.
+    """
+
+    __slots__ = (
+        "run_desc",
+        "run_id",
+        "email",
+        "account",
+        "runs_dir",
+        "mod_def_ww3_path",
+        "current_forcing_dir",
+        "wind_forcing_dir",
+        "prnc_mode",
+        "forcing_cache_dir",
+        "restart_path",
+        "prefetch_restart",
+        "checkpoint_hours",
+        "resources",
+        "output",
+        "fields_nccopy_args",
+    )
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values[name])
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"can't set {name}: {type(self).__name__} is immutable")
+
+    def __repr__(self):
+        return f"{type(self).__name__}(run_id={self.run_id!r})"
+
+    @classmethod
+    def load(cls, desc_file):
+        """Load a run description file, and build the run configuration from it.
+
+        :param desc_file: File path/name of the YAML run description file.
+        :type desc_file: :py:class:`pathlib.Path`
+
+        :rtype: :py:class:`RunConfig`
+
+        :raises: :py:exc:`SystemExit` if there are errors in the run description.
+        """
+        import nemo_cmd.prepare
+
+        return cls.from_run_desc(nemo_cmd.prepare.load_run_desc(desc_file))
+
+    @classmethod
+    def from_run_desc(cls, run_desc):
+        """Build the run configuration from a run description dict.
+
+        :param dict run_desc: Contents of run description file parsed from YAML
+                              into a dict.
+
+        :rtype: :py:class:`RunConfig`
+
+        :raises: :py:exc:`SystemExit` if there are errors in the run description.
+        """
+        import nemo_cmd.prepare
+
+        # The other checks can only look up keys in sections that are mappings
+        _check_run_desc_sections(run_desc)
+        failed = []
+
+        def checked(parse, *args, default=None, **kwargs):
+            # The problem has been logged by the time that SystemExit is raised
+            try:
+                return parse(*args, **kwargs)
+            except SystemExit:
+                failed.append(parse)
+                return default
+
+        def get_value(keys, **kwargs):
+            return nemo_cmd.prepare.get_run_desc_value(run_desc, keys, **kwargs)
+
+        def get_optional_value(keys, default, **kwargs):
+            try:
+                return get_value(keys, fatal=False, **kwargs)
+            except KeyError:
+                return default
+
+        forcing_cache_dir = checked(_forcing_cache_dir, run_desc, default="")
+        checkpoint_hours = checked(_checkpoint_hours, run_desc, default=0)
+        output = checked(_output_settings, run_desc, checkpoint_hours)
+        config = cls(
+            run_desc=run_desc,
+            run_id=checked(get_value, ("run_id",)),
+            email=checked(get_value, ("email",)),
+            account=checked(get_value, ("account",)),
+            runs_dir=checked(get_value, ("paths", "runs directory"), resolve_path=True),
+            mod_def_ww3_path=checked(
+                get_value, ("grid", "mod_def.ww3 file"), resolve_path=True
+            ),
+            current_forcing_dir=checked(
+                get_value, ("forcing", "current"), resolve_path=True
+            ),
+            wind_forcing_dir=checked(get_value, ("forcing", "wind"), resolve_path=True),
+            prnc_mode=checked(_prnc_mode, run_desc),
+            forcing_cache_dir=forcing_cache_dir,
+            restart_path=checked(
+                get_optional_value, ("restart", "restart.ww3"), "", resolve_path=True
+            ),
+            prefetch_restart=checked(
+                _prefetch_restart_setting, run_desc, default=False
+            ),
+            checkpoint_hours=checkpoint_hours,
+            resources=checked(_batch_resources, run_desc),
+            output=output,
+            fields_nccopy_args=checked(
+                _fields_nccopy_args,
+                run_desc,
+                output["fields interval"] if output else DEFAULT_FIELDS_INTERVAL,
+            ),
+        )
+        if failed:
+            raise SystemExit(2)
+        return config
+
+    def evolve(self, **changes):
+        """Copy the run configuration with some of its values changed.
+
+        :param changes: Values to change, keyed by attribute name.
+
+        :rtype: :py:class:`RunConfig`
+        """
+        values = {name: getattr(self, name) for name in self.__slots__}
+        values.update(changes)
+        return type(self)(**values)
+
+
+def _prnc_mode(run_desc):
+    """Get the :program:`ww3_prnc` forcing pre-processing mode from the
+    run description, and check it.
 
     :param dict run_desc: Contents of run description file parsed from YAML into a dict.
 
-    :param tmp_run_dir: Temporary directory generated for the run.
-    :type tmp_run_dir: :py:class:`pathlib.Path`
+    :returns: One of the :py:data:`PRNC_MODES`.
+    :rtype: str
 
-    :param desc_file: File path/name of the YAML run description file.
-    :type desc_file: :py:class:`pathlib.Path`
+    :raises: :py:exc:`SystemExit` if the mode is not recognized.
+    """
+    import nemo_cmd.prepare
 
-    :param int n_days: Number of days of runs to execute in the batch job.
+    try:
+        prnc_mode = nemo_cmd.prepare.get_run_desc_value(
+            run_desc, ("forcing", "prnc mode"), fatal=False
+        )
+    except KeyError:
+        return "serial"
+    if prnc_mode not in PRNC_MODES:
+        logger.error(
+            f"unrecognized forcing: prnc mode: {prnc_mode} - "
+            f"please use one of {', '.join(PRNC_MODES)}"
+        )
+        raise SystemExit(2)
+    return prnc_mode
+
+
+def _forcing_cache_dir(run_desc):
+    """Get the directory that pre-processed forcing files are cached in from the
+    run description, and check it.
+
+    The directory is not created until everything else about the run has been
+    checked.
+
+    :param dict run_desc: Contents of run description file parsed from YAML into a dict.
+
+    :returns: Resolved forcing cache directory path,
+              or empty string for runs that don't use a forcing cache.
+    :rtype: :py:class:`pathlib.Path` or str
+
+    :raises: :py:exc:`SystemExit` if the path is not a string.
     """
-    if n_days == 1:
-        shutil.copy2(desc_file, tmp_run_dir)
-        return
-    with (tmp_run_dir / desc_file.name).open("wt") as f:
-        yaml.safe_dump(run_desc, f, default_flow_style=False)
+    import nemo_cmd.prepare
 
+    try:
+        forcing_cache = nemo_cmd.prepare.get_run_desc_value(
+            run_desc, ("forcing", "forcing cache"), fatal=False
+        )
+    except KeyError:
+        return ""
+    if not isinstance(forcing_cache, str):
+        logger.error(
+            f"invalid forcing: forcing cache: {forcing_cache} - "
+            f"please use a directory path"
+        )
+        raise SystemExit(2)
+    if not forcing_cache:
+        return ""
+    return nemo_cmd.prepare.get_run_desc_value(
+        run_desc, ("forcing", "forcing cache"), expand_path=True
+    ).resolve()
 
-def _resolve_results_dir(results_dir):
-    """Expand environment variables and :file:`~` in :kbd:`results_dir`
-    and resolve it to an absolute path.
 
-    :param results_dir: Path of the directory in which to store the run results;
-                        it will be created if it does not exist.
-    :type results_dir: :py:class:`pathlib.Path`
+class _TmpRunDirTemplate:
+    """Compiled templates for the files in a temporary run directory.
 
-    :return: :py:class:`pathlib.Path`
+    The :file:`cookiecutter.json` defaults are read and the templates in the
+    :file:`{{cookiecutter.tmp_run_dir}}/` directory are loaded and compiled once,
+    when the object is created.
+    Each call of :py:meth:`render` then stamps out a temporary run directory
+    from an in-memory context.
+    The files produced are identical to those produced by
+    :py:func:`cookiecutter.main.cookiecutter` for the same context,
+    without re-reading the template for each day of a multi-day run.
+    The symlinks in the temporary run directory are created by
+    :py:func:`_link_tmp_run_dir`.
+
+    :param template_dir: Path of the cookiecutter template directory.
+    :type template_dir: :py:class:`pathlib.Path`
     """
-    results_dir = Path(os.path.expandvars(results_dir)).expanduser().resolve()
-    return results_dir
 
+    RUN_DIR_TEMPLATE = "{{cookiecutter.tmp_run_dir}}"
 
-def _sbatch_directives(run_desc, results_dir, walltime):
-    run_id = nemo_cmd.prepare.get_run_desc_value(run_desc, ("run_id",))
-    sbatch_directives = textwrap.dedent(
-        f"""\
-        #SBATCH --job-name={run_id}
-        #SBATCH --mail-user={nemo_cmd.prepare.get_run_desc_value(run_desc, ("email",))}
-        #SBATCH --mail-type=ALL
-        #SBATCH --account={nemo_cmd.prepare.get_run_desc_value(run_desc, ("account",))}
-        #SBATCH --constraint=skylake
-        #SBATCH --nodes=1
-        #SBATCH --ntasks-per-node=20
-        #SBATCH --mem=0
-        #SBATCH --time={walltime}
-        # stdout and stderr file paths/names
-        #SBATCH --output={results_dir/"stdout"}
-        #SBATCH --error={results_dir/"stderr"}
+    def __init__(self, template_dir):
+        import jinja2
+
+        with (template_dir / "cookiecutter.json").open("rt") as f:
+            self.default_context = json.load(f)
+        self.env = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(os.fspath(template_dir)),
+            keep_trailing_newline=True,
+            undefined=jinja2.StrictUndefined,
+        )
+        # cookiecutter renders context values without keeping trailing newlines
+        self.context_env = jinja2.Environment(undefined=jinja2.StrictUndefined)
+        self.templates = []
+        for template_path in sorted((template_dir / self.RUN_DIR_TEMPLATE).iterdir()):
+            # Like cookiecutter, write rendered files with the newlines of the template
+            with template_path.open("rt", newline="") as f:
+                f.readline()
+                newline = f.newlines
+            self.templates.append(
+                (
+                    template_path.name,
+                    self.env.get_template(
+                        f"{self.RUN_DIR_TEMPLATE}/{template_path.name}"
+                    ),
+                    newline,
+                    template_path.stat().st_mode,
+                )
+            )
+
+    def context(self, extra_context):
+        """Build the template rendering context the same way that cookiecutter does;
+        i.e. :file:`cookiecutter.json` values overridden by :kbd:`extra_context` values,
+        converted to strings, and rendered in order.
+        Values that contain no Jinja markup are not compiled;
+        they only have their trailing newline removed, as rendering would do.
+
+        :param dict extra_context: Values to override the :file:`cookiecutter.json`
+                                   defaults with.
+
+        :rtype: dict
+        """
+        context = {}
+        for key, default in self.default_context.items():
+            raw = str(extra_context.get(key, default))
+            if "{" in raw:
+                value = self.context_env.from_string(raw).render(cookiecutter=context)
+            else:
+                value = raw[:-1] if raw.endswith("\n") else raw
+            context[key] = value
+        return context
+
+    def render(self, extra_context):
+        """Create a temporary run directory, and render the template files into it.
+
+        :param dict extra_context: Values to override the :file:`cookiecutter.json`
+                                   defaults with.
+
+        :return: Path of the temporary run directory.
+        :rtype: :py:class:`pathlib.Path`
+        """
+        context = self.context(extra_context)
+        tmp_run_dir = Path(context["tmp_run_dir"])
+        tmp_run_dir.mkdir()
+        for name, template, newline, mode in self.templates:
+            rendered = template.render(cookiecutter=context)
+            with (tmp_run_dir / name).open("wt", newline=newline) as f:
+                f.write(rendered)
+            os.chmod(tmp_run_dir / name, mode)
+        return tmp_run_dir
+
+
+def _symlink_targets(
+    mod_def_ww3_path, current_forcing_dir, wind_forcing_dir, restart_path
+):
+    """Collect the targets of the symlinks in a temporary run directory,
+    keyed by symlink name.
+
+    The paths are expected to have had their environment variables and user
+    directories expanded by :py:func:`nemo_cmd.prepare.get_run_desc_value`,
+    so that is done once for a run instead of for each day.
+
+    :param mod_def_ww3_path: Path of the :file:`mod_def.ww3` grid file.
+    :type mod_def_ww3_path: :py:class:`pathlib.Path`
+
+    :param current_forcing_dir: Path of the current forcing files directory.
+    :type current_forcing_dir: :py:class:`pathlib.Path`
+
+    :param wind_forcing_dir: Path of the wind forcing files directory.
+    :type wind_forcing_dir: :py:class:`pathlib.Path`
+
+    :param restart_path: Path of the restart file that the day starts from,
+                         or empty string for a cold start.
+    :type restart_path: :py:class:`pathlib.Path` or str
+
+    :rtype: dict
+    """
+    targets = {
+        "mod_def.ww3": mod_def_ww3_path,
+        "wind": wind_forcing_dir,
+        "current": current_forcing_dir,
+    }
+    if restart_path:
+        targets["restart.ww3"] = restart_path
+    return targets
+
+
+def _check_symlink_targets(targets):
+    """Confirm that the targets of the symlinks in a temporary run directory exist.
+
+    Only the first day of a run can be checked when it is prepared;
+    the restart files that later days start from are checked by
+    :py:func:`_check_restart_chain`.
+    All of the missing targets are logged as errors before :py:exc:`SystemExit`
+    is raised, so that they can be fixed in one go.
+
+    :param dict targets: Symlink target paths, keyed by symlink name.
+
+    :raises: :py:exc:`SystemExit` if any of the targets don't exist.
+    """
+    errors = [
+        f"{name} symlink target not found: {target}"
+        for name, target in targets.items()
+        if not Path(target).exists()
+    ]
+    if errors:
+        for error in errors:
+            logger.error(error)
+        raise SystemExit(2)
+
+
+def _restart_chain(restart_path, days, multi_day):
+    """Work out the restart file that each day of a run starts from.
+
+    Each day of a multi-day run starts from the restart file in the directory
+    for the day before it next to the directory of :kbd:`restart_path`.
+
+    :param restart_path: Path of the restart file from the run description,
+                         or empty string for a cold start.
+    :type restart_path: :py:class:`pathlib.Path` or str
+
+    :param days: Days of the run.
+    :type days: list of :py:class:`arrow.Arrow`
+
+    :param boolean multi_day: The run is more than 1 day long.
+
+    :returns: Restart file paths, or empty strings for cold starts, in day order.
+    :rtype: list
+    """
+    if not restart_path:
+        return ["" for day in days]
+    if not multi_day:
+        return [restart_path]
+    return [
+        restart_path.parent.parent
+        / day.shift(days=-1).format("DDMMMYY").lower()
+        / restart_path.name
+        for day in days
+    ]
+
+
+def _check_restart_chain(days, restart_paths, results_dirs):
+    """Confirm that the restart file that each day of a run starts from will be
+    there when the day runs.
+
+    The restart file for the first day must exist.
+    The restart file for each later day must either be the one that the day before
+    it gathers into its results directory, or exist already.
+    All of the broken links in the chain are logged as errors before
+    :py:exc:`SystemExit` is raised, so that they can be fixed in one go.
+
+    :param days: Days of the run.
+    :type days: list of :py:class:`arrow.Arrow`
+
+    :param list restart_paths: Restart file paths, or empty strings for cold starts,
+                               in day order.
+
+    :param results_dirs: Results directories of the days of the run.
+    :type results_dirs: list of :py:class:`pathlib.Path`
+
+    :raises: :py:exc:`SystemExit` if any of the restart files won't be there.
+    """
+    errors = []
+    for i, (day, restart_path) in enumerate(zip(days, restart_paths)):
+        if not restart_path or Path(restart_path).exists():
+            continue
+        if i == 0:
+            errors.append(
+                f"restart file for {day.format('YYYY-MM-DD')} not found: {restart_path}"
+            )
+            continue
+        gathered_restart = results_dirs[i - 1] / Path(restart_path).name
+        if Path(restart_path) != gathered_restart:
+            errors.append(
+                f"restart file for {day.format('YYYY-MM-DD')} not found, and won't be "
+                f"written by this run: {restart_path} - "
+                f"{days[i - 1].format('YYYY-MM-DD')} gathers its restart file into "
+                f"{gathered_restart}"
+            )
+    if errors:
+        for error in errors:
+            logger.error(error)
+        raise SystemExit(2)
+
+
+def _prefetch_restart(restart_path, tmp_run_dir, streams=RESTART_PREFETCH_STREAMS):
+    """Copy the restart file that a run starts from into its temporary run directory
+    as :file:`restart.ww3`, so that :program:`ww3_shel` doesn't have to wait
+    for it to be read from slow storage.
+
+    Blocks of the file are copied by several streams at the same time.
+    The copy is given its final name only when it is complete.
+
+    :param restart_path: Path of the restart file.
+    :type restart_path: :py:class:`pathlib.Path`
+
+    :param tmp_run_dir: Temporary run directory.
+    :type tmp_run_dir: :py:class:`pathlib.Path`
+
+    :param int streams: Number of blocks to copy at the same time.
+
+    :raises: :py:exc:`SystemExit` if the restart file can't be copied.
+    """
+    tmp_dest = tmp_run_dir / ".restart.ww3.prefetch"
+
+    def copy_block(offset):
+        end = min(offset + RESTART_PREFETCH_CHUNK_BYTES, size)
+        while offset < end:
+            block = os.pread(src, end - offset, offset)
+            if not block:
+                raise OSError("file got shorter while it was being copied")
+            offset += os.pwrite(dest, block, offset)
+
+    try:
+        size = restart_path.stat().st_size
+        src = os.open(restart_path, os.O_RDONLY)
+        try:
+            dest = os.open(tmp_dest, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                with ThreadPoolExecutor(max_workers=streams) as pool:
+                    list(
+                        pool.map(
+                            copy_block, range(0, size, RESTART_PREFETCH_CHUNK_BYTES)
+                        )
+                    )
+            finally:
+                os.close(dest)
+        finally:
+            os.close(src)
+        os.replace(tmp_dest, tmp_run_dir / "restart.ww3")
+    except OSError as exc:
+        if tmp_dest.exists():
+            tmp_dest.unlink()
+        logger.error(f"unable to prefetch restart file {restart_path}: {exc}")
+        raise SystemExit(2)
+    logger.debug(f"prefetched {restart_path} into {tmp_run_dir}")
+
+
+def _link_tmp_run_dir(tmp_run_dir, targets):
+    """Create the symlinks in a temporary run directory.
+
+    :param tmp_run_dir: Temporary run directory.
+    :type tmp_run_dir: :py:class:`pathlib.Path`
+
+    :param dict targets: Symlink target paths, keyed by symlink name.
+    """
+    for name, target in targets.items():
+        (tmp_run_dir / name).symlink_to(target)
+
+
+class _TmpRunDirRunDesc:
+    """Run description YAML for the temporary run directories of a run.
+
+    Only the :kbd:`run_id` and :kbd:`restart` values differ between the days of a
+    multi-day run,
+    so each of the other top level keys of the run description is serialised to
+    YAML once,
+    when the object is created.
+    Each day's YAML is those cached blocks and the blocks of the day's values,
+    in the sorted key order that :py:func:`yaml.safe_dump` writes.
+    The run description dict is neither copied nor changed.
+
+    :param dict run_desc: Contents of run description file parsed from YAML into a dict.
+
+    :param desc_file: File path/name of the YAML run description file.
+    :type desc_file: :py:class:`pathlib.Path`
+
+    :param int n_days: Number of days of runs to execute in the batch job.
+    """
+
+    # Keys that are patched for each day
+    DAY_KEYS = ("restart", "run_id")
+
+    def __init__(self, run_desc, desc_file, n_days):
+        import yaml
+
+        self.desc_file = desc_file
+        self.copy_desc_file = n_days == 1
+        self.restart = run_desc.get("restart", {})
+        self.base_blocks = (
+            {}
+            if self.copy_desc_file
+            else {
+                key: yaml.safe_dump({key: value}, default_flow_style=False)
+                for key, value in run_desc.items()
+                if key not in self.DAY_KEYS
+            }
+        )
+
+    def day_yaml(self, run_id, restart_path):
+        """Build the run description YAML for a day of the run.
+
+        :param str run_id: Job identifier of the day's run.
+
+        :param restart_path: Path of the restart file that the day starts from,
+                             or empty string for a cold start.
+        :type restart_path: :py:class:`pathlib.Path` or str
+
+        :rtype: str
+        """
+        import yaml
+
+        patch = {
+            "restart": {**self.restart, "restart.ww3": os.fspath(restart_path)},
+            "run_id": run_id,
+        }
+        blocks = {
+            **self.base_blocks,
+            **{
+                key: yaml.safe_dump({key: value}, default_flow_style=False)
+                for key, value in patch.items()
+            },
+        }
+        return "".join(blocks[key] for key in sorted(blocks))
+
+
+def _write_tmp_run_dir_run_desc(
+    tmp_run_dir_run_desc, tmp_run_dir, run_id, restart_path
+):
+    """Write the run description to a YAML file in the temporary run directory
+    so that it is preserved with the run results.
+
+    Extracted into a separate function to improve testability of the run() function.
+
+    :param tmp_run_dir_run_desc: Run description YAML for the run's temporary
+                                 run directories.
+    :type tmp_run_dir_run_desc: :py:class:`_TmpRunDirRunDesc`
+
+    :param tmp_run_dir: Temporary directory generated for the run.
+    :type tmp_run_dir: :py:class:`pathlib.Path`
+
+    :param str run_id: Job identifier of the day's run.
+
+    :param restart_path: Path of the restart file that the day starts from,
+                         or empty string for a cold start.
+    :type restart_path: :py:class:`pathlib.Path` or str
+    """
+    desc_file = tmp_run_dir_run_desc.desc_file
+    if tmp_run_dir_run_desc.copy_desc_file:
+        shutil.copy2(desc_file, tmp_run_dir)
+        return
+    (tmp_run_dir / desc_file.name).write_text(
+        tmp_run_dir_run_desc.day_yaml(run_id, restart_path)
+    )
+
+
+def _resolve_results_dir(results_dir):
+    """Expand environment variables and :file:`~` in :kbd:`results_dir`
+    and resolve it to an absolute path.
+
+    :param results_dir: Path of the directory in which to store the run results;
+                        it will be created if it does not exist.
+    :type results_dir: :py:class:`pathlib.Path`
+
+    :return: :py:class:`pathlib.Path`
+    """
+    results_dir = Path(os.path.expandvars(results_dir)).expanduser().resolve()
+    return results_dir
+
+
+def _batch_resources(run_desc):
+    """Get the batch job node and MPI task layout from the run description,
+    and check it.
+
+    The values in the optional :kbd:`resources` section of the run description
+    override the :py:data:`DEFAULT_BATCH_RESOURCES`.
+    The number of MPI processes for :program:`ww3_shel` is calculated from
+    the number of nodes and tasks per node so that they always agree.
+    All of the problems found are logged as errors before
+    :py:exc:`SystemExit` is raised, so that they can be fixed in one go.
+
+    :param dict run_desc: Contents of run description file parsed from YAML into a dict.
+
+    :returns: Number of nodes, MPI tasks per node, node constraint,
+              memory per node, whether to run in node-local scratch,
+              and number of MPI processes.
+    :rtype: dict
+
+    :raises: :py:exc:`SystemExit` if there are errors in the values.
+    """
+    import nemo_cmd.prepare
+
+    resources = {}
+    for key, default in DEFAULT_BATCH_RESOURCES.items():
+        try:
+            resources[key] = nemo_cmd.prepare.get_run_desc_value(
+                run_desc, ("resources", key), fatal=False
+            )
+        except KeyError:
+            resources[key] = default
+    errors = []
+    for key in ("nodes", "tasks per node"):
+        value = resources[key]
+        if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+            errors.append(
+                f"resources: {key}: {value} - please use an integer greater than 0"
+            )
+    if not isinstance(resources["node-local scratch"], bool):
+        errors.append(
+            f"resources: node-local scratch: {resources['node-local scratch']} - "
+            f"please use true or false"
+        )
+    elif resources["node-local scratch"] and resources["nodes"] != 1:
+        errors.append(
+            f"resources: nodes: {resources['nodes']} - "
+            f"node-local scratch can only be used by runs on 1 node because "
+            f"all of the ww3_shel processes read the staged input files"
+        )
+    if not MEMORY_RE.match(str(resources["memory"])):
+        errors.append(
+            f"resources: memory: {resources['memory']} - "
+            f"please use a Slurm memory size like 0, 187G, or 192000M"
+        )
+    constraint = resources["constraint"]
+    if not errors:
+        try:
+            cores_per_node = CORES_PER_NODE[constraint]
+            if resources["tasks per node"] > cores_per_node:
+                errors.append(
+                    f"resources: tasks per node: {resources['tasks per node']} - "
+                    f"{constraint} nodes have at most {cores_per_node} cores"
+                )
+        except KeyError:
+            logger.warning(
+                f"unknown resources: constraint: {constraint} - "
+                f"tasks per node can't be checked against cores per node"
+            )
+        resources["n_procs"] = resources["nodes"] * resources["tasks per node"]
+        if resources["n_procs"] < 2:
+            errors.append(
+                f"resources: nodes * tasks per node: {resources['n_procs']} - "
+                f"ww3_shel needs at least 2 MPI processes because it uses "
+                f"a dedicated output process"
+            )
+    if errors:
+        for error in errors:
+            logger.error(error)
+        raise SystemExit(2)
+    return resources
+
+
+def _output_settings(run_desc, checkpoint_hours):
+    """Get the fields and point output settings for :program:`ww3_shel`,
+    :program:`ww3_ounf`, and :program:`ww3_ounp` from the optional
+    :kbd:`output` section of the run description, and check them.
+
+    The field names are checked against the :py:data:`WW3_FIELD_NAMES`.
+    The output intervals must divide evenly into a day,
+    and into the checkpoint interval,
+    so that days that are restarted from checkpoints have the same output times.
+    All of the problems found are logged as errors before
+    :py:exc:`SystemExit` is raised, so that they can be fixed in one go.
+
+    :param dict run_desc: Contents of run description file parsed from YAML into a dict.
+
+    :param int checkpoint_hours: Interval between mid-day checkpoint restart files;
+                                 0 means only the end of day restart file is written.
+
+    :returns: Space separated output field names,
+              fields output interval in seconds,
+              point output interval in seconds,
+              and point output locations formatted for :file:`ww3_shel.inp`;
+              the locations are empty if point output is off.
+    :rtype: dict
+
+    :raises: :py:exc:`SystemExit` if there are errors in the values.
+    """
+    import nemo_cmd.prepare
+
+    def get_value(keys, default):
+        try:
+            return nemo_cmd.prepare.get_run_desc_value(
+                run_desc, ("output",) + keys, fatal=False
+            )
+        except KeyError:
+            return default
+
+    errors = []
+
+    def check_interval(keys, interval):
+        name = f"output: {': '.join(keys)}"
+        if isinstance(interval, bool) or not isinstance(interval, int) or interval < 1:
+            errors.append(f"{name}: {interval} - please use a number of seconds")
+        elif 86400 % interval:
+            errors.append(
+                f"{name}: {interval} - please use a number of seconds that divides "
+                f"into 1 day; e.g. 1800 or 3600"
+            )
+        elif checkpoint_hours and checkpoint_hours * 3600 % interval:
+            errors.append(
+                f"{name}: {interval} - please use a number of seconds that divides "
+                f"into restart: checkpoint interval: {checkpoint_hours} hours"
+            )
+
+    fields = get_value(("fields", "names"), DEFAULT_OUTPUT_FIELDS)
+    if not isinstance(fields, list) or not fields:
+        errors.append(
+            f"output: fields: names: {fields} - please use a list of field names"
+        )
+    else:
+        unknown_fields = [
+            str(field) for field in fields if field not in WW3_FIELD_NAMES
+        ]
+        if unknown_fields:
+            errors.append(
+                f"unknown output: fields: names: {', '.join(unknown_fields)} - "
+                f"please use WaveWatch III® output field names; e.g. HS DIR T02"
+            )
+    fields_interval = get_value(("fields", "interval"), DEFAULT_FIELDS_INTERVAL)
+    check_interval(("fields", "interval"), fields_interval)
+    points = ""
+    points_interval = get_value(("points", "interval"), DEFAULT_POINTS_INTERVAL)
+    if get_value(("points",), None) is not None:
+        check_interval(("points", "interval"), points_interval)
+        locations = get_value(("points", "locations"), {})
+        if not isinstance(locations, dict) or not locations:
+            errors.append(
+                "output: points: locations - please give at least one point "
+                "as name: [longitude, latitude]"
+            )
+            locations = {}
+        lines = []
+        for name, location in locations.items():
+            if (
+                not isinstance(location, list)
+                or len(location) != 2
+                or any(
+                    isinstance(coord, bool) or not isinstance(coord, (int, float))
+                    for coord in location
+                )
+                or not -180 <= location[0] <= 360
+                or not -90 <= location[1] <= 90
+            ):
+                errors.append(
+                    f"output: points: locations: {name}: {location} - "
+                    f"please use [longitude, latitude] in decimal degrees"
+                )
+            elif "'" in str(name):
+                errors.append(
+                    f"output: points: locations: {name} - "
+                    f"please use a point name without ' characters"
+                )
+            else:
+                lines.append(f"  {location[0]} {location[1]}  '{name}'")
+        points = "\n".join(lines)
+    if errors:
+        for error in errors:
+            logger.error(error)
+        raise SystemExit(2)
+    return {
+        "fields": " ".join(fields),
+        "fields interval": fields_interval,
+        "points interval": points_interval,
+        "points": points,
+    }
+
+
+def _fields_nccopy_args(run_desc, fields_interval):
+    """Get the :program:`nccopy` arguments to compress, and optionally rechunk,
+    the fields netCDF file after :program:`ww3_ounf` from the optional
+    :kbd:`output: compression` section of the run description, and check them.
+
+    The values in the section override the :py:data:`DEFAULT_FIELDS_COMPRESSION`.
+    The time series chunks hold all of the fields output times of a day,
+    so their length is calculated from the fields output interval.
+    All of the problems found are logged as errors before
+    :py:exc:`SystemExit` is raised, so that they can be fixed in one go.
+
+    :param dict run_desc: Contents of run description file parsed from YAML into a dict.
+
+    :param int fields_interval: Seconds between fields outputs.
+
+    :returns: :program:`nccopy` arguments;
+              empty if the fields netCDF files are not to be compressed.
+    :rtype: str
+
+    :raises: :py:exc:`SystemExit` if there are errors in the values.
+    """
+    import nemo_cmd.prepare
+
+    try:
+        nemo_cmd.prepare.get_run_desc_value(
+            run_desc, ("output", "compression"), fatal=False
+        )
+    except KeyError:
+        return ""
+    compression = {}
+    for key, default in DEFAULT_FIELDS_COMPRESSION.items():
+        try:
+            compression[key] = nemo_cmd.prepare.get_run_desc_value(
+                run_desc, ("output", "compression", key), fatal=False
+            )
+        except KeyError:
+            compression[key] = default
+    errors = []
+    deflate_level = compression["deflate level"]
+    if (
+        isinstance(deflate_level, bool)
+        or not isinstance(deflate_level, int)
+        or not 0 <= deflate_level <= 9
+    ):
+        errors.append(
+            f"output: compression: deflate level: {deflate_level} - "
+            f"please use an integer from 0 to 9"
+        )
+    if not isinstance(compression["shuffle"], bool):
+        errors.append(
+            f"output: compression: shuffle: {compression['shuffle']} - "
+            f"please use true or false"
+        )
+    chunking = compression["chunking"]
+    if chunking is not None and chunking not in FIELDS_CHUNKINGS:
+        errors.append(
+            f"unrecognized output: compression: chunking: {chunking} - "
+            f"please use one of {', '.join(FIELDS_CHUNKINGS)}"
+        )
+    if errors:
+        for error in errors:
+            logger.error(error)
+        raise SystemExit(2)
+    nccopy_args = ["-d", str(deflate_level)]
+    if compression["shuffle"]:
+        nccopy_args.append("-s")
+    if chunking is not None:
+        chunk_spec = FIELDS_CHUNKINGS[chunking].format(n_times=86400 // fields_interval)
+        nccopy_args.extend(("-c", chunk_spec))
+    return " ".join(nccopy_args)
+
+
+def _check_node_local_scratch(resources, pipeline_depth):
+    """Confirm that a run can be executed in node-local scratch.
+
+    The inputs for each day are staged into node-local scratch at the start of
+    the day, so the forcing pre-processing can't be pipelined ahead of
+    :program:`ww3_shel` because the days after the one that is running don't
+    have their restart files yet.
+
+    :param dict resources: Batch job resources from :py:func:`_batch_resources`.
+
+    :param int pipeline_depth: Number of days ahead of the :program:`ww3_shel` run
+                               for which to do the :program:`ww3_prnc` forcing
+                               pre-processing in the background.
+
+    :raises: :py:exc:`SystemExit` if the run can't be executed in node-local scratch.
+    """
+    if resources["node-local scratch"] and pipeline_depth:
+        logger.error(
+            "--pipeline-depth can't be used with resources: node-local scratch: true"
+        )
+        raise SystemExit(2)
+
+
+def _check_job_array(config, pipeline_depth, async_post, max_days_per_job):
+    """Confirm that a run can be submitted as a Slurm array job with one task
+    for each day.
+
+    The days of a run can only run in parallel if none of them start from a
+    restart file.
+    Pipelining, background post-processing, and job chains only apply to the
+    days of a run that execute one after another in a batch job.
+
+    :param config: Run configuration.
+    :type config: :py:class:`RunConfig`
+
+    :param int pipeline_depth: Number of days ahead of the :program:`ww3_shel` run
+                               for which to do the :program:`ww3_prnc` forcing
+                               pre-processing in the background.
+
+    :param boolean async_post: Run the post-processing for each day in the background.
+
+    :param int max_days_per_job: Maximum number of days of runs to execute in
+                                 each batch job.
+
+    :raises: :py:exc:`SystemExit` if the run can't be submitted as an array job.
+    """
+    errors = []
+    if config.restart_path:
+        errors.append(
+            f"job array runs can't start from a restart file: {config.restart_path} - "
+            f"please remove restart: restart.ww3 from the run description"
+        )
+    if config.checkpoint_hours:
+        errors.append(
+            "job array runs can't save mid-day checkpoints - "
+            "please remove restart: checkpoint interval from the run description"
+        )
+    for option, value in (
+        ("--pipeline-depth", pipeline_depth),
+        ("--async-post", async_post),
+        ("--max-days-per-job", max_days_per_job),
+    ):
+        if value:
+            errors.append(f"{option} can't be used with --job-array")
+    if errors:
+        for error in errors:
+            logger.error(error)
+        raise SystemExit(2)
+
+
+def _complete_days(config, days, results_dirs):
+    """Count the days at the start of a run whose results are already complete.
+
+    A day is complete when its :file:`SoG_ww3_fields_YYYYMMDD_YYYYMMDD.nc` file,
+    and, for runs that use a restart file, its restart file,
+    have been gathered into its results directory.
+    A day that was restarted from a checkpoint at hour :kbd:`HH` has a
+    :file:`SoG_ww3_fields_YYYYMMDD_YYYYMMDD_HH.nc` file instead;
+    it is counted as complete so that the run carries on from its restart file,
+    but a warning that its fields are partial is logged.
+
+    :param config: Run configuration.
+    :type config: :py:class:`RunConfig`
+
+    :param days: Days of the run.
+    :type days: list of :py:class:`arrow.Arrow`
+
+    :param results_dirs: Results directories of the days of the run.
+    :type results_dirs: list of :py:class:`pathlib.Path`
+
+    :returns: Number of complete days before the first incomplete day.
+    :rtype: int
+    """
+    restart_path = config.restart_path
+    n_complete = 0
+    for day, day_results_dir in zip(days, results_dirs):
+        yyyymmdd = day.format("YYYYMMDD")
+        if restart_path and not (day_results_dir / Path(restart_path).name).exists():
+            break
+        if not (day_results_dir / f"SoG_ww3_fields_{yyyymmdd}_{yyyymmdd}.nc").exists():
+            partial_fields = sorted(
+                day_results_dir.glob(
+                    f"SoG_ww3_fields_{yyyymmdd}_{yyyymmdd}_[0-9][0-9].nc"
+                )
+            )
+            if not partial_fields:
+                break
+            logger.warning(
+                f"{day.format('YYYY-MM-DD')} was restarted from a checkpoint; "
+                f"its fields in {partial_fields[0]} are partial"
+            )
+        n_complete += 1
+    return n_complete
+
+
+def _resume_restart_path(config, last_complete_results_dir):
+    """Get the restart file that a resumed run starts from;
+    i.e. the one in the results directory of the last complete day.
+
+    :param config: Run configuration.
+    :type config: :py:class:`RunConfig`
+
+    :param last_complete_results_dir: Results directory of the last complete day.
+    :type last_complete_results_dir: :py:class:`pathlib.Path`
+
+    :returns: Restart file path,
+              or empty string for runs that don't use a restart file.
+    :rtype: :py:class:`pathlib.Path` or str
+    """
+    if not config.restart_path:
+        return ""
+    return last_complete_results_dir / config.restart_path.name
+
+
+def _check_run_desc_sections(run_desc):
+    """Confirm that the sections of the run description that have keys in them
+    are mappings.
+
+    All of the problems found are logged as errors before
+    :py:exc:`SystemExit` is raised, so that they can be fixed in one go.
+
+    :param dict run_desc: Run description dictionary.
+
+    :raises: :py:exc:`SystemExit` if any of the sections are not mappings.
+    """
+    errors = [
+        f"invalid {section}: {run_desc[section]} - "
+        f"please use a section of key: value lines"
+        for section in RUN_DESC_SECTIONS
+        if section in run_desc and not isinstance(run_desc[section], dict)
+    ]
+    if errors:
+        for error in errors:
+            logger.error(error)
+        raise SystemExit(2)
+
+
+def _checkpoint_hours(run_desc):
+    """Get the interval between the mid-day checkpoint restart files that
+    :program:`ww3_shel` writes from the run description.
+
+    :param dict run_desc: Run description dictionary.
+
+    :returns: Checkpoint interval in hours;
+              0 means only the end of day restart file is written.
+    :rtype: int
+
+    :raises: :py:exc:`SystemExit` if the interval is not a whole number of hours
+             less than 24 that divides into 24.
+    """
+    import nemo_cmd.prepare
+
+    try:
+        checkpoint_hours = nemo_cmd.prepare.get_run_desc_value(
+            run_desc, ("restart", "checkpoint interval"), fatal=False
+        )
+    except KeyError:
+        return 0
+    if (
+        isinstance(checkpoint_hours, bool)
+        or not isinstance(checkpoint_hours, int)
+        or not 0 < checkpoint_hours < 24
+        or 24 % checkpoint_hours
+    ):
+        logger.error(
+            f"invalid restart: checkpoint interval: {checkpoint_hours} - "
+            f"please use a number of hours that divides into 24; e.g. 6"
+        )
+        raise SystemExit(2)
+    return checkpoint_hours
+
+
+def _prefetch_restart_setting(run_desc):
+    """Get whether to prefetch the restart file that a run starts from into
+    its temporary run directory from the run description.
+
+    :param dict run_desc: Run description dictionary.
+
+    :rtype: boolean
+
+    :raises: :py:exc:`SystemExit` if the setting is not true or false,
+             or there is no restart file to prefetch.
+    """
+    import nemo_cmd.prepare
+
+    try:
+        prefetch = nemo_cmd.prepare.get_run_desc_value(
+            run_desc, ("restart", "prefetch"), fatal=False
+        )
+    except KeyError:
+        return False
+    if not isinstance(prefetch, bool):
+        logger.error(
+            f"invalid restart: prefetch: {prefetch} - please use true or false"
+        )
+        raise SystemExit(2)
+    try:
+        restart_path = nemo_cmd.prepare.get_run_desc_value(
+            run_desc, ("restart", "restart.ww3"), fatal=False
+        )
+    except KeyError:
+        restart_path = None
+    if prefetch and not restart_path:
+        logger.error(
+            "restart: prefetch: true can't be used without restart: restart.ww3 - "
+            "there is no restart file to prefetch"
+        )
+        raise SystemExit(2)
+    return prefetch
+
+
+def _resume_checkpoint(day, day_results_dir):
+    """Get the mid-day checkpoint restart file that the run script saved
+    in a day's results directory when its job was stopped part way through
+    the day.
+
+    :param day: Day of the run.
+    :type day: :py:class:`arrow.Arrow`
+
+    :param day_results_dir: Results directory of the day.
+    :type day_results_dir: :py:class:`pathlib.Path`
+
+    :returns: Checkpoint restart file path, and hour of the day that it is for;
+              :py:obj:`None` if there is no usable checkpoint for the day.
+    :rtype: 2-tuple or :py:obj:`None`
+    """
+    checkpoint_file = day_results_dir / CHECKPOINT_FILE
+    try:
+        with checkpoint_file.open("rt") as f:
+            checkpoint = json.load(f)
+        restart_path = day_results_dir / checkpoint["restart"]
+        hour = int(checkpoint["hour"])
+        valid = (
+            checkpoint["day"] == day.format("YYYYMMDD")
+            and 0 < hour < 24
+            and restart_path.exists()
+        )
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, TypeError, KeyError):
+        valid = False
+    if not valid:
+        logger.warning(
+            f"ignored invalid checkpoint record {checkpoint_file}; "
+            f"{day.format('YYYY-MM-DD')} will be run from its start"
+        )
+        return None
+    logger.info(
+        f"resuming {day.format('YYYY-MM-DD')} from its {hour:02d}:00 checkpoint "
+        f"{restart_path}"
+    )
+    return restart_path, hour
+
+
+def _check_forcing_files(days, current_forcing_dir, wind_forcing_dir):
+    """Confirm that the current and wind forcing files for all of the days of a run
+    are available so that the run doesn't fail in the batch job.
+
+    The forcing files that are available are looked up in the index of each forcing
+    directory from :py:func:`_forcing_file_names`.
+
+    :param days: Days of the run.
+    :type days: list of :py:class:`arrow.Arrow`
+
+    :param current_forcing_dir: Path of the current forcing files directory.
+    :type current_forcing_dir: :py:class:`pathlib.Path`
+
+    :param wind_forcing_dir: Path of the wind forcing files directory.
+    :type wind_forcing_dir: :py:class:`pathlib.Path`
+
+    :raises: :py:exc:`SystemExit` if forcing files are missing.
+    """
+    errors = []
+    for forcing, forcing_dir in (
+        ("current", current_forcing_dir),
+        ("wind", wind_forcing_dir),
+    ):
+        try:
+            available = _forcing_file_names(forcing_dir)
+        except OSError as exc:
+            errors.append(f"unable to read {forcing} forcing directory: {exc}")
+            continue
+        missing = [
+            f"SoG_{forcing}_{day.format('YYYYMMDD')}.nc"
+            for day in days
+            if f"SoG_{forcing}_{day.format('YYYYMMDD')}.nc" not in available
+        ]
+        if missing:
+            errors.append(
+                f"{len(missing)} {forcing} forcing file(s) missing from "
+                f"{forcing_dir}: {', '.join(missing)}"
+            )
+    if errors:
+        for error in errors:
+            logger.error(error)
+        raise SystemExit(2)
+
+
+def _forcing_file_names(forcing_dir):
+    """Get the names of the netCDF files in a forcing directory.
+
+    The names are stored in an on-disk index, keyed by the directory path,
+    along with the modification time of the directory when it was scanned.
+    The directory is only scanned again when its modification time changes;
+    i.e. when files have been added to it, or removed from it.
+    The scan is a single directory listing, without a :command:`stat` of each file.
+
+    :param forcing_dir: Path of the forcing files directory.
+    :type forcing_dir: :py:class:`pathlib.Path`
+
+    :returns: Names of the netCDF files in the directory.
+    :rtype: set
+
+    :raises: :py:exc:`OSError` if the directory can't be read.
+    """
+    index_file = _forcing_index_file()
+    index = _read_forcing_index(index_file)
+    key = os.fspath(forcing_dir)
+    mtime_ns = os.stat(forcing_dir).st_mtime_ns
+    if index.get(key, {}).get("mtime_ns") == mtime_ns:
+        return set(index[key]["files"])
+    with os.scandir(forcing_dir) as entries:
+        files = sorted(entry.name for entry in entries if entry.name.endswith(".nc"))
+    _update_forcing_index(index_file, key, {"mtime_ns": mtime_ns, "files": files})
+    return set(files)
+
+
+def _read_forcing_index(index_file):
+    """Read the on-disk forcing directories index.
+
+    :param index_file: Path of the index file.
+    :type index_file: :py:class:`pathlib.Path`
+
+    :returns: Directory mtimes and netCDF file names, keyed by directory path;
+              empty if the index doesn't exist or can't be read.
+    :rtype: dict
+    """
+    try:
+        with index_file.open("rt") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _update_forcing_index(index_file, key, entry):
+    """Store the entry for a directory in the on-disk forcing directories index.
+
+    The index is re-read and the entry merged into it while
+    :py:data:`_FORCING_INDEX_LOCK` is held, so that runs that are prepared
+    in threads of the same process, like those of :command:`wwatch3 run-batch`,
+    don't lose each other's entries.
+    Each update is written to its own temporary file that is renamed to replace
+    the index, so readers never see a partly written index.
+
+    :param index_file: Path of the index file.
+    :type index_file: :py:class:`pathlib.Path`
+
+    :param str key: Path of the forcing directory.
+
+    :param dict entry: Modification time and netCDF file names of the directory.
+    """
+    with _FORCING_INDEX_LOCK:
+        index = _read_forcing_index(index_file)
+        index[key] = entry
+        tmp_index_file = None
+        try:
+            index_file.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                "wt", dir=index_file.parent, prefix=f".{index_file.name}.", delete=False
+            ) as f:
+                tmp_index_file = Path(f.name)
+                json.dump(index, f)
+            os.replace(tmp_index_file, index_file)
+        except OSError as exc:
+            if tmp_index_file is not None and tmp_index_file.exists():
+                tmp_index_file.unlink()
+            logger.warning(f"unable to update forcing files index {index_file}: {exc}")
+
+
+def _forcing_index_file():
+    """Get the path of the on-disk forcing directories index file.
+
+    It is stored in :file:`wwatch3/` in :envvar:`XDG_CACHE_HOME`,
+    or :file:`~/.cache/` if that is not set.
+
+    :rtype: :py:class:`pathlib.Path`
+    """
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or Path("~/.cache").expanduser()
+    return Path(cache_dir) / "wwatch3" / "forcing_index.json"
+
+
+def _sbatch_directives(
+    config,
+    results_dir,
+    walltime,
+    array_size=None,
+    signal_seconds=None,
+):
+    """Build the Slurm :kbd:`#SBATCH` directives for the run script.
+
+    For array jobs, the stdout and stderr file names have the array task index
+    appended.
+    They only receive the output from before the run script switches to
+    the :file:`stdout` and :file:`stderr` files in the task's day results directory.
+
+    For runs that save mid-day checkpoints, Slurm is asked to send SIGTERM to
+    the run script :kbd:`signal_seconds` before the time limit so that it can save
+    the last checkpoint before the job is killed.
+
+    :param config: Run configuration.
+    :type config: :py:class:`RunConfig`
+
+    :param results_dir: Path of the directory in which to store the run results.
+    :type results_dir: :py:class:`pathlib.Path`
+
+    :param str walltime: HPC batch job walltime to use for the run;
+                         formatted as :kbd:`HH:MM:SS`.
+
+    :param int array_size: Number of tasks in the array job;
+                           :py:obj:`None` means a job that is not an array job.
+
+    :param int signal_seconds: Seconds before the time limit to send SIGTERM to
+                               the run script;
+                               :py:obj:`None` means no signal.
+
+    :rtype: str
+    """
+    resources = config.resources
+    sbatch_directives = textwrap.dedent(
+        f"""\
+        #SBATCH --job-name={config.run_id}
+        #SBATCH --mail-user={config.email}
+        #SBATCH --mail-type=ALL
+        #SBATCH --account={config.account}
+        #SBATCH --constraint={resources["constraint"]}
+        #SBATCH --nodes={resources["nodes"]}
+        #SBATCH --ntasks-per-node={resources["tasks per node"]}
+        #SBATCH --mem={resources["memory"]}
+        #SBATCH --time={walltime}
+        """
+    )
+    if array_size:
+        sbatch_directives += f"#SBATCH --array=0-{array_size - 1}\n"
+    if signal_seconds:
+        sbatch_directives += f"#SBATCH --signal=B:TERM@{signal_seconds}\n"
+    array_suffix = "_%a" if array_size else ""
+    sbatch_directives += textwrap.dedent(
+        f"""        # stdout and stderr file paths/names
+        #SBATCH --output={results_dir/f"stdout{array_suffix}"}
+        #SBATCH --error={results_dir/f"stderr{array_suffix}"}
         """
     )
     return sbatch_directives
@@ -0,0 +1,368 @@
+#  Copyright 2019-2021, the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""WWatch3-Cmd command plug-in for run-batch sub-command.
+
+Prepare, and submit to the queue manager, WaveWatch III® runs for many run
+description files in one command.
+"""
+from concurrent.futures import ThreadPoolExecutor
+import glob
+import logging
+import os
+from pathlib import Path
+import subprocess
+import threading
+
+import cliff.lister
+
+import wwatch3_cmd.run
+
+logger = logging.getLogger(__name__)
+
+REPORT_COLUMNS = ("run id", "desc file", "job id", "status")
+
+
+class RunBatch(cliff.lister.Lister):
+    """Prepare and submit WaveWatch III® runs for many run description files.
+    """
+
+    def get_parser(self, prog_name):
+        import arrow
+
+        parser = super().get_parser(prog_name)
+        parser.description = """
+            Prepare and submit a WaveWatch III® run for each of the DESC_FILEs,
+            and the run description files listed in the --manifest file.
+            The results files from each run are gathered in a directory
+            in RESULTS_DIR that has the same name as its run description file
+            without the .yaml extension.
+            A failure to prepare or submit one run does not stop the others.
+
+            If RESULTS_DIR does not exist it will be created.
+        """
+        parser.add_argument(
+            "walltime",
+            metavar="WALLTIME",
+            type=str,
+            help="HPC batch job walltime for each run; formatted as HH:MM:SS",
+        )
+        parser.add_argument(
+            "results_dir",
+            metavar="RESULTS_DIR",
+            type=Path,
+            help="directory to store the runs results directories in",
+        )
+        parser.add_argument(
+            "desc_files",
+            metavar="DESC_FILE",
+            nargs="*",
+            help="""
+                run description YAML file, or quoted glob pattern of run description
+                YAML files
+                """,
+        )
+        parser.add_argument(
+            "--manifest",
+            type=Path,
+            help="""
+                File that lists run description YAML files and/or glob patterns
+                of them, one per line.
+                Relative paths are relative to the directory that the manifest
+                file is in.
+                Blank lines, and lines that start with # are ignored.
+                """,
+        )
+        parser.add_argument(
+            "--no-submit",
+            dest="no_submit",
+            action="store_true",
+            help="""
+                Prepare the temporary run directories, and the bash scripts to
+                execute the WaveWatch III® runs, but don't submit the runs to the
+                queue.
+                """,
+        )
+        parser.add_argument(
+            "--start-date",
+            type=wwatch3_cmd.run.Run._arrow_date,
+            default=arrow.now().floor("day"),
+            help=f"""
+                Date to start the runs on. Use YYYY-MM-DD format.
+                Defaults to {arrow.now().floor('day').format('YYYY-MM-DD')}.
+                """,
+        )
+        parser.add_argument(
+            "--n-days",
+            type=wwatch3_cmd.run.Run._positive_int,
+            default=1,
+            help="Number of days to execute in each run. Defaults to 1.",
+        )
+        parser.add_argument(
+            "--prep-workers",
+            type=wwatch3_cmd.run.Run._positive_int,
+            default=8,
+            help="""
+                Number of runs to prepare at the same time.
+                Defaults to 8.
+                """,
+        )
+        parser.add_argument(
+            "--max-submits",
+            type=wwatch3_cmd.run.Run._positive_int,
+            default=4,
+            help="""
+                Maximum number of sbatch job submissions to run at the same time.
+                Defaults to 4.
+                """,
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        """Execute the `wwatch3 run-batch` sub-command.
+
+        :param parsed_args: Arguments and options parsed from the command-line.
+        :type parsed_args: :class:`argparse.Namespace` instance
+
+        :returns: Report column names, and rows.
+        :rtype: 2-tuple
+        """
+        desc_files = _desc_files(parsed_args.desc_files, parsed_args.manifest)
+        rows = run_batch(
+            desc_files,
+            parsed_args.results_dir,
+            parsed_args.start_date,
+            parsed_args.walltime,
+            n_days=parsed_args.n_days,
+            prep_workers=parsed_args.prep_workers,
+            max_submits=parsed_args.max_submits,
+            no_submit=parsed_args.no_submit,
+        )
+        return REPORT_COLUMNS, rows
+
+
+def run_batch(
+    desc_files,
+    results_dir,
+    start_date,
+    walltime,
+    n_days=1,
+    prep_workers=8,
+    max_submits=4,
+    no_submit=False,
+):
+    """Prepare, and submit to the queue manager, a run for each of the run
+    description files in :kbd:`desc_files`.
+
+    The runs are prepared in a pool of threads that share one set of compiled
+    temporary run directory templates.
+    The run scripts of each run are submitted as soon as it is prepared,
+    with at most :kbd:`max_submits` :command:`sbatch` commands running at once.
+    A run that fails to be prepared or submitted is reported as failed,
+    and does not stop the other runs.
+
+    :param desc_files: File paths/names of the YAML run description files.
+    :type desc_files: list of :py:class:`pathlib.Path`
+
+    :param results_dir: Path of the directory in which to create the run results
+                        directories;
+                        it will be created if it does not exist.
+    :type results_dir: :py:class:`pathlib.Path`
+
+    :param start_date: Date to start the runs on.
+    :type :py:class:`arrow.Arrow`:
+
+    :param str walltime: HPC batch job walltime to use for each run;
+                         formatted as :kbd:`HH:MM:SS`.
+
+    :param int n_days: Number of days to execute in each run.
+
+    :param int prep_workers: Number of runs to prepare at the same time.
+
+    :param int max_submits: Maximum number of :command:`sbatch` job submissions
+                            to run at the same time.
+
+    :param boolean no_submit: Prepare the temporary run directories,
+                              and the run scripts, but don't submit the runs
+                              to the queue.
+
+    :returns: Report rows in :py:data:`REPORT_COLUMNS` order,
+              in :kbd:`desc_files` order.
+    :rtype: list of tuples
+    """
+    tmp_run_dir_template = wwatch3_cmd.run._TmpRunDirTemplate(
+        wwatch3_cmd.run.TEMPLATE_DIR
+    )
+    results_dir = wwatch3_cmd.run._resolve_results_dir(results_dir)
+    with ThreadPoolExecutor(max_workers=max_submits) as submit_pool:
+
+        def submit(run_script_files):
+            # Runs in a submit_pool thread, so that is where its errors are logged
+            with _ThreadErrors() as errors:
+                try:
+                    return wwatch3_cmd.run._submit_jobs(run_script_files), ""
+                except (SystemExit, Exception) as exc:
+                    return "", f"failed: submission error: {_error_msg(exc, errors)}"
+
+        def prep_and_submit(desc_file):
+            run_id = _run_id(desc_file)
+            with _ThreadErrors() as errors:
+                try:
+                    run_script_files = wwatch3_cmd.run._prepare_run(
+                        desc_file,
+                        results_dir / desc_file.stem,
+                        start_date,
+                        walltime,
+                        n_days=n_days,
+                        quiet=True,
+                        tmp_run_dir_template=tmp_run_dir_template,
+                    )
+                except (SystemExit, Exception) as exc:
+                    return (
+                        run_id,
+                        "",
+                        f"failed: preparation error: {_error_msg(exc, errors)}",
+                    )
+            if no_submit:
+                return run_id, "", f"prepared: {run_script_files[0].parent}"
+            submit_job_msg, failure = submit_pool.submit(
+                submit, run_script_files
+            ).result()
+            if failure:
+                return run_id, "", failure
+            job_ids = ", ".join(msg.split()[-1] for msg in submit_job_msg.splitlines())
+            return run_id, job_ids, "submitted"
+
+        with ThreadPoolExecutor(max_workers=prep_workers) as prep_pool:
+            results = list(prep_pool.map(prep_and_submit, desc_files))
+    rows = [
+        (run_id, os.fspath(desc_file), job_ids, status)
+        for desc_file, (run_id, job_ids, status) in zip(desc_files, results)
+    ]
+    n_failed = sum(1 for row in rows if row[3].startswith("failed"))
+    if n_failed:
+        logger.error(f"{n_failed} of {len(rows)} runs failed")
+    return rows
+
+
+def _desc_files(desc_files, manifest=None):
+    """Expand the run description file paths and glob patterns from the command-line
+    and the manifest file into a list of run description files.
+
+    Duplicates are removed, keeping the first occurrence.
+
+    :param desc_files: Run description file paths and/or glob patterns.
+    :type desc_files: list of str
+
+    :param manifest: Path of a file that lists run description file paths
+                     and/or glob patterns, one per line.
+    :type manifest: :py:class:`pathlib.Path`
+
+    :returns: Run description file paths.
+    :rtype: list of :py:class:`pathlib.Path`
+
+    :raises: :py:exc:`SystemExit` if no run description files are found,
+             or a pattern matches no files.
+    """
+    patterns = list(desc_files)
+    if manifest is not None:
+        manifest = Path(os.path.expandvars(manifest)).expanduser()
+        try:
+            lines = manifest.read_text().splitlines()
+        except FileNotFoundError:
+            logger.error(f"manifest file not found: {manifest}")
+            raise SystemExit(2)
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            pattern = Path(os.path.expandvars(line)).expanduser()
+            patterns.append(os.fspath(manifest.parent / pattern))
+    paths = {}
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]
+        if not matches:
+            logger.error(f"no run description files match {pattern}")
+            raise SystemExit(2)
+        for match in matches:
+            paths.setdefault(Path(match), None)
+    if not paths:
+        logger.error("no run description files given")
+        raise SystemExit(2)
+    return list(paths)
+
+
+def _run_id(desc_file):
+    """Get the run id from a run description file for the report.
+
+    :param desc_file: File path/name of the YAML run description file.
+    :type desc_file: :py:class:`pathlib.Path`
+
+    :returns: Run id, or empty string if the run description can't be read.
+    :rtype: str
+    """
+    import yaml
+
+    try:
+        with desc_file.open("rt") as f:
+            return str(yaml.safe_load(f).get("run_id", ""))
+    except (OSError, AttributeError, yaml.YAMLError):
+        return ""
+
+
+class _ThreadErrors(logging.Handler):
+    """Collect the messages of the errors that are logged by the thread that
+    creates the handler while it is used as a context manager.
+
+    The runs of a batch are prepared and submitted in pools of threads,
+    so the log messages about the different runs are interleaved;
+    collecting the errors for each run ties them to its report row.
+    """
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.thread = threading.get_ident()
+        self.messages = []
+
+    def emit(self, record):
+        if record.thread == self.thread:
+            self.messages.append(record.getMessage())
+
+    def __enter__(self):
+        logging.getLogger().addHandler(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        logging.getLogger().removeHandler(self)
+
+
+def _error_msg(exc, errors):
+    """Describe an exception raised while preparing or submitting a run.
+
+    The details of errors that cause :py:exc:`SystemExit` have already been logged,
+    so they are described by the messages of those errors.
+
+    :param exc: Exception raised while preparing or submitting a run.
+    :type exc: :py:exc:`Exception` or :py:exc:`SystemExit`
+
+    :param errors: Errors logged while preparing or submitting the run.
+    :type errors: :py:class:`_ThreadErrors`
+
+    :rtype: str
+    """
+    if isinstance(exc, SystemExit):
+        return "; ".join(errors.messages) or "see log messages above"
+    if isinstance(exc, subprocess.CalledProcessError):
+        return f"{exc.cmd[0]} exited with status {exc.returncode}"
+    return f"{type(exc).__name__}: {exc}"
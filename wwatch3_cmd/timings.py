@@ -0,0 +1,198 @@
+#  Copyright 2019-2021, the MIDOSS project contributors, The University of British Columbia,
+#  and Dalhousie University.
+#
+#  Licensed under the Apache License, Version 2.0 (the "License");
+#  you may not use this file except in compliance with the License.
+#  You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+#  Unless required by applicable law or agreed to in writing, software
+#  distributed under the License is distributed on an "AS IS" BASIS,
+#  WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+#  See the License for the specific language governing permissions and
+#  limitations under the License.
+"""WWatch3-Cmd command plug-in for timings sub-command.
+
+Summarise the per-stage timing records that WaveWatch III® run scripts write
+in their results directories.
+"""
+import json
+import logging
+from pathlib import Path
+
+import cliff.lister
+
+import wwatch3_cmd.run
+
+logger = logging.getLogger(__name__)
+
+TIMINGS_FILE = "wwatch3_timings.jsonl"
+STAGES = (
+    "stage_in",
+    "prnc_wind",
+    "prnc_current",
+    "shel",
+    "ounf",
+    "ounp",
+    "compress",
+    "stage_out",
+    "gather",
+    "cleanup",
+)
+GROUP_BY_KEYS = {"stage": (), "day": ("day",), "run": ("run_id",)}
+SUMMARY_COLUMNS = (
+    "stage",
+    "count",
+    "failures",
+    "mean seconds",
+    "min seconds",
+    "max seconds",
+    "total seconds",
+    "max peak RSS MiB",
+)
+
+
+class Timings(cliff.lister.Lister):
+    """Summarise the per-stage timings of WaveWatch III® runs.
+    """
+
+    def get_parser(self, prog_name):
+        parser = super().get_parser(prog_name)
+        parser.description = f"""
+            Summarise the per-stage timing records in the {TIMINGS_FILE} files
+            in RESULTS_DIR and its sub-directories.
+        """
+        parser.add_argument(
+            "results_dir",
+            metavar="RESULTS_DIR",
+            type=Path,
+            help="directory tree to search for run results timings files in",
+        )
+        parser.add_argument(
+            "--group-by",
+            choices=GROUP_BY_KEYS,
+            default="stage",
+            help="""
+                Summarise the timings of each stage over all of the runs and days
+                (stage), for each day (day), or for each run (run).
+                Defaults to stage.
+                """,
+        )
+        return parser
+
+    def take_action(self, parsed_args):
+        """Execute the `wwatch3 timings` sub-command.
+
+        :param parsed_args: Arguments and options parsed from the command-line.
+        :type parsed_args: :class:`argparse.Namespace` instance
+
+        :returns: Summary column names, and rows.
+        :rtype: 2-tuple
+        """
+        return timings(parsed_args.results_dir, parsed_args.group_by)
+
+
+def timings(results_dir, group_by="stage"):
+    """Summarise the per-stage timing records in the :file:`wwatch3_timings.jsonl`
+    files in :kbd:`results_dir` and its sub-directories.
+
+    :param results_dir: Path of the directory tree to search for timings files in.
+    :type results_dir: :py:class:`pathlib.Path`
+
+    :param str group_by: Key of :py:data:`GROUP_BY_KEYS` to group the records by
+                         in addition to stage.
+
+    :returns: Summary column names, and rows.
+    :rtype: 2-tuple
+    """
+    results_dir = wwatch3_cmd.run._resolve_results_dir(results_dir)
+    group_keys = GROUP_BY_KEYS[group_by]
+    groups = {}
+    for record in _load_timings(results_dir):
+        group = tuple(record.get(key) for key in group_keys) + (record["stage"],)
+        groups.setdefault(group, []).append(record)
+    if not groups:
+        logger.warning(f"no {TIMINGS_FILE} timing records found in {results_dir}")
+    rows = [
+        group + _summarise(records)
+        for group, records in sorted(groups.items(), key=_group_sort_key)
+    ]
+    columns = tuple(key.replace("_", " ") for key in group_keys) + SUMMARY_COLUMNS
+    return columns, rows
+
+
+def _load_timings(results_dir):
+    """Load the timing records from the :file:`wwatch3_timings.jsonl` files
+    in :kbd:`results_dir` and its sub-directories.
+
+    Malformed records, like those from a job that was killed while writing,
+    are skipped with a warning.
+
+    :param results_dir: Path of the directory tree to search for timings files in.
+    :type results_dir: :py:class:`pathlib.Path`
+
+    :returns: Timing records.
+    :rtype: list of dicts
+    """
+    records = []
+    for timings_file in sorted(results_dir.rglob(TIMINGS_FILE)):
+        for line_num, line in enumerate(timings_file.read_text().splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                record.update(
+                    stage=str(record["stage"]),
+                    start=float(record["start"]),
+                    end=float(record["end"]),
+                )
+            except (ValueError, TypeError, KeyError):
+                logger.warning(
+                    f"skipped malformed timing record at {timings_file}:{line_num}"
+                )
+                continue
+            records.append(record)
+    return records
+
+
+def _group_sort_key(group_item):
+    """Sort key that orders summary groups by their group-by values,
+    then by stage execution order.
+
+    :param group_item: Group key and timing records.
+    :type group_item: 2-tuple
+
+    :rtype: tuple
+    """
+    group, records = group_item
+    *group_values, stage = group
+    stage_order = STAGES.index(stage) if stage in STAGES else len(STAGES)
+    return tuple(str(value) for value in group_values) + (stage_order, stage)
+
+
+def _summarise(records):
+    """Calculate summary statistics of a group of timing records.
+
+    :param records: Timing records of a stage.
+    :type records: list of dicts
+
+    :returns: Values for the :py:data:`SUMMARY_COLUMNS` after stage.
+    :rtype: tuple
+    """
+    seconds = [record["end"] - record["start"] for record in records]
+    failures = sum(1 for record in records if record.get("exit_status", 0) != 0)
+    peak_rss_kbs = [
+        record["peak_rss_kb"]
+        for record in records
+        if record.get("peak_rss_kb") is not None
+    ]
+    return (
+        len(records),
+        failures,
+        round(sum(seconds) / len(seconds), 1),
+        round(min(seconds), 1),
+        round(max(seconds), 1),
+        round(sum(seconds), 1),
+        round(max(peak_rss_kbs) / 1024, 1) if peak_rss_kbs else None,
+    )